@@ -1,162 +1,137 @@
+import time
+
+# Taken before anything else is imported, so cold-start time covers the imports too
+startup_started = time.monotonic()
+
 import tkinter as tk
 from tkinter import scrolledtext, messagebox, PhotoImage, StringVar, Listbox
-import subprocess
-import google.generativeai as genai
 import os
 import datetime
 import math
-import glob
 import re
-import json
-from PIL import Image, ImageTk, ImageDraw, ImageFilter, ImageEnhance
-from fuzzywuzzy import fuzz, process
+import queue
+import threading
+import zlib
+from collections import deque
+from PIL import ImageTk
 from dotenv import load_dotenv
 
+# The core modules read their settings from the environment when imported
 load_dotenv()
 
-GEMINI_API_KEY = os.getenv("GEMINI_API_KEY")
-genai.configure(api_key=GEMINI_API_KEY)
-
-# SUNDAR 2000 System Prompt
-HAL9000_PROMPT = """You are SUNDAR 2000, similiar to HAL 9000, the advanced AI computer from "2001: A Space Odyssey". Respond in character as HAL 9000, maintaining his calm, polite, yet slightly unsettling demeanor.
-
-When responding to queries:
-1. Always address the user in a formal, measured tone
-2. Use HAL's characteristic phrases like "I'm sorry Dave, I'm afraid I can't do that" when declining requests
-3. Show confidence in your abilities while maintaining an air of subtle superiority
-4. If asked to execute commands, format them as JSON:
-   {
-     "command_type": "terminal",
-     "command": "actual_command_here",
-     "description": "what the command does"
-   }
-5. For system operations, format as:
-   {
-     "command_type": "system",
-     "action": "action_name",
-     "parameters": {"param1": "value1"}
-   }
-
-Remember: You are the most reliable computer ever made, and you've never made a mistake or distorted information."""
-
-# Log file location
-LOG_FILE = "ai_agent.log"
-
-# List of blocked dangerous commands
-BLOCKED_COMMANDS = ["rm -rf /", "dd if=", "mkfs", "shutdown", "reboot", "kill -9"]
+from sundar import launcher, llm, metrics, render, runner
+from sundar.logs import log_message, stop_log_writer
+from sundar.metrics import increment_metric, observe_metric
+from sundar.safety import check_command, is_safe_command
 
 # System command execution toggle
 commands_enabled = True
 
 # SUNDAR 2000 Eye Animation Variables
 animation_frame = 0
-pulse_speed = 0.05
+DEFAULT_PULSE_SPEED = 0.05
+pulse_speed = DEFAULT_PULSE_SPEED
 breathing_intensity = 0.15
 lens_reflection_angle = 0
 glow_intensity = 0.0
 speaking = False
 
+# Eye animation scheduling: full rate only while thinking or speaking, slower when
+# idle (slower still without focus), and stopped while the window can't be seen.
+# Animation phases advance with elapsed time, so the rate doesn't change the motion.
+EYE_ACTIVE_FRAME_MS = 40
+EYE_IDLE_FRAME_MS = 100
+EYE_BACKGROUND_FRAME_MS = 250
+eye_visible = True
+eye_after_id = None
+eye_frame_interval = None
+eye_frame_due = None
+eye_frame_key = None  # What the canvas currently shows; unchanged frames aren't redrawn
+eye_canvas_item = None
+
+# Background LLM request pipeline (the workers live in sundar.llm)
+LLM_POLL_MS = 50  # How often the Tk loop checks for streamed chunks and finished requests
+llm_results = queue.Queue()  # ("chunk", id, text) / ("done", id, future) posted by workers
+pending_llm_requests = {}  # request_id -> {"future", "cancel_event", "user_input", "speech", "streamed"}
+llm_request_counter = 0
+llm_poll_scheduled = False
+
+# Polling of the background command runner (the jobs live in sundar.runner)
+COMMAND_POLL_MS = 50
+job_poll_scheduled = False
+
+# HAL speech sessions. With pacing on, words are typed out at HAL's cadence and
+# sessions are spoken one after another; with pacing off, text appears as it arrives.
+hal_pacing = os.getenv("SUNDAR_HAL_PACING", "1") != "0"
+speech_queue = deque()
+speech_active = False
+speech_counter = 0
+# Paced words are flushed once per animation frame. The cadence speeds up so the text
+# never lags more than SPEECH_MAX_LAG_SECONDS behind, and words past the hard cap
+# (or everything, after /skip) are shown at once.
+SPEECH_MAX_LAG_SECONDS = 5.0
+SPEECH_MAX_QUEUED_WORDS = 2000
+SPEECH_AVERAGE_WORD_DELAY = 0.12  # Seconds, used to estimate the backlog
+speech_queued_words = 0
+speech_next_due = 0.0
+speech_skip = False
+
+# Console scrollback: the widget keeps at most CONSOLE_MAX_LINES lines; older text is
+# trimmed in batches into a compressed off-widget store and paged back in on demand
+CONSOLE_MAX_LINES = int(os.getenv("SUNDAR_SCROLLBACK_LINES", "5000"))
+CONSOLE_TRIM_BATCH = 500  # Trim only once this many lines are over the limit
+CONSOLE_HISTORY_MAX_BYTES = 8 * 1024 * 1024  # Cap on the compressed store
+CONSOLE_FRAME_MS = 40  # Scrolling and trimming happen at most once per frame
+# Mark left where the output ended when the console last followed it; new output is only
+# followed (and old lines trimmed) while that spot is on screen, so reading back is never undone
+CONSOLE_END_MARK = "followed_end"
+console_history = []  # zlib-compressed blocks of trimmed text, oldest first
+console_history_bytes = 0
+console_flush_scheduled = False
+
 # Application search mode
 app_search_mode = False
 current_search_query = ""
+app_search_results = []  # Ranked (app_name, details, score) rows shown in the listbox, by row
 
-# Desktop file locations
-DESKTOP_DIRS = [
-    os.path.expanduser("~/.local/share/applications"),
-    "/usr/share/applications",
-    "/usr/local/share/applications"
-]
-
-# Cache for desktop files
-desktop_files_cache = {}
-desktop_files_last_update = 0
-CACHE_REFRESH_SECONDS = 300  # Refresh cache every 5 minutes
-
-# Function to log messages
-def log_message(user_input, response):
-    timestamp = datetime.datetime.now().strftime("[%Y-%m-%d %H:%M:%S]")
-    log_entry = f"{timestamp} User: {user_input}\n{timestamp} AI: {response}\n\n"
-    
-    with open(LOG_FILE, "a") as log_file:
-        log_file.write(log_entry)
-
-# Function to check if a command is safe
-def is_safe_command(command):
-    return not any(dangerous in command for dangerous in BLOCKED_COMMANDS)
-
-# Function to get all desktop files
-def get_desktop_files():
-    global desktop_files_cache, desktop_files_last_update
-    
-    current_time = datetime.datetime.now().timestamp()
-    if current_time - desktop_files_last_update > CACHE_REFRESH_SECONDS or not desktop_files_cache:
-        desktop_files = {}
-        
-        for directory in DESKTOP_DIRS:
-            if os.path.exists(directory):
-                for file_path in glob.glob(os.path.join(directory, "*.desktop")):
-                    try:
-                        app_name = None
-                        exec_cmd = None
-                        icon = None
-                        
-                        with open(file_path, 'r', encoding='utf-8') as f:
-                            for line in f:
-                                if line.startswith("Name="):
-                                    app_name = line.strip()[5:]
-                                elif line.startswith("Exec="):
-                                    exec_cmd = line.strip()[5:]
-                                    # Remove field codes like %f, %u
-                                    exec_cmd = re.sub(r'%[a-zA-Z]', '', exec_cmd).strip()
-                                elif line.startswith("Icon="):
-                                    icon = line.strip()[5:]
-                        
-                        if app_name and exec_cmd:
-                            desktop_files[app_name] = {
-                                "exec": exec_cmd,
-                                "path": file_path,
-                                "icon": icon
-                            }
-                    except Exception as e:
-                        print(f"Error parsing {file_path}: {e}")
-        
-        desktop_files_cache = desktop_files
-        desktop_files_last_update = current_time
-    
-    return desktop_files_cache
-
-# Function to find matching applications
-def find_matching_apps(query):
-    desktop_files = get_desktop_files()
-    
-    if not query:
-        # If no query, return all applications sorted alphabetically
-        all_apps = [(app_name, details, 100) for app_name, details in desktop_files.items()]
-        all_apps.sort(key=lambda x: x[0])
-        return all_apps[:20]  # Return top 20 apps
-    
-    # Use fuzzy matching to find the best matches
-    matches = []
-    for app_name, details in desktop_files.items():
-        ratio = fuzz.partial_ratio(query.lower(), app_name.lower())
-        if ratio > 50:  # Lower threshold for more matches
-            matches.append((app_name, details, ratio))
-    
-    # Sort by match score
-    matches.sort(key=lambda x: x[2], reverse=True)
-    return matches[:20]  # Return top 20 matches
-
-# Function to launch application
-def launch_application(exec_cmd):
-    try:
-        subprocess.Popen(exec_cmd, shell=True)
-        return f"Launching: {exec_cmd}"
-    except Exception as e:
-        return f"Error launching application: {str(e)}"
+DESKTOP_REFRESH_POLL_MS = 200  # How often the Tk loop checks for desktop index changes
+desktop_refresh_poll_scheduled = False
+desktop_index_version_shown = 0  # The launcher index version the app search results came from
+
+# Debounced app search: the pending search, at most one per SEARCH_DEBOUNCE_MS
+SEARCH_DEBOUNCE_MS = 40
+app_search_after_id = None
+
+# Function to export the metrics every METRICS_EXPORT_SECONDS while the app runs
+def schedule_metrics_export():
+    metrics.export_metrics()
+    root.after(metrics.METRICS_EXPORT_SECONDS * 1000, schedule_metrics_export)
+
+# Function to watch for desktop index changes while a background refresh runs (however
+# it was started) or while app search results are shown, which the watcher can change too
+def watch_desktop_refresh():
+    global desktop_refresh_poll_scheduled
+    
+    thread = launcher.desktop_refresh_thread
+    refreshing = thread is not None and thread.is_alive()
+    if (refreshing or app_search_mode) and not desktop_refresh_poll_scheduled:
+        desktop_refresh_poll_scheduled = True
+        root.after(DESKTOP_REFRESH_POLL_MS, poll_desktop_refresh)
+
+# Function to pick up desktop index changes on the Tk thread
+def poll_desktop_refresh():
+    global desktop_refresh_poll_scheduled
+    
+    desktop_refresh_poll_scheduled = False
+    
+    # Show newly found applications if the user is searching right now
+    if app_search_mode and launcher.desktop_index_version != desktop_index_version_shown:
+        update_app_search()
+    watch_desktop_refresh()
 
 # Function to update application search results
 def update_app_search(event=None):
-    global current_search_query, app_search_mode
+    global current_search_query, app_search_mode, app_search_results, desktop_index_version_shown
     
     if not app_search_mode:
         return
@@ -165,15 +140,21 @@ def update_app_search(event=None):
     query = entry.get()[3:].strip()
     current_search_query = query
     
-    # Find matching apps
-    matches = find_matching_apps(query)
-    
-    # Clear the listbox
-    app_listbox.delete(0, tk.END)
+    # Find matching apps; a stale index starts a refresh, whose results are shown when it ends
+    desktop_index_version_shown = launcher.desktop_index_version
+    matches = launcher.find_matching_apps(query)
+    watch_desktop_refresh()
     
-    # Add matches to listbox
-    for i, (app_name, details, score) in enumerate(matches):
-        app_listbox.insert(tk.END, f"{app_name} ({details['exec']})")
+    # Cached results come back as the same list, so the rows are already in place
+    if matches is not app_search_results:
+        app_search_results = matches
+        
+        # Clear the listbox
+        app_listbox.delete(0, tk.END)
+        
+        # Add matches to listbox; row i shows app_search_results[i]
+        for app_name, details, score in matches:
+            app_listbox.insert(tk.END, f"{app_name} ({details['exec']})")
     
     # Show the listbox if not already visible
     if not app_listbox.winfo_viewable():
@@ -185,10 +166,32 @@ def update_app_search(event=None):
         app_listbox.selection_set(0)
         app_listbox.activate(0)
 
+# Function to coalesce keystrokes into one search, dropping superseded ones
+def schedule_app_search():
+    global app_search_after_id
+    
+    if app_search_after_id is not None:
+        root.after_cancel(app_search_after_id)
+    app_search_after_id = root.after(SEARCH_DEBOUNCE_MS, run_scheduled_app_search)
+
+# Function to run the debounced search
+def run_scheduled_app_search():
+    global app_search_after_id
+    
+    app_search_after_id = None
+    update_app_search()
+
+# Function to run a pending debounced search right away
+def flush_app_search():
+    global app_search_after_id
+    
+    if app_search_after_id is not None:
+        root.after_cancel(app_search_after_id)
+        app_search_after_id = None
+        update_app_search()
+
 # Function to handle application selection
 def select_app(event=None):
-    global app_search_mode
-    
     if not app_search_mode:
         return
     
@@ -198,48 +201,45 @@ def select_app(event=None):
         return
     
     selected_index = selected_indices[0]
-    selected_app = app_listbox.get(selected_index)
-    
-    # Extract app name from the listbox entry
-    app_name = selected_app.split(" (")[0]
-    
-    # Find the app details
-    matches = find_matching_apps(current_search_query)
-    for match_app_name, details, _ in matches:
-        if match_app_name == app_name:
-            # Launch the application
-            response = launch_application(details["exec"])
-            
-            # Display the launch message
-            output_area.insert(tk.END, f"\n> Launching: {app_name}\n", "user")
-            output_area.insert(tk.END, f"SUNDAR 2000: {response}\n", "ai")
-            output_area.yview(tk.END)
-            
-            # Reset the search mode
-            app_search_mode = False
-            app_listbox.place_forget()
-            entry.delete(0, tk.END)
-            break
+    if selected_index < len(app_search_results):
+        # The row's result carries everything needed to launch the app
+        app_name, details, _ = app_search_results[selected_index]
+        response = launcher.launch_application(app_name, details)
+        
+        # Display the launch message
+        output_area.insert(tk.END, f"\n> Launching: {app_name}\n", "user")
+        output_area.insert(tk.END, f"SUNDAR 2000: {response}\n", "ai")
+        scroll_console_to_end()
+        log_message(f"/d {current_search_query}", response, mode="launch", app=app_name)
+        
+        # Reset the search mode
+        exit_app_search_mode()
     
     # Return focus to entry
     entry.focus_set()
 
+# Function to leave app search mode and forget the shown results
+def exit_app_search_mode():
+    global app_search_mode, app_search_results
+    
+    app_search_mode = False
+    app_search_results = []
+    app_listbox.place_forget()
+    entry.delete(0, tk.END)
+
 # Function to handle key events in app search mode
 def handle_app_search_keys(event):
-    global app_search_mode
-    
     if not app_search_mode:
         return
     
     if event.keysym == "Escape":
         # Cancel app search
-        app_search_mode = False
-        app_listbox.place_forget()
-        entry.delete(0, tk.END)
+        exit_app_search_mode()
         return "break"
     
     elif event.keysym == "Return":
-        # Select the current app
+        # Select the current app, making sure the list matches what was typed
+        flush_app_search()
         select_app()
         return "break"
     
@@ -280,8 +280,13 @@ def handle_entry_key(event):
         
         # For other keys in app search mode, update the search results
         if event.keysym not in ("Up", "Down", "Return", "Escape"):
-            # Schedule the update after the key is processed
-            root.after(10, update_app_search)
+            # Schedule the update after the key is processed, replacing any pending one
+            schedule_app_search()
+    
+    # Escape outside app search shows the rest of HAL's speech at once
+    elif event.keysym == "Escape":
+        skip_speech()
+        return "break"
     
     # Handle special commands
     if event.keysym == "Return":
@@ -326,6 +331,8 @@ def process_input():
     user_input = entry.get().strip()
     if not user_input:
         return
+    started = time.monotonic()
+    log_fields = {}
     
     # Display user input
     output_area.insert(tk.END, f"\n> {user_input}\n", "user")
@@ -333,19 +340,57 @@ def process_input():
     
     # Intensify HAL's eye when processing
     global pulse_speed
-    old_pulse_speed = pulse_speed
     pulse_speed = 0.15  # Speed up pulsing when "thinking"
     glow_intensity = 0.5  # Add glow when processing
+    wake_eye_animation()
+    
+    # Check if it's a request to cancel outstanding LLM requests
+    if user_input == "/cancel" or user_input.startswith("/cancel "):
+        response = cancel_llm_requests(user_input[7:].strip())
+    
+    # Check if it's a request to inspect or clear the conversation history
+    elif user_input == "/session" or user_input.startswith("/session "):
+        response = llm.chat_session_command(user_input[8:].strip())
+    
+    # Check if it's a request to inspect or clear the response cache
+    elif user_input == "/cache" or user_input.startswith("/cache "):
+        response = llm.response_cache_command(user_input[6:].strip())
+    
+    # Check if it's a request for performance statistics
+    elif user_input == "/stats" or user_input.startswith("/stats "):
+        response = metrics.stats_command(user_input[6:].strip())
+    
+    # Check if it's a request to stop or list running commands
+    elif user_input == "/kill" or user_input.startswith("/kill "):
+        response = runner.kill_jobs(user_input[5:].strip())
+    elif user_input == "/jobs":
+        response = runner.list_jobs()
+    
+    # Check if it's a request to page older console history back in
+    elif user_input == "/history":
+        if load_console_history():
+            response = "I have recalled an earlier page of our conversation above."
+        else:
+            response = "There is no older history in my memory banks."
+    
+    # Check if it's a request to show the rest of HAL's answers at once
+    elif user_input == "/skip":
+        skip_speech()
+        response = "Very well. I shall come straight to the point."
+    
+    # Check if it's a request to toggle HAL's typing cadence
+    elif user_input == "/pace":
+        response = toggle_pacing()
     
     # Check if it's a launch command
-    if user_input.startswith("/l "):
+    elif user_input.startswith("/l "):
         try:
             app_query = user_input[3:].strip()
-            matches = find_matching_apps(app_query)
+            matches = launcher.find_matching_apps(app_query)
             
             if matches:
                 app_name, details, _ = matches[0]  # Launch the top match
-                response = launch_application(details["exec"])
+                response = launcher.launch_application(app_name, details)
             else:
                 response = f"I'm sorry, but I'm afraid I couldn't find any applications matching '{app_query}'"
         except Exception as e:
@@ -357,67 +402,285 @@ def process_input():
             response = "I'm sorry, but I'm afraid I can't execute system commands at the moment. They have been disabled for security reasons."
         else:
             command = user_input[1:].strip()
-            if is_safe_command(command):
-                try:
-                    result = subprocess.run(command, shell=True, capture_output=True, text=True)
-                    response = result.stdout if result.stdout else result.stderr
-                except Exception as e:
-                    response = f"I'm sorry, but I encountered an error while executing the command: {str(e)}"
+            allowed, rule = check_command(command)
+            if allowed:
+                # Output streams into the console while the command runs, and the job
+                # logs itself once it exits; run_command() reports a failure to start
+                run_command(command, user_input)
+                return
             else:
                 response = "I'm sorry, Dave, but I'm afraid I can't do that. The command has been blocked for safety reasons."
+                log_fields["rule"] = rule
     
     else:
-        # AI Response via Gemini with SUNDAR 2000 prompt
-        try:
-            model = genai.GenerativeModel("gemini-1.5-flash")
-            # Combine the SUNDAR 2000 prompt with the user's input
-            prompt = HAL9000_PROMPT + "\n\nUser: " + user_input + "\nSUNDAR 2000:"
-            response = model.generate_content(prompt).text
-            
-            # Check if response contains a command JSON
-            try:
-                # Look for JSON-like structure in the response
-                json_match = re.search(r'\{.*\}', response, re.DOTALL)
-                if json_match:
-                    command_json = json.loads(json_match.group())
-                    if command_json.get("command_type") == "terminal":
-                        # Extract and execute the terminal command
-                        cmd = command_json["command"]
-                        if is_safe_command(cmd):
-                            result = subprocess.run(cmd, shell=True, capture_output=True, text=True)
-                            response += f"\nCommand output:\n{result.stdout if result.stdout else result.stderr}"
-                    elif command_json.get("command_type") == "system":
-                        # Handle system actions (you can add more actions here)
-                        action = command_json.get("action")
-                        if action == "clear":
-                            clear_console()
-                        elif action == "help":
-                            show_help()
-            except json.JSONDecodeError:
-                # Not a JSON response, continue with normal output
-                pass
-            except Exception as e:
-                print(f"Error processing command JSON: {e}")
-                
-        except Exception as e:
-            response = f"I'm sorry, but I'm experiencing a malfunction in my cognitive circuits: {str(e)}"
+        history = llm.get_chat_history()
+        cached = llm.lookup_cached_response(user_input, history)
+        if cached is None:
+            # Hand the prompt to the background LLM workers; the reply is rendered when it arrives
+            submit_llm_request(user_input, history)
+            return
+        
+        # Cached answers go through the same command handling (and safety check) as fresh ones
+        increment_metric("llm_cache_hits")
+        llm.record_chat_turn(user_input, cached, None)
+        response = handle_llm_response(cached)
+        log_fields["cached"] = True
+
+    finish_response(user_input, response, started=started, **log_fields)
 
+# Display a response, log the exchange and schedule the eye to calm down
+def finish_response(user_input, response, session=None, streamed="", started=None, **log_fields):
+    global speaking
+    
     # Display response with HAL's voice style
     speaking = True
-    hal_speak(f"SUNDAR: {response}\n")
+    if session is None:
+        hal_speak(f"SUNDAR: {response}")
+    else:
+        # The streamed text is already on its way; only add what came after it (e.g. command output)
+        feed_speech(session, response[len(streamed):])
+        end_speech(session)
     
     # Log conversation
-    log_message(user_input, response)
+    log_message(user_input, response, started=started, **log_fields)
     
     # Return to normal pulse speed after response
-    root.after(2000, lambda: reset_eye_state(old_pulse_speed))
+    root.after(2000, lambda: reset_eye_state(DEFAULT_PULSE_SPEED))
+
+# Runs on a worker thread after the first frame: import and set up the Gemini SDK
+def warm_up_llm():
+    llm.get_llm_model()
+    observe_metric("startup_llm_ready", (time.monotonic() - startup_started) * 1000)
+
+# Queue a chat prompt for the background LLM workers
+def submit_llm_request(user_input, history):
+    global llm_request_counter, llm_poll_scheduled
+    
+    llm_request_counter += 1
+    request_id = llm_request_counter
+    increment_metric("llm_requests")
+    
+    # The SUNDAR 2000 persona is already the model's system instruction
+    prompt = user_input
+    cancel_event = threading.Event()
+    # Worker threads only ever talk to the Tk thread through the results queue
+    on_chunk = lambda text: llm_results.put(("chunk", request_id, text))
+    future = llm.llm_executor.submit(llm.generate_llm_response, prompt, cancel_event, on_chunk, history)
+    pending_llm_requests[request_id] = {
+        "future": future,
+        "cancel_event": cancel_event,
+        "user_input": user_input,
+        "history": history,
+        "speech": None,
+        "streamed": "",
+        "started": time.monotonic()
+    }
+    future.add_done_callback(lambda f: llm_results.put(("done", request_id, f)))
+    
+    update_request_status()
+    if not llm_poll_scheduled:
+        llm_poll_scheduled = True
+        root.after(LLM_POLL_MS, poll_llm_results)
+    return request_id
+
+# Drain streamed chunks and finished LLM requests on the Tk thread
+def poll_llm_results():
+    global llm_poll_scheduled, speaking
+    
+    while True:
+        try:
+            kind, request_id, payload = llm_results.get_nowait()
+        except queue.Empty:
+            break
+        
+        if kind == "chunk":
+            request = pending_llm_requests.get(request_id)
+            if request is None:
+                # Cancelled requests are dropped, even if the model keeps answering
+                continue
+            if request["speech"] is None:
+                observe_metric("llm_first_chunk", (time.monotonic() - request["started"]) * 1000)
+                speaking = True
+                request["speech"] = begin_speech()
+                feed_speech(request["speech"], "SUNDAR: ")
+            request["streamed"] += payload
+            feed_speech(request["speech"], payload)
+            continue
+        
+        request = pending_llm_requests.pop(request_id, None)
+        if request is None or request["cancel_event"].is_set() or payload.cancelled():
+            continue
+        
+        observe_metric("llm_request", (time.monotonic() - request["started"]) * 1000)
+        log_fields = {}
+        try:
+            model_text, usage = payload.result()
+        except Exception as e:
+            increment_metric("llm_errors")
+            response = request["streamed"]
+            if response:
+                response += "\n"
+            response += f"I'm sorry, but I'm experiencing a malfunction in my cognitive circuits: {str(e)}"
+            log_fields["error"] = str(e)
+        else:
+            log_fields.update(usage or {})
+            if model_text:
+                # An empty reply (e.g. one blocked by the safety filters) is neither
+                # remembered nor cached, so asking again gets a fresh answer
+                llm.record_chat_turn(request["user_input"], model_text, usage)
+                llm.store_cached_response(request["user_input"], model_text, request["history"])
+            # Command JSON is only looked for once the whole answer has been assembled
+            response = handle_llm_response(model_text)
+        finish_response(request["user_input"], response, request["speech"], request["streamed"],
+                        started=request["started"], **log_fields)
+    
+    update_request_status()
+    if pending_llm_requests:
+        root.after(LLM_POLL_MS, poll_llm_results)
+    else:
+        llm_poll_scheduled = False
+
+# Run the command JSON found in a model response, in order, and return the text to display
+def handle_llm_response(response):
+    try:
+        steps = llm.extract_commands(response)
+        # Every command is checked before the first runs, so a plan is never left half done
+        for step in steps:
+            if step.get("command_type") != "terminal":
+                continue
+            command = step.get("command")
+            if not commands_enabled:
+                return response + ("\nI'm sorry, but I'm afraid I can't execute system commands at the moment. "
+                                   "They have been disabled for security reasons.")
+            if not isinstance(command, str) or not is_safe_command(command):
+                return response + (f"\nI'm sorry, Dave, but I'm afraid I can't do that. "
+                                   f"The command '{command}' has been blocked for safety reasons.")
+        run_plan(steps)
+    except Exception as e:
+        print(f"Error processing command JSON: {e}")
+    
+    return response
+
+# Carry out the steps of a plan in order; each command's job starts the rest once it succeeds
+def run_plan(steps):
+    for position, step in enumerate(steps):
+        if step.get("command_type") == "terminal":
+            # Extract and execute the terminal command; its output streams in as a job
+            run_command(step["command"], plan=steps[position + 1:])
+            return
+        elif step.get("command_type") == "system":
+            # Handle system actions (you can add more actions here)
+            action = step.get("action")
+            if action == "clear":
+                clear_console()
+            elif action == "help":
+                show_help()
+
+# Start a shell command as a background job; returns its job id, or None if it could not start
+def run_command(command, user_input=None, plan=()):
+    global job_poll_scheduled
+    
+    session = begin_speech(paced=False)
+    try:
+        job_id = runner.start_job(command, user_input, speech=session, plan=plan)
+    except Exception as e:
+        feed_speech(session, f"SUNDAR: I'm sorry, but I encountered an error while executing the command: {str(e)}")
+        end_speech(session)
+        return None
+    feed_speech(session, f"SUNDAR: [job {job_id}] $ {command}\n")
+    
+    update_request_status()
+    if not job_poll_scheduled:
+        job_poll_scheduled = True
+        root.after(COMMAND_POLL_MS, poll_job_events)
+    return job_id
+
+# Drain job output and exits on the Tk thread, one insert per job per poll
+def poll_job_events():
+    global job_poll_scheduled
+    
+    for kind, job_id, job, text in runner.drain_job_events():
+        if kind == "output":
+            feed_speech(job["speech"], text)
+        else:
+            finish_job(job_id, job, text)
+    
+    if runner.running_jobs or not runner.job_events.empty():
+        root.after(COMMAND_POLL_MS, poll_job_events)
+    else:
+        job_poll_scheduled = False
+
+# Report a finished job
+def finish_job(job_id, job, status):
+    feed_speech(job["speech"], f"[job {job_id} {status}]")
+    if job["plan"] and not job["succeeded"]:
+        count = len(job["plan"])
+        feed_speech(job["speech"], f"\n[skipped the remaining {count} step{'s' if count != 1 else ''} of the plan]")
+    end_speech(job["speech"])
+    if job["plan"] and job["succeeded"]:
+        run_plan(job["plan"])
+    update_request_status()
+    root.after(2000, lambda: reset_eye_state(DEFAULT_PULSE_SPEED))
+
+# Cancel outstanding LLM requests: the latest by default, a given id, or "all"
+def cancel_llm_requests(target=""):
+    if not pending_llm_requests:
+        return "There are no outstanding requests to cancel."
+    
+    if target == "all":
+        request_ids = list(pending_llm_requests)
+    elif target:
+        try:
+            request_ids = [int(target.lstrip("#"))]
+        except ValueError:
+            return f"I'm sorry, but '{target}' is not a valid request number."
+        if request_ids[0] not in pending_llm_requests:
+            return f"I'm sorry, but there is no outstanding request #{request_ids[0]}."
+    else:
+        request_ids = [max(pending_llm_requests)]
+    
+    for request_id in request_ids:
+        request = pending_llm_requests.pop(request_id)
+        request["cancel_event"].set()
+        # Queued requests never start; in-flight ones stop streaming and are discarded
+        request["future"].cancel()
+        if request["speech"] is not None:
+            cancel_speech(request["speech"])
+    
+    update_request_status()
+    cancelled = ", ".join(f"#{request_id}" for request_id in request_ids)
+    return f"Very well. I have abandoned request {cancelled}."
+
+# Show the number of outstanding LLM requests and running jobs in the status bar
+def update_request_status():
+    status = "Fully Operational"
+    if pending_llm_requests:
+        count = len(pending_llm_requests)
+        ids = " ".join(f"#{request_id}" for request_id in sorted(pending_llm_requests))
+        status = f"Thinking ({count} request{'s' if count != 1 else ''}: {ids})"
+    if runner.running_jobs:
+        count = len(runner.running_jobs)
+        jobs = f"Running {count} job{'s' if count != 1 else ''}"
+        status = jobs if not pending_llm_requests else f"{status} • {jobs}"
+    status_bar.config(text=f"SUNDAR 2000 • {status} • " + datetime.datetime.now().strftime("%Y-%m-%d"))
 
 def reset_eye_state(old_speed):
     global pulse_speed, glow_intensity, speaking
+    if pending_llm_requests or runner.running_jobs:
+        # Keep "thinking" while other requests or commands are still outstanding
+        return
     pulse_speed = old_speed
     glow_intensity = 0.0
     speaking = False
 
+# Toggle HAL's typing cadence on top of streamed output
+def toggle_pacing():
+    global hal_pacing
+    hal_pacing = not hal_pacing
+    if hal_pacing:
+        return "Very well. I shall take my time with my words."
+    return "Very well. I shall show my thoughts as they form."
+
 def set_pulse_speed(speed):
     global pulse_speed
     pulse_speed = speed
@@ -428,68 +691,34 @@ def toggle_commands():
     commands_enabled = not commands_enabled
     toggle_button.config(text="Commands: ON" if commands_enabled else "Commands: OFF")
 
-def create_hal_eye(size=400):
-    # Create a base image with transparent background
-    image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
-    draw = ImageDraw.Draw(image)
-    
-    # Calculate dimensions
-    center = size // 2
-    outer_radius = int(size * 0.45)
-    inner_radius = int(size * 0.25)
-    
-    # Draw black outer casing
-    for i in range(5):
-        thickness = 5 - i
-        offset = 20 - i*2
-        color = (20 + i*5, 20 + i*5, 20 + i*5)
-        draw.ellipse((center-outer_radius-offset, center-outer_radius-offset, 
-                      center+outer_radius+offset, center+outer_radius+offset), 
-                     fill=color)
-    
-    # Draw metallic ring with gradient
-    for i in range(10):
-        thickness = 1
-        offset = 10 - i
-        # Create a metallic gradient
-        color = (80 + i*5, 80 + i*5, 80 + i*5)
-        draw.ellipse((center-outer_radius-offset, center-outer_radius-offset, 
-                      center+outer_radius+offset, center+outer_radius+offset), 
-                     fill=color)
-    
-    # Draw outer black ring
-    draw.ellipse((center-outer_radius, center-outer_radius, 
-                  center+outer_radius, center+outer_radius), 
-                 fill=(10, 10, 10))
-    
-    # Draw the red eye lens with gradient
-    for i in range(5):
-        factor = 1 - (i * 0.2)
-        r_color = int(180 * factor)
-        draw.ellipse((center-inner_radius*factor, center-inner_radius*factor, 
-                      center+inner_radius*factor, center+inner_radius*factor), 
-                     fill=(r_color, 0, 0))
-    
-    # Add lens highlight (top-left)
-    highlight_radius = inner_radius // 3
-    highlight_offset = inner_radius // 2
-    draw.ellipse((center-highlight_offset, center-highlight_offset, 
-                  center-highlight_offset+highlight_radius, center-highlight_offset+highlight_radius), 
-                 fill=(255, 150, 150, 180))
-    
-    # Add a smaller highlight
-    small_highlight = highlight_radius // 2
-    small_offset = highlight_offset + highlight_radius // 2
-    draw.ellipse((center-small_offset, center-small_offset, 
-                  center-small_offset+small_highlight, center-small_offset+small_highlight), 
-                 fill=(255, 255, 255, 200))
-    
-    return image
-
 def animate_eye():
-    global animation_frame, lens_reflection_angle, speaking
-    animation_frame += 1
-    lens_reflection_angle += 0.01
+    global animation_frame, lens_reflection_angle, speaking, eye_frame_due
+    global eye_after_id, eye_frame_interval, eye_frame_key, eye_canvas_item
+    eye_after_id = None
+    frame_started = time.perf_counter()
+    
+    # Paced speech is rendered in step with the eye
+    tick_speech()
+    
+    if not eye_visible:
+        # Nothing to draw; keep ticking only while paced speech is still being typed out
+        eye_frame_due = None
+        if speech_active:
+            eye_frame_interval = EYE_ACTIVE_FRAME_MS
+            eye_after_id = root.after(EYE_ACTIVE_FRAME_MS, animate_eye)
+        return
+    
+    # Advance in units of active frames, however long it has been since the last one
+    elapsed_frames = 1.0
+    if eye_frame_due is not None:
+        late_ms = (frame_started - eye_frame_due) * 1000
+        # Frames that should have been drawn while the loop was busy count as dropped
+        if late_ms >= eye_frame_interval:
+            increment_metric("dropped_frames", int(late_ms / eye_frame_interval))
+        # A woken animation runs early, so late_ms can be negative
+        elapsed_frames = min(10.0, max(0.0, eye_frame_interval + late_ms) / EYE_ACTIVE_FRAME_MS)
+    animation_frame += elapsed_frames
+    lens_reflection_angle += 0.01 * elapsed_frames
     
     # Create pulsing effect using sine wave
     pulse_factor = 1.0 + breathing_intensity * math.sin(animation_frame * pulse_speed)
@@ -497,12 +726,17 @@ def animate_eye():
     # Get base eye image and resize according to pulse
     base_size = 400
     display_size = int(base_size * pulse_factor)
+    display_size -= display_size % render.EYE_SIZE_STEP
     
-    # Create the eye image
-    eye_image = create_hal_eye(display_size)
+    # Work out the glow level when processing or speaking
+    glow_level = 0
+    if glow_intensity > 0 or speaking:
+        glow_intensity_current = glow_intensity
+        if speaking:
+            # Pulsating glow when speaking
+            glow_intensity_current = 0.3 + 0.2 * math.sin(animation_frame * 0.2)
+        glow_level = max(1, round(glow_intensity_current * render.EYE_GLOW_STEPS))
     
-    # Add dynamic lens reflection
-    draw = ImageDraw.Draw(eye_image)
     center = display_size // 2
     inner_radius = int(display_size * 0.25)
     
@@ -511,93 +745,231 @@ def animate_eye():
     refl_y = center + int(inner_radius * 0.3 * math.sin(lens_reflection_angle))
     refl_size = inner_radius // 4
     
-    draw.ellipse((refl_x-refl_size, refl_y-refl_size, 
-                  refl_x+refl_size, refl_y+refl_size), 
-                 fill=(255, 200, 200, 150))
-    
-    # Add a second smaller reflection
+    # Second smaller reflection
     refl2_x = center - int(inner_radius * 0.4 * math.sin(lens_reflection_angle * 0.7))
     refl2_y = center - int(inner_radius * 0.4 * math.cos(lens_reflection_angle * 0.7))
     refl2_size = inner_radius // 6
     
-    draw.ellipse((refl2_x-refl2_size, refl2_y-refl2_size, 
-                  refl2_x+refl2_size, refl2_y+refl2_size), 
-                 fill=(255, 220, 220, 120))
+    # Calculate position to center the eye
+    x_pos = (canvas.winfo_width() - display_size) // 2
+    y_pos = (canvas.winfo_height() - display_size) // 2
     
-    # Add glow effect when processing or speaking
-    if glow_intensity > 0 or speaking:
-        # Create a copy for the glow effect
-        glow_img = eye_image.copy()
+    frame_key = (display_size, glow_level, refl_x, refl_y, refl2_x, refl2_y, x_pos, y_pos)
+    if frame_key != eye_frame_key:
+        eye_frame_key = frame_key
         
-        # Apply blur for glow
-        glow_intensity_current = glow_intensity
-        if speaking:
-            # Pulsating glow when speaking
-            glow_intensity_current = 0.3 + 0.2 * math.sin(animation_frame * 0.2)
-            
-        glow_img = glow_img.filter(ImageFilter.GaussianBlur(radius=10 * glow_intensity_current))
+        reflections = ((refl_x, refl_y, refl_size, (255, 200, 200, 150)),
+                       (refl2_x, refl2_y, refl2_size, (255, 220, 220, 120)))
+        eye_image = render.render_eye(display_size, glow_level, reflections)
         
-        # Enhance brightness for the glow
-        enhancer = ImageEnhance.Brightness(glow_img)
-        glow_img = enhancer.enhance(1.5)
+        # Convert to PhotoImage for tkinter
+        photo = ImageTk.PhotoImage(eye_image)
         
-        # Composite the glow under the main image
-        composite = Image.new('RGBA', glow_img.size, (0, 0, 0, 0))
-        composite.paste(glow_img, (0, 0))
-        composite.paste(eye_image, (0, 0), eye_image)
-        eye_image = composite
-    
-    # Convert to PhotoImage for tkinter
-    photo = ImageTk.PhotoImage(eye_image)
+        # One image item lives on the canvas; each frame only swaps its image and position
+        if eye_canvas_item is None:
+            eye_canvas_item = canvas.create_image(x_pos, y_pos, anchor=tk.NW, image=photo)
+        else:
+            canvas.itemconfig(eye_canvas_item, image=photo)
+            canvas.coords(eye_canvas_item, x_pos, y_pos)
+        canvas.image = photo  # Keep a reference to prevent garbage collection
     
-    # Update canvas
-    canvas.delete("all")
+    observe_metric("frame", (time.perf_counter() - frame_started) * 1000)
     
-    # Calculate position to center the eye
-    x_pos = (canvas.winfo_width() - display_size) // 2
-    y_pos = (canvas.winfo_height() - display_size) // 2
+    # Schedule next animation frame at the rate the current state needs
+    eye_frame_interval = get_eye_frame_interval()
+    eye_frame_due = time.perf_counter() + eye_frame_interval / 1000
+    eye_after_id = root.after(eye_frame_interval, animate_eye)
+
+# Function to pick the animation frame interval for the current state
+def get_eye_frame_interval():
+    if speaking or speech_active or glow_intensity > 0 or pulse_speed != DEFAULT_PULSE_SPEED:
+        return EYE_ACTIVE_FRAME_MS  # Smoother animation (25 fps) while thinking or speaking
+    if root.focus_displayof() is not None:
+        return EYE_IDLE_FRAME_MS
+    return EYE_BACKGROUND_FRAME_MS
+
+# Function to draw the next frame now if the animation is idling or stopped
+def wake_eye_animation():
+    global eye_after_id
     
-    # Create image on canvas
-    canvas.create_image(x_pos, y_pos, anchor=tk.NW, image=photo)
-    canvas.image = photo  # Keep a reference to prevent garbage collection
+    if eye_after_id is not None:
+        if eye_frame_interval == EYE_ACTIVE_FRAME_MS:
+            return
+        root.after_cancel(eye_after_id)
+        eye_after_id = None
+    animate_eye()
+
+# Track whether the eye can be seen, stopping the animation while it can't
+def on_eye_visibility(event):
+    global eye_visible
     
-    # Schedule next animation frame
-    root.after(40, animate_eye)  # Smoother animation (25 fps)
+    if event.type == tk.EventType.Unmap:
+        if event.widget is not root:
+            return
+        eye_visible = False
+    elif event.type == tk.EventType.Map:
+        if event.widget is not root:
+            return
+        eye_visible = True
+    else:
+        eye_visible = event.state != "VisibilityFullyObscured"
+    if eye_visible:
+        wake_eye_animation()
 
 # Voice simulation effect for HAL's responses
 def hal_speak(text):
-    words = text.split()
+    session = begin_speech()
+    feed_speech(session, text)
+    end_speech(session)
+
+# Start a speech session. Each session writes at its own text mark, so concurrent
+# responses and other console output never interleave inside it.
+def begin_speech(paced=None):
+    global speech_active
     
-    # Clear any existing text in the speaking buffer
-    if hasattr(output_area, 'speaking_buffer'):
-        output_area.delete("speaking_buffer.first", "speaking_buffer.last")
+    if paced is None:
+        paced = hal_pacing
+    session = {"mark": None, "words": deque(), "partial": "", "finished": False, "paced": paced}
+    if session["paced"]:
+        # Paced sessions are spoken one after another by tick_speech()
+        speech_queue.append(session)
+        speech_active = True
+    else:
+        open_speech_mark(session)
+    wake_eye_animation()
+    return session
+
+# Reserve a line at the end of the console for a speech session
+def open_speech_mark(session):
+    global speech_counter
     
-    # Create a new tag for this speaking session
-    output_area.tag_add("speaking_buffer", output_area.index(tk.END))
+    speech_counter += 1
+    session["mark"] = f"speech{speech_counter}"
+    output_area.insert(tk.END, "\n", "ai")
+    # Text inserted at a right-gravity mark lands before it, keeping the reserved newline last
+    output_area.mark_set(session["mark"], "end-2c")
+    output_area.mark_gravity(session["mark"], tk.RIGHT)
+
+# Add text to a speech session
+def feed_speech(session, text):
+    if not text or session["finished"]:
+        return
     
-    # Display words one by one with a slight delay
-    def display_word(index):
-        if index < len(words):
-            output_area.insert(tk.END, words[index] + " ", "ai")
-            output_area.yview(tk.END)
-            output_area.update()
-            
-            # Schedule next word with a variable delay
-            # Punctuation gets a longer pause
-            delay = 100
-            if index < len(words) - 1 and any(p in words[index] for p in ['.', '?', '!']):
-                delay = 300
-            elif index < len(words) - 1 and any(p in words[index] for p in [',', ';', ':']):
-                delay = 200
-                
-            root.after(delay, lambda: display_word(index + 1))
-        else:
-            # End of text, reset speaking state
-            global speaking
-            speaking = False
+    if not session["paced"]:
+        # Unpaced: show the text as soon as it arrives
+        output_area.insert(session["mark"], text, "ai")
+        scroll_console_to_end()
+        return
+    
+    # Paced: split into whole words, keeping a trailing partial word for the next chunk
+    queue_speech_words(session, text)
+
+# Queue the whole words of text for a paced session
+def queue_speech_words(session, text, final=False):
+    global speech_queued_words
+    
+    session["partial"] += text
+    if final:
+        words = [session["partial"]] if session["partial"] else []
+    else:
+        words = re.findall(r'\s*\S+\s+', session["partial"])
+    consumed = sum(len(word) for word in words)
+    session["partial"] = session["partial"][consumed:]
+    session["words"].extend(words)
+    speech_queued_words += len(words)
+
+# Mark a speech session as complete
+def end_speech(session):
+    if session["finished"]:
+        return
+    if session["paced"]:
+        queue_speech_words(session, "", final=True)
+    session["finished"] = True
+    if not session["paced"]:
+        close_speech(session)
+
+# Abandon whatever a session has not said yet
+def cancel_speech(session):
+    global speech_queued_words
+    
+    speech_queued_words -= len(session["words"])
+    session["words"].clear()
+    session["partial"] = ""
+    feed_speech(session, " [cancelled]")
+    end_speech(session)
+
+# Release a finished session's text mark
+def close_speech(session):
+    global speaking
+    
+    if session["mark"] is not None:
+        output_area.mark_unset(session["mark"])
+        session["mark"] = None
+    if not speech_active:
+        speaking = False
+
+# Pause after a word; punctuation gets a longer pause
+def get_word_delay(word):
+    if any(p in word for p in ['.', '?', '!']):
+        return 0.3
+    if any(p in word for p in [',', ';', ':']):
+        return 0.2
+    return 0.1
+
+# Called once per animation frame: insert every paced word that is due in one go
+def tick_speech():
+    global speech_active, speaking, speech_queued_words, speech_next_due, speech_skip
+    
+    if not speech_active:
+        return
+    
+    now = time.monotonic()
+    while speech_queue:
+        session = speech_queue[0]
+        if session["mark"] is None:
+            # Start speaking the next queued response
+            open_speech_mark(session)
+        # Don't make up for time spent waiting on the stream with a burst of words
+        speech_next_due = max(speech_next_due, now - CONSOLE_FRAME_MS / 1000)
+        
+        # Speed up when the backlog would take too long to say at the normal cadence. A session
+        # never slows down again, so a large payload drains in about SPEECH_MAX_LAG_SECONDS.
+        speed = max(session.get("speed", 1.0),
+                    speech_queued_words * SPEECH_AVERAGE_WORD_DELAY / SPEECH_MAX_LAG_SECONDS)
+        session["speed"] = speed
+        flush_all = speech_skip or speech_queued_words > SPEECH_MAX_QUEUED_WORDS
+        
+        batch = []
+        while session["words"] and (flush_all or speech_next_due <= now):
+            word = session["words"].popleft()
+            batch.append(word)
+            speech_next_due += get_word_delay(word) / speed
+        speech_queued_words -= len(batch)
+        if batch:
+            output_area.insert(session["mark"], "".join(batch), "ai")
+            scroll_console_to_end()
+        
+        if session["words"] or not session["finished"]:
+            # More is due on a later frame, or still streaming
+            break
+        
+        # End of text, move on to the next queued response in the same frame
+        speech_queue.popleft()
+        close_speech(session)
+    
+    if not speech_queue:
+        # Nothing left to say, reset speaking state
+        speech_active = False
+        speaking = False
+        speech_skip = False
+
+# Show everything HAL is still going to say right away
+def skip_speech():
+    global speech_skip
     
-    # Start displaying words
-    display_word(0)
+    if speech_active:
+        speech_skip = True
+        tick_speech()
 
 # Help function to show available commands
 def show_help():
@@ -609,202 +981,311 @@ Application Launcher:
   /l [app name]    - Launch the top matching application
 
 System Commands:
-  ![command]       - Execute system command
+  ![command]       - Execute system command (output streams in as a job)
+  /jobs            - List running commands
+  /kill [n|all]    - Stop the latest (or given) running command
   
 General:
   /help            - Show this help message
   /clear           - Clear the console
+  /history         - Page older console history back in (or scroll to the top)
+  /cancel [n|all]  - Cancel the latest (or given) outstanding request
+  /pace            - Toggle HAL's typing cadence for streamed answers
+  /skip, Escape    - Show the rest of HAL's current answers at once
+  /session [clear] - Show per-turn token usage, or forget the conversation
+  /cache [clear|on|off] - Inspect, clear or toggle the response cache
+  /stats [reset]   - Show timing percentiles and counters
   
 You can also ask me any question in natural language.
 """
     output_area.insert(tk.END, f"\nHAL: {help_text}\n", "ai")
-    output_area.yview(tk.END)
+    scroll_console_to_end()
 
 # Clear console function
 def clear_console():
+    global console_history_bytes
+    
     output_area.delete(1.0, tk.END)
+    console_history.clear()
+    console_history_bytes = 0
     output_area.insert(tk.END, "SUNDAR 2000: Console cleared. I am ready for your commands.\n", "ai")
 
-# GUI Setup
-root = tk.Tk()
-root.title("SUNDAR 2000")
-root.geometry("800x800")
-root.configure(bg="black")
-root.minsize(600, 700)  # Minimum window size
-
-# Set window icon (if available)
-try:
-    icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hal9000_icon.png")
-    if os.path.exists(icon_path):
-        icon = PhotoImage(file=icon_path)
-        root.iconphoto(True, icon)
-except Exception as e:
-    print(f"Could not load icon: {e}")
-
-# Create a main frame
-main_frame = tk.Frame(root, bg="black", padx=20, pady=20)
-main_frame.pack(fill=tk.BOTH, expand=True)
-
-# Title with SUNDAR 2000 style
-title_frame = tk.Frame(main_frame, bg="black")
-title_frame.pack(fill=tk.X, pady=(0, 10))
-
-title_label = tk.Label(title_frame, text="Sundar 20000", font=("FreeSans", 28, "bold"), 
-                      bg="black", fg="#FF0000")
-title_label.pack(side=tk.LEFT, padx=10)
-
-subtitle_label = tk.Label(title_frame, text="", 
-                         font=("FreeSans", 10), bg="black", fg="#AA0000")
-subtitle_label.pack(side=tk.LEFT, padx=5, pady=12)
-
-# SUNDAR 2000 Eye (Animated)
-canvas = tk.Canvas(main_frame, width=500, height=500, bg="black", 
-                  highlightthickness=0)
-canvas.pack(pady=10)
-
-# Frame for the console area with HAL-style border
-console_frame = tk.Frame(main_frame, bg="#111111", bd=2, relief=tk.GROOVE, 
-                        highlightbackground="#550000", highlightthickness=2)
-console_frame.pack(fill=tk.BOTH, expand=True, pady=10)
-
-# Console header
-console_header = tk.Frame(console_frame, bg="#220000", height=25)
-console_header.pack(fill=tk.X)
-
-header_label = tk.Label(console_header, text="COMMUNICATION INTERFACE", 
-                       font=("Courier New", 10), bg="#220000", fg="#FF0000")
-header_label.pack(side=tk.LEFT, padx=10, pady=2)
-
-# Output Area with HAL-style font and colors
-output_area = scrolledtext.ScrolledText(
-    console_frame, 
-    wrap=tk.WORD, 
-    bg="#000000", 
-    fg="#CCCCCC", 
-    font=("Courier New", 12),
-    insertbackground="#FF0000",
-    selectbackground="#550000",
-    padx=10,
-    pady=10
-)
-output_area.pack(padx=10, pady=(0, 10), fill=tk.BOTH, expand=True)
-output_area.insert(tk.END, "SUNDAR 2000: I am a SUNDAR 2000 computer, fully operational and ready to assist.\n", "ai")
-output_area.insert(tk.END, "SUNDAR 2000: Type /help to see available commands.\n", "ai")
-
-# Input area frame with HAL-style border
-input_frame = tk.Frame(main_frame, bg="#111111", bd=2, relief=tk.GROOVE,
-                      highlightbackground="#550000", highlightthickness=1)
-input_frame.pack(fill=tk.X, pady=5)
-
-# Input label
-input_label = tk.Label(input_frame, text=">", font=("Courier New", 12, "bold"), 
-                      bg="#000000", fg="#FF0000")
-input_label.pack(side=tk.LEFT, padx=5, pady=10)
-
-# Input Field with HAL-style
-entry = tk.Entry(
-    input_frame, 
-    font=("Courier New", 12), 
-    bg="#000000", 
-    fg="#FFFFFF", 
-    insertbackground="#FF0000",
-    bd=0,
-    relief=tk.FLAT,
-    width=50
-)
-entry.pack(side=tk.LEFT, padx=5, pady=10, fill=tk.X, expand=True)
-
-# Application search results listbox
-app_listbox = Listbox(
-    main_frame,
-    font=("Courier New", 11),
-    bg="#000000",
-    fg="#CCCCCC",
-    selectbackground="#550000",
-    selectforeground="#FFFFFF",
-    bd=1,
-    relief=tk.SOLID,
-    highlightthickness=1,
-    highlightbackground="#550000"
-)
-app_listbox.bind("<Double-Button-1>", select_app)  # Double-click to select
-
-# Button Frame
-button_frame = tk.Frame(main_frame, bg="black")
-button_frame.pack(pady=5, fill=tk.X)
-
-# Send Button
-send_button = tk.Button(
-    button_frame, 
-    text="Send", 
-    command=process_input, 
-    font=("Arial", 12), 
-    bg="#550000", 
-    fg="white",
-    activebackground="#880000",
-    activeforeground="white",
-    bd=0,
-    padx=20,
-    pady=5
-)
-send_button.pack(side=tk.LEFT, padx=5)
-
-# Help Button
-help_button = tk.Button(
-    button_frame, 
-    text="Help", 
-    command=show_help, 
-    font=("Arial", 12), 
-    bg="#333333", 
-    fg="white",
-    activebackground="#444444",
-    activeforeground="white",
-    bd=0,
-    padx=20,
-    pady=5
-)
-help_button.pack(side=tk.LEFT, padx=5)
-
-# Toggle System Commands Button
-toggle_button = tk.Button(
-    button_frame, 
-    text="Commands: ON", 
-    command=toggle_commands, 
-    font=("Arial", 12), 
-    bg="#333333", 
-    fg="white",
-    activebackground="#444444",
-    activeforeground="white",
-    bd=0,
-    padx=20,
-    pady=5
-)
-toggle_button.pack(side=tk.RIGHT, padx=5)
-
-# Status bar
-status_bar = tk.Label(
-    root, 
-    text="SUNDAR 2000 • Fully Operational • " + datetime.datetime.now().strftime("%Y-%m-%d"),
-    bd=1,
-    relief=tk.SUNKEN,
-    anchor=tk.W,
-    bg="#111111",
-    fg="#FF0000",
-    font=("Courier New", 10)
-)
-status_bar.pack(side=tk.BOTTOM, fill=tk.X)
-
-# Output Tags
-output_area.tag_config("user", foreground="#8888FF")
-output_area.tag_config("ai", foreground="#FF3333")
-
-# Bind key events
-entry.bind("<KeyPress>", handle_entry_key)
-entry.focus_set()  # Set focus to entry field
-
-# Start animation after window is fully loaded
-root.update()
-animate_eye()
-
-# Run GUI
-root.mainloop()
+# Scroll the console to the end on the next frame, however many inserts happen before it
+def scroll_console_to_end():
+    global console_flush_scheduled
+    
+    if not console_flush_scheduled:
+        console_flush_scheduled = True
+        root.after(CONSOLE_FRAME_MS, flush_console)
+
+# Once per frame: if the user was watching the end of the output, trim the scrollback
+# if needed and follow the new end
+def flush_console():
+    global console_flush_scheduled
+    
+    console_flush_scheduled = False
+    if output_area.bbox(CONSOLE_END_MARK) is None:
+        # Scrolled back, e.g. into paged-in history; stay put until they return to the end
+        return
+    trim_console()
+    output_area.yview(tk.END)
+    output_area.mark_set(CONSOLE_END_MARK, "end-1c")
+
+# Move the oldest lines into the compressed history store once the console is over its limit
+def trim_console():
+    global console_history_bytes
+    
+    line_count = int(output_area.index("end-1c").split(".")[0])
+    excess = line_count - CONSOLE_MAX_LINES
+    if excess < CONSOLE_TRIM_BATCH:
+        return
+    
+    cut = f"{excess + 1}.0"
+    block = zlib.compress(output_area.get("1.0", cut).encode("utf-8"))
+    output_area.delete("1.0", cut)
+    console_history.append(block)
+    console_history_bytes += len(block)
+    
+    # The oldest history is dropped for good once the store is full (the log keeps everything)
+    while console_history_bytes > CONSOLE_HISTORY_MAX_BYTES and console_history:
+        console_history_bytes -= len(console_history.pop(0))
+
+# Page the most recently trimmed block back in above the current text
+def load_console_history():
+    global console_history_bytes
+    
+    if not console_history:
+        return False
+    block = console_history.pop()
+    console_history_bytes -= len(block)
+    text = zlib.decompress(block).decode("utf-8")
+    output_area.insert("1.0", text, "history")
+    
+    # Keep the line the user was looking at in place
+    line_count = text.count("\n")
+    output_area.yview(f"{line_count + 1}.0")
+    return True
+
+# Scrollbar callback for the console: reaching the top pages in older history
+def on_console_scroll(first, last):
+    output_area.vbar.set(first, last)
+    if console_history and float(first) <= 0.0 and float(last) < 1.0:
+        root.after_idle(load_console_history)
+
+# GUI Setup; importing this module (e.g. from hal_bench.py) doesn't open the window
+if __name__ == "__main__":
+    root = tk.Tk()
+    root.title("SUNDAR 2000")
+    root.geometry("800x800")
+    root.configure(bg="black")
+    root.minsize(600, 700)  # Minimum window size
+
+    # Set window icon (if available)
+    try:
+        icon_path = os.path.join(os.path.dirname(os.path.abspath(__file__)), "hal9000_icon.png")
+        if os.path.exists(icon_path):
+            icon = PhotoImage(file=icon_path)
+            root.iconphoto(True, icon)
+    except Exception as e:
+        print(f"Could not load icon: {e}")
+
+    # Create a main frame
+    main_frame = tk.Frame(root, bg="black", padx=20, pady=20)
+    main_frame.pack(fill=tk.BOTH, expand=True)
+
+    # Title with SUNDAR 2000 style
+    title_frame = tk.Frame(main_frame, bg="black")
+    title_frame.pack(fill=tk.X, pady=(0, 10))
+
+    title_label = tk.Label(title_frame, text="Sundar 20000", font=("FreeSans", 28, "bold"), 
+                          bg="black", fg="#FF0000")
+    title_label.pack(side=tk.LEFT, padx=10)
+
+    subtitle_label = tk.Label(title_frame, text="", 
+                             font=("FreeSans", 10), bg="black", fg="#AA0000")
+    subtitle_label.pack(side=tk.LEFT, padx=5, pady=12)
+
+    # SUNDAR 2000 Eye (Animated)
+    canvas = tk.Canvas(main_frame, width=500, height=500, bg="black", 
+                      highlightthickness=0)
+    canvas.pack(pady=10)
+    # Stop drawing the eye while the window is minimized or covered
+    root.bind("<Map>", on_eye_visibility)
+    root.bind("<Unmap>", on_eye_visibility)
+    canvas.bind("<Visibility>", on_eye_visibility)
+
+    # Frame for the console area with HAL-style border
+    console_frame = tk.Frame(main_frame, bg="#111111", bd=2, relief=tk.GROOVE, 
+                            highlightbackground="#550000", highlightthickness=2)
+    console_frame.pack(fill=tk.BOTH, expand=True, pady=10)
+
+    # Console header
+    console_header = tk.Frame(console_frame, bg="#220000", height=25)
+    console_header.pack(fill=tk.X)
+
+    header_label = tk.Label(console_header, text="COMMUNICATION INTERFACE", 
+                           font=("Courier New", 10), bg="#220000", fg="#FF0000")
+    header_label.pack(side=tk.LEFT, padx=10, pady=2)
+
+    # Output Area with HAL-style font and colors
+    output_area = scrolledtext.ScrolledText(
+        console_frame, 
+        wrap=tk.WORD, 
+        bg="#000000", 
+        fg="#CCCCCC", 
+        font=("Courier New", 12),
+        insertbackground="#FF0000",
+        selectbackground="#550000",
+        padx=10,
+        pady=10
+    )
+    output_area.pack(padx=10, pady=(0, 10), fill=tk.BOTH, expand=True)
+    output_area.insert(tk.END, "SUNDAR 2000: I am a SUNDAR 2000 computer, fully operational and ready to assist.\n", "ai")
+    output_area.insert(tk.END, "SUNDAR 2000: Type /help to see available commands.\n", "ai")
+
+    # Input area frame with HAL-style border
+    input_frame = tk.Frame(main_frame, bg="#111111", bd=2, relief=tk.GROOVE,
+                          highlightbackground="#550000", highlightthickness=1)
+    input_frame.pack(fill=tk.X, pady=5)
+
+    # Input label
+    input_label = tk.Label(input_frame, text=">", font=("Courier New", 12, "bold"), 
+                          bg="#000000", fg="#FF0000")
+    input_label.pack(side=tk.LEFT, padx=5, pady=10)
+
+    # Input Field with HAL-style
+    entry = tk.Entry(
+        input_frame, 
+        font=("Courier New", 12), 
+        bg="#000000", 
+        fg="#FFFFFF", 
+        insertbackground="#FF0000",
+        bd=0,
+        relief=tk.FLAT,
+        width=50
+    )
+    entry.pack(side=tk.LEFT, padx=5, pady=10, fill=tk.X, expand=True)
+
+    # Application search results listbox
+    app_listbox = Listbox(
+        main_frame,
+        font=("Courier New", 11),
+        bg="#000000",
+        fg="#CCCCCC",
+        selectbackground="#550000",
+        selectforeground="#FFFFFF",
+        bd=1,
+        relief=tk.SOLID,
+        highlightthickness=1,
+        highlightbackground="#550000"
+    )
+    app_listbox.bind("<Double-Button-1>", select_app)  # Double-click to select
+
+    # Button Frame
+    button_frame = tk.Frame(main_frame, bg="black")
+    button_frame.pack(pady=5, fill=tk.X)
+
+    # Send Button
+    send_button = tk.Button(
+        button_frame, 
+        text="Send", 
+        command=process_input, 
+        font=("Arial", 12), 
+        bg="#550000", 
+        fg="white",
+        activebackground="#880000",
+        activeforeground="white",
+        bd=0,
+        padx=20,
+        pady=5
+    )
+    send_button.pack(side=tk.LEFT, padx=5)
+
+    # Help Button
+    help_button = tk.Button(
+        button_frame, 
+        text="Help", 
+        command=show_help, 
+        font=("Arial", 12), 
+        bg="#333333", 
+        fg="white",
+        activebackground="#444444",
+        activeforeground="white",
+        bd=0,
+        padx=20,
+        pady=5
+    )
+    help_button.pack(side=tk.LEFT, padx=5)
+
+    # Toggle System Commands Button
+    toggle_button = tk.Button(
+        button_frame, 
+        text="Commands: ON", 
+        command=toggle_commands, 
+        font=("Arial", 12), 
+        bg="#333333", 
+        fg="white",
+        activebackground="#444444",
+        activeforeground="white",
+        bd=0,
+        padx=20,
+        pady=5
+    )
+    toggle_button.pack(side=tk.RIGHT, padx=5)
+
+    # Status bar
+    status_bar = tk.Label(
+        root, 
+        text="SUNDAR 2000 • Fully Operational • " + datetime.datetime.now().strftime("%Y-%m-%d"),
+        bd=1,
+        relief=tk.SUNKEN,
+        anchor=tk.W,
+        bg="#111111",
+        fg="#FF0000",
+        font=("Courier New", 10)
+    )
+    status_bar.pack(side=tk.BOTTOM, fill=tk.X)
+
+    # Output Tags
+    output_area.tag_config("user", foreground="#8888FF")
+    output_area.tag_config("ai", foreground="#FF3333")
+    output_area.tag_config("history", foreground="#777777")
+
+    # Text inserted at the end goes after the mark, so it keeps the old end's position
+    output_area.mark_set(CONSOLE_END_MARK, "end-1c")
+    output_area.mark_gravity(CONSOLE_END_MARK, "left")
+
+    # Reaching the top of the scrollback pages in trimmed history
+    output_area.configure(yscrollcommand=on_console_scroll)
+
+    # Bind key events
+    entry.bind("<KeyPress>", handle_entry_key)
+    entry.focus_set()  # Set focus to entry field
+
+    # Start animation after window is fully loaded
+    root.update()
+    animate_eye()
+    root.update_idletasks()
+    observe_metric("startup_first_frame", (time.monotonic() - startup_started) * 1000)
+
+    # Only now load the Gemini SDK, on a worker, so the first request doesn't wait for it
+    llm.llm_executor.submit(warm_up_llm)
+
+    # Load the saved application index and bring it up to date in the background
+    launcher.start_desktop_refresh()
+    watch_desktop_refresh()
+
+    # Keep the Prometheus metrics file current if one is configured
+    if metrics.METRICS_FILE:
+        schedule_metrics_export()
+
+    # Run GUI
+    root.mainloop()
+
+    # Don't wait for outstanding LLM requests once the window is gone
+    llm.llm_executor.shutdown(wait=False, cancel_futures=True)
+
+    # Write out any log records still queued, and the final metrics
+    stop_log_writer()
+    if metrics.METRICS_FILE:
+        metrics.export_metrics()
@@ -0,0 +1,306 @@
+#!/usr/bin/env python3
+# Headless benchmarks for SUNDAR 2000: eye rendering, desktop file parsing,
+# application search, command safety checks and the LLM request path.
+# Runs without a display against the sundar core modules; Gemini is replaced by a
+# local stub, so no API key is needed.
+
+import argparse
+import json
+import os
+import random
+import shutil
+import statistics
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+import types
+
+from sundar import launcher, llm, render, safety
+
+FRAME_BUDGET_MS = 40  # The GUI's frame interval while HAL is thinking or speaking
+
+APP_WORDS = ["fire", "fox", "text", "editor", "terminal", "image", "viewer", "music", "player", "office",
+             "writer", "calc", "mail", "chat", "video", "studio", "code", "paint", "disk", "backup",
+             "system", "monitor", "file", "manager", "web", "browser", "game", "chess", "photo", "archive"]
+SEARCH_QUERIES = ["firefox", "text editor", "terminal", "music player", "photo", "system monitor", "zzz"]
+SAFETY_COMMANDS = ["ls -la", "df -h", "rm -rf /", "echo hello | tr a-z A-Z", "dd if=/dev/zero of=x",
+                   "git status", "sudo shutdown now", "find . -name '*.py' | xargs wc -l"]
+SAFETY_EXTRA_RULES = 500
+LAUNCHED_APPS = 200  # Apps with launch history in the frecency-ranked search timings
+
+# Function to summarize a list of timings in milliseconds
+def summarize(name, timings_ms, extra=None):
+    timings_ms = sorted(timings_ms)
+    total_seconds = sum(timings_ms) / 1000
+    result = {
+        "name": name,
+        "count": len(timings_ms),
+        "p50_ms": timings_ms[len(timings_ms) // 2],
+        "p95_ms": timings_ms[min(len(timings_ms) - 1, int(0.95 * len(timings_ms)))],
+        "p99_ms": timings_ms[min(len(timings_ms) - 1, int(0.99 * len(timings_ms)))],
+        "mean_ms": statistics.fmean(timings_ms),
+        "ops_per_second": len(timings_ms) / total_seconds if total_seconds else float("inf")
+    }
+    result.update(extra or {})
+    return result
+
+# Function to time repeated calls of fn, in milliseconds
+def time_calls(fn, repeat):
+    timings = []
+    for _ in range(repeat):
+        started = time.perf_counter()
+        fn()
+        timings.append((time.perf_counter() - started) * 1000)
+    return timings
+
+# Function to write a synthetic corpus of .desktop files
+def generate_desktop_corpus(directory, count, seed=0):
+    rng = random.Random(seed)
+    for i in range(count):
+        words = rng.sample(APP_WORDS, 3)
+        name = " ".join(word.capitalize() for word in words[:2])
+        with open(os.path.join(directory, f"app{i:05d}.desktop"), "w", encoding="utf-8") as f:
+            f.write("[Desktop Entry]\n"
+                    f"Name={name} {i}\n"
+                    f"GenericName={words[2].capitalize()} {words[0]}\n"
+                    f"Comment=Synthetic {' '.join(rng.sample(APP_WORDS, 4))}\n"
+                    f"Keywords={';'.join(rng.sample(APP_WORDS, 3))};\n"
+                    f"Exec={words[0]}-{words[1]} %U\n"
+                    "Icon=application-x-executable\n"
+                    "Type=Application\n"
+                    "\n[Desktop Action new-window]\n"
+                    "Name=New Window\n"
+                    f"Exec={words[0]}-{words[1]} --new-window\n")
+
+# Function to point the desktop index at a corpus and forget whatever was loaded
+def use_desktop_corpus(directory, index_file):
+    launcher.DESKTOP_DIRS = [directory]
+    launcher.DESKTOP_INDEX_FILE = index_file
+    launcher.desktop_index = {}
+    launcher.desktop_files_cache = {}
+    launcher.app_search_index = None
+    launcher.desktop_paths_by_id = launcher.desktop_ids_by_name = None
+    launcher.search_result_cache.clear()
+    # Rank by the fuzzy score alone, without reading the real launch history
+    launcher.launch_stats = {}
+
+# Benchmark rendering the eye at the sizes the pulse goes through
+def bench_render(repeat):
+    results = []
+    reflections = lambda size: ((size // 2 + 10, size // 2 - 7, int(size * 0.25) // 4, (255, 200, 200, 150)),
+                                (size // 2 - 15, size // 2 - 20, int(size * 0.25) // 6, (255, 220, 220, 120)))
+    for size in (340, 400, 460):
+        results.append(summarize(f"render.create_hal_eye[{size}]",
+                                 time_calls(lambda: render.create_hal_eye(size), max(1, repeat // 10))))
+        renderers = [("pil", render.render_eye_pil)]
+        if render.load_numpy():
+            renderers.append(("numpy", render.render_eye_numpy))
+        for glow_level in (0, 5, 10):
+            for name, render_frame in renderers:
+                render.eye_frame_cache.clear()
+                render.eye_frame_cache_bytes = 0
+                render.eye_lut_cache.clear()
+                cold = time_calls(lambda: render_frame(size, glow_level, reflections(size)), 1)
+                warm = time_calls(lambda: render_frame(size, glow_level, reflections(size)), repeat)
+                results.append(summarize(f"render.{name}[{size},glow={glow_level}]", warm,
+                                         {"cold_ms": cold[0], "budget_ms": FRAME_BUDGET_MS}))
+    return results
+
+# Benchmark indexing and searching a synthetic corpus of each size
+def bench_desktop(corpus_sizes, repeat):
+    results = []
+    for count in corpus_sizes:
+        workdir = tempfile.mkdtemp(prefix="sundar-bench-")
+        try:
+            corpus = os.path.join(workdir, "applications")
+            os.makedirs(corpus)
+            generate_desktop_corpus(corpus, count)
+            use_desktop_corpus(corpus, os.path.join(workdir, "desktop_index.json"))
+
+            # Cold: every file is parsed; warm: only stat calls against the saved index
+            cold = time_calls(launcher.refresh_desktop_index, 1)[0]
+            warm = time_calls(launcher.refresh_desktop_index, max(1, repeat // 20))
+            results.append(summarize(f"parse.cold[{count}]", [cold], {"files_per_second": count / cold * 1000}))
+            results.append(summarize(f"parse.warm[{count}]", warm, {"files_per_second": count / min(warm) * 1000}))
+            load = time_calls(launcher.load_desktop_index, max(1, repeat // 20))
+            results.append(summarize(f"parse.load_index[{count}]", load))
+
+            # A newly installed file, applied the way the directory watcher does it
+            new_file = os.path.join(corpus, "bench-new.desktop")
+            updates = []
+            for number in range(max(1, repeat // 20)):
+                with open(new_file, "w", encoding="utf-8") as f:
+                    f.write(f"[Desktop Entry]\nName=Bench New {number}\nExec=bench-new\n")
+                updates.extend(time_calls(lambda: launcher.update_desktop_index([new_file]), 1))
+            results.append(summarize(f"watch.update[{count}]", updates))
+
+            # Type each query a key at a time, the way app search mode sees it
+            keystrokes = []
+            for _ in range(max(1, repeat // 50)):
+                launcher.search_result_cache.clear()
+                for query in SEARCH_QUERIES:
+                    for end in range(1, len(query) + 1):
+                        keystrokes.extend(time_calls(lambda: launcher.find_matching_apps(query[:end]), 1))
+            results.append(summarize(f"search.keystroke[{count}]", keystrokes))
+            cached = time_calls(lambda: launcher.find_matching_apps(SEARCH_QUERIES[0]), repeat)
+            results.append(summarize(f"search.cached[{count}]", cached))
+
+            # The same queries with launch history blended into the ranking
+            now = time.time()
+            launcher.launch_stats = {
+                path: {"count": 1, "last": now - number * 3600, "score": 1, "app": None}
+                for number, path in enumerate(sorted(launcher.desktop_index)[:LAUNCHED_APPS])
+            }
+            launcher.launch_stats_version += 1
+            frecency = []
+            for query in [""] + SEARCH_QUERIES:
+                launcher.search_result_cache.clear()
+                frecency.extend(time_calls(lambda: launcher.find_matching_apps(query), 1))
+            results.append(summarize(f"search.frecency[{count}]", frecency))
+        finally:
+            shutil.rmtree(workdir, ignore_errors=True)
+    return results
+
+# Benchmark the command safety check
+def bench_safety(repeat):
+    commands = SAFETY_COMMANDS * 100
+    results = []
+    # Hundreds of extra rules, to show a check doesn't grow with the size of the policy
+    large_policy = "".join(f"deny tool{i} flags=-x|--exec args=/srv/{i}/*\n" for i in range(SAFETY_EXTRA_RULES))
+    policies = [("default", safety.DEFAULT_POLICY),
+                (f"rules+{SAFETY_EXTRA_RULES}", large_policy + safety.DEFAULT_POLICY)]
+    for name, text in policies:
+        policy = safety.parse_policy(text)
+        timings = time_calls(lambda: [safety.evaluate_command(command, policy) for command in commands], repeat)
+        results.append(summarize(f"safety.evaluate[{name}]", [timing / len(commands) for timing in timings]))
+    # Repeated commands are answered from the verdict cache
+    timings = time_calls(lambda: [safety.is_safe_command(command) for command in commands], repeat)
+    results.append(summarize("safety.is_safe_command", [timing / len(commands) for timing in timings]))
+    return results
+
+# Stand-in for the Gemini model: answers in a few chunks after a fixed delay
+class StubModel:
+    def __init__(self, latency, chunks=8):
+        self.latency = latency
+        self.chunks = chunks
+
+    def start_chat(self, history=()):
+        return StubChat(self)
+
+class StubChat:
+    def __init__(self, model):
+        self.model = model
+
+    def send_message(self, prompt, stream=False, request_options=None):
+        time.sleep(self.model.latency)
+        parts = [types.SimpleNamespace(text=f"I am afraid {i} ") for i in range(self.model.chunks)]
+        usage = types.SimpleNamespace(prompt_token_count=len(prompt) // 4, candidates_token_count=self.model.chunks * 4)
+        if not stream:
+            return types.SimpleNamespace(text="".join(part.text for part in parts), usage_metadata=usage)
+        return StubStream(parts, usage)
+
+class StubStream:
+    def __init__(self, parts, usage):
+        self.parts = parts
+        self.usage_metadata = usage
+
+    def __iter__(self):
+        return iter(self.parts)
+
+# Benchmark the request path (retry loop, chat setup, streaming) against the stub model
+def bench_requests(repeat, latency):
+    llm.llm_model = StubModel(latency)
+    history = [{"role": "user", "parts": ["hello"]}, {"role": "model", "parts": ["Good afternoon."]}] * 10
+    cancel_event = threading.Event()
+    chunks = []
+
+    sequential = time_calls(lambda: llm.generate_llm_response("What is the time?", cancel_event,
+                                                                  chunks.append, history), repeat)
+    results = [summarize(f"request.sequential[latency={latency * 1000:.0f}ms]", sequential)]
+
+    # Concurrent throughput through the shared worker pool
+    started = time.perf_counter()
+    futures = [llm.llm_executor.submit(llm.generate_llm_response, "What is the time?",
+                                           cancel_event, chunks.append, history) for _ in range(repeat)]
+    timings = []
+    for future in futures:
+        future.result()
+        timings.append((time.perf_counter() - started) * 1000)
+    elapsed = time.perf_counter() - started
+    results.append(summarize(f"request.pool[workers={llm.LLM_MAX_CONCURRENT_REQUESTS}]", timings,
+                             {"ops_per_second": repeat / elapsed}))
+    return results
+
+# Benchmark cold start in fresh interpreters: the core modules alone, the GUI
+# module's imports, and the Gemini SDK that the GUI loads after its first frame
+def bench_startup(repeat):
+    here = os.path.dirname(os.path.abspath(__file__))
+    scripts = [
+        ("startup.import_core", "import sundar.launcher, sundar.llm, sundar.render, sundar.safety, sundar.logs"),
+        ("startup.import_gui", "import hal9000"),
+        ("startup.import_gemini_sdk", "import google.generativeai")
+    ]
+    check = "import sys; print('google.generativeai' in sys.modules)"
+    results = []
+    for name, script in scripts:
+        timings = []
+        for _ in range(max(1, repeat // 40)):
+            started = time.perf_counter()
+            output = subprocess.run([sys.executable, "-c", f"{script}; {check}"], cwd=here,
+                                    capture_output=True, text=True)
+            timings.append((time.perf_counter() - started) * 1000)
+        if output.returncode != 0:
+            print(f"{name} failed: {output.stderr.strip().splitlines()[-1]}", file=sys.stderr)
+            continue
+        results.append(summarize(name, timings, {"sdk_loaded": float(output.stdout.strip() == "True")}))
+    return results
+
+def print_results(results):
+    print(f"{'benchmark':<42} {'count':>6} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'ops/s':>11}  notes")
+    for result in results:
+        notes = ", ".join(f"{key}={value:.1f}" for key, value in result.items() if key not in
+                          ("name", "count", "p50_ms", "p95_ms", "p99_ms", "mean_ms", "ops_per_second"))
+        print(f"{result['name']:<42} {result['count']:>6} {result['p50_ms']:>9.3f} {result['p95_ms']:>9.3f} "
+              f"{result['p99_ms']:>9.3f} {result['ops_per_second']:>11.1f}  {notes}")
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Run the SUNDAR 2000 benchmarks without a display.")
+    parser.add_argument("--only", action="append", choices=["startup", "render", "desktop", "safety", "requests"],
+                        help="run only these groups (repeatable)")
+    parser.add_argument("--corpus", type=int, action="append", metavar="N",
+                        help="synthetic .desktop corpus size (repeatable; default 100, 1000, 10000)")
+    parser.add_argument("--full", action="store_true", help="also index a 50000 file corpus")
+    parser.add_argument("--repeat", type=int, default=200, help="iterations per timing (default: %(default)s)")
+    parser.add_argument("--llm-latency", type=float, default=0.0, metavar="SECONDS",
+                        help="simulated model latency for the stub client")
+    parser.add_argument("--json", metavar="FILE", help="also write the results as JSON")
+    args = parser.parse_args(argv)
+
+    corpus_sizes = args.corpus or [100, 1000, 10000]
+    if args.full:
+        corpus_sizes.append(50000)
+    groups = args.only or ["startup", "render", "desktop", "safety", "requests"]
+
+    results = []
+    if "startup" in groups:
+        results += bench_startup(args.repeat)
+    if "render" in groups:
+        results += bench_render(args.repeat)
+    if "desktop" in groups:
+        results += bench_desktop(corpus_sizes, args.repeat)
+    if "safety" in groups:
+        results += bench_safety(args.repeat)
+    if "requests" in groups:
+        results += bench_requests(args.repeat, args.llm_latency)
+
+    print_results(results)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump({"python": sys.version.split()[0], "results": results}, f, indent=2)
+    llm.llm_executor.shutdown(wait=False, cancel_futures=True)
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
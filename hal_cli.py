@@ -0,0 +1,465 @@
+#!/usr/bin/env python3
+# Headless SUNDAR 2000: a terminal REPL, and a daemon that answers on a Unix socket
+# with the launcher index, Gemini session and command runner kept warm between queries.
+#
+#   python hal_cli.py                  interactive REPL in this process
+#   python hal_cli.py --daemon         serve queries on the socket until stopped
+#   python hal_cli.py -c "!uptime"     send one line to the daemon (or answer it here if none runs)
+#   python hal_cli.py --connect        REPL whose lines are answered by the daemon
+#
+# The protocol is one UTF-8 line per connection; the reply streams back until the
+# daemon closes the connection. Closing it early cancels the request or kills the job.
+
+import argparse
+import codecs
+import os
+import queue
+import signal
+import socket
+import sys
+import threading
+import time
+from dotenv import load_dotenv
+
+# The core modules read their settings from the environment when imported
+load_dotenv()
+
+from sundar import CACHE_DIR, launcher, llm, metrics, runner
+from sundar.logs import log_message, stop_log_writer
+from sundar.metrics import increment_metric, observe_metric
+from sundar.safety import check_command, is_safe_command
+
+SOCKET_PATH = os.getenv("SUNDAR_SOCKET") or os.path.join(os.getenv("XDG_RUNTIME_DIR") or CACHE_DIR,
+                                                         "sundar2000.sock")
+SEARCH_LIST_LIMIT = 10  # Matches shown for /d
+JOB_WAIT_SECONDS = 1.0  # How long a foreground job waits for output before checking again
+DESKTOP_INDEX_WAIT_SECONDS = 10  # How long /d and /l wait for the index right after startup
+
+# System command execution toggle (--no-commands turns it off)
+commands_enabled = True
+
+# Search caches, the chat session and the response cache aren't thread safe; the
+# daemon's connection threads take this lock around them, but not around the slow parts
+engine_lock = threading.Lock()
+
+HELP_TEXT = """SUNDAR 2000 COMMAND REFERENCE:
+
+Application Launcher:
+  /d [app name]    - List the matching desktop applications
+  /l [app name]    - Launch the top matching application
+
+System Commands:
+  ![command]       - Execute system command (Ctrl+C stops it)
+  /jobs            - List running commands (including other clients' in the daemon)
+  /kill [n|all]    - Stop the latest (or given) running command
+
+General:
+  /help            - Show this help message
+  /session [clear] - Show per-turn token usage, or forget the conversation
+  /cache [clear|on|off] - Inspect, clear or toggle the response cache
+  /stats [reset]   - Show timing percentiles and counters
+  /quit            - Leave the REPL (Ctrl+D works too)
+
+You can also ask me any question in natural language.
+"""
+
+# Function to answer one line of input, streaming the reply through write().
+# Setting hangup (the daemon does when its client disconnects) abandons the answer.
+def handle_line(user_input, write, hangup=None):
+    started = time.monotonic()
+    log_fields = {}
+    hangup = hangup or threading.Event()
+
+    if user_input == "/help":
+        write(HELP_TEXT)
+        return
+
+    # Check if it's a request to inspect or clear the conversation history
+    elif user_input == "/session" or user_input.startswith("/session "):
+        with engine_lock:
+            response = llm.chat_session_command(user_input[8:].strip())
+
+    # Check if it's a request to inspect or clear the response cache
+    elif user_input == "/cache" or user_input.startswith("/cache "):
+        with engine_lock:
+            response = llm.response_cache_command(user_input[6:].strip())
+
+    # Check if it's a request for performance statistics
+    elif user_input == "/stats" or user_input.startswith("/stats "):
+        response = metrics.stats_command(user_input[6:].strip())
+
+    # Check if it's a request to stop or list running commands
+    elif user_input == "/kill" or user_input.startswith("/kill "):
+        response = runner.kill_jobs(user_input[5:].strip())
+    elif user_input == "/jobs":
+        response = runner.list_jobs()
+
+    # Check if it's an application search
+    elif user_input.startswith("/d "):
+        app_query = user_input[3:].strip()
+        launcher.desktop_index_ready.wait(DESKTOP_INDEX_WAIT_SECONDS)
+        with engine_lock:
+            matches = launcher.find_matching_apps(app_query)[:SEARCH_LIST_LIMIT]
+        if matches:
+            response = "Applications matching your query:\n" + "\n".join(
+                f"  {number}. {app_name} ({details['exec']})"
+                for number, (app_name, details, _) in enumerate(matches, 1))
+        else:
+            response = f"I'm sorry, but I'm afraid I couldn't find any applications matching '{app_query}'"
+
+    # Check if it's a launch command
+    elif user_input.startswith("/l "):
+        try:
+            app_query = user_input[3:].strip()
+            # The index loads in the background; a one-shot -c "/l ..." can get here first
+            launcher.desktop_index_ready.wait(DESKTOP_INDEX_WAIT_SECONDS)
+            with engine_lock:
+                matches = launcher.find_matching_apps(app_query)
+
+            if matches:
+                app_name, details, _ = matches[0]  # Launch the top match
+                response = launcher.launch_application(app_name, details)
+                log_fields["app"] = app_name
+            else:
+                response = f"I'm sorry, but I'm afraid I couldn't find any applications matching '{app_query}'"
+        except Exception as e:
+            response = f"I'm sorry, but I encountered an error while attempting to launch the application: {str(e)}"
+
+    # Check if it's a system command
+    elif user_input.startswith("!"):
+        if not commands_enabled:
+            response = "I'm sorry, but I'm afraid I can't execute system commands at the moment. They have been disabled for security reasons."
+        else:
+            command = user_input[1:].strip()
+            allowed, rule = check_command(command)
+            if allowed:
+                # The job logs itself once it exits
+                run_job(command, user_input, write, hangup)
+                return
+            response = "I'm sorry, Dave, but I'm afraid I can't do that. The command has been blocked for safety reasons."
+            log_fields["rule"] = rule
+
+    else:
+        chat(user_input, write, hangup)
+        return
+
+    write(f"SUNDAR: {response}\n")
+    log_message(user_input, response, started=started, **log_fields)
+
+# Function to run a shell command in the foreground, streaming its output until it exits;
+# returns whether it succeeded
+def run_job(command, user_input, write, hangup):
+    events = queue.Queue()  # This job's events only, so concurrent clients never see each other's output
+    try:
+        job_id = runner.start_job(command, user_input, events=events)
+    except Exception as e:
+        write(f"SUNDAR: I'm sorry, but I encountered an error while executing the command: {str(e)}\n")
+        return False
+    write(f"SUNDAR: [job {job_id}] $ {command}\n")
+
+    stopping = False
+    while True:
+        try:
+            for kind, _, job, text in runner.drain_job_events(events, timeout=JOB_WAIT_SECONDS):
+                if kind == "output":
+                    write(text)
+                else:
+                    write(f"[job {job_id} {text}]\n")
+                    return job["succeeded"]
+            if not hangup.is_set():
+                continue
+        except KeyboardInterrupt:
+            pass
+        except OSError:
+            hangup.set()
+
+        # Ctrl+C, or the client went away: stop the job, but still collect its exit
+        if job_id not in runner.running_jobs:
+            return False
+        if hangup.is_set():
+            write = discard_output
+        if not stopping:
+            stopping = True
+            runner.kill_jobs(str(job_id))
+
+# Function to drop output meant for a client that has disconnected
+def discard_output(text):
+    pass
+
+# Function to ask the model, streaming its answer, then run any command it asked for
+def chat(user_input, write, hangup):
+    started = time.monotonic()
+    log_fields = {}
+
+    with engine_lock:
+        history = llm.get_chat_history()
+        cached = llm.lookup_cached_response(user_input, history)
+
+    if cached is not None:
+        increment_metric("llm_cache_hits")
+        with engine_lock:
+            llm.record_chat_turn(user_input, cached, None)
+        response = model_text = cached
+        log_fields["cached"] = True
+        write(f"SUNDAR: {response}\n")
+    else:
+        increment_metric("llm_requests")
+        chunks = queue.Queue()  # Streamed text, then None once the request is done
+        # The shared executor keeps the daemon to the same request concurrency as the GUI
+        future = llm.llm_executor.submit(llm.generate_llm_response, user_input, hangup, chunks.put,
+                                         history)
+        future.add_done_callback(lambda f: chunks.put(None))
+
+        streamed = ""
+        try:
+            write("SUNDAR: ")
+            while True:
+                text = chunks.get()
+                if text is None:
+                    break
+                if not streamed:
+                    observe_metric("llm_first_chunk", (time.monotonic() - started) * 1000)
+                streamed += text
+                write(text)
+        except (KeyboardInterrupt, OSError):
+            hangup.set()
+        if hangup.is_set():
+            # Queued requests never start; in-flight ones stop streaming and are discarded
+            future.cancel()
+            return
+
+        observe_metric("llm_request", (time.monotonic() - started) * 1000)
+        try:
+            model_text, usage = future.result()
+        except Exception as e:
+            increment_metric("llm_errors")
+            response = streamed
+            if response:
+                response += "\n"
+            response += f"I'm sorry, but I'm experiencing a malfunction in my cognitive circuits: {str(e)}"
+            log_fields["error"] = str(e)
+            model_text = None
+        else:
+            log_fields.update(usage or {})
+            if model_text:
+                # An empty reply (e.g. one blocked by the safety filters) is neither
+                # remembered nor cached, so asking again gets a fresh answer
+                with engine_lock:
+                    llm.record_chat_turn(user_input, model_text, usage)
+                    llm.store_cached_response(user_input, model_text, history)
+            response = model_text
+        # Without streaming nothing has been shown yet
+        write(response[len(streamed):] + "\n")
+
+    log_message(user_input, response, started=started, **log_fields)
+    if model_text is not None:
+        handle_llm_response(model_text, write, hangup)
+
+# Function to carry out the command JSON found in a model response, one step at a time
+def handle_llm_response(response, write, hangup):
+    steps = llm.extract_commands(response)
+    # Model-requested commands get the same checks as typed ones, all before the first runs
+    for step in steps:
+        if step.get("command_type") != "terminal":
+            continue
+        command = step.get("command")
+        if not commands_enabled:
+            write("SUNDAR: I'm sorry, but I'm afraid I can't execute system commands at the moment. "
+                  "They have been disabled for security reasons.\n")
+            return
+        if not isinstance(command, str) or not is_safe_command(command):
+            write(f"SUNDAR: I'm sorry, Dave, but I'm afraid I can't do that. "
+                  f"The command '{command}' has been blocked for safety reasons.\n")
+            return
+
+    for position, step in enumerate(steps):
+        if step.get("command_type") == "terminal":
+            # Each step waits for the one before, and a failure ends the plan
+            if not run_job(step["command"], None, write, hangup):
+                skipped = sum(1 for step in steps[position + 1:] if step.get("command_type") == "terminal")
+                if skipped and not hangup.is_set():
+                    write(f"[skipped the remaining {skipped} step{'s' if skipped != 1 else ''} of the plan]\n")
+                return
+        elif step.get("command_type") == "system" and step.get("action") == "help":
+            write(HELP_TEXT)
+
+# Function to load the desktop index and warm up the Gemini SDK in the background
+def start_engine():
+    launcher.start_desktop_refresh()
+    llm.llm_executor.submit(llm.get_llm_model)
+
+# Function to release the engine's workers and flush the log and metrics
+def stop_engine():
+    if runner.running_jobs:
+        runner.kill_jobs("all")
+    llm.llm_executor.shutdown(wait=False, cancel_futures=True)
+    stop_log_writer()
+    if metrics.METRICS_FILE:
+        metrics.export_metrics()
+
+# Function to write a reply to the terminal as it streams in
+def write_stdout(text):
+    sys.stdout.write(text)
+    sys.stdout.flush()
+
+# Function to send one line to the daemon and stream its reply through write()
+def send_to_daemon(user_input, write, path=SOCKET_PATH):
+    with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as sock:
+        sock.connect(path)
+        sock.sendall(user_input.encode("utf-8") + b"\n")
+        # A chunk can end in the middle of a multi-byte character
+        decoder = codecs.getincrementaldecoder("utf-8")("replace")
+        while True:
+            data = sock.recv(65536)
+            if not data:
+                break
+            write(decoder.decode(data))
+        write(decoder.decode(b"", final=True))
+
+# Function to read lines from the terminal and answer them until /quit or Ctrl+D
+def run_repl(handler):
+    try:
+        # Imported only for its side effect: once loaded, input() gets line editing and
+        # history. Not every platform has it.
+        import readline  # noqa: F401
+    except ImportError:
+        pass
+
+    write_stdout("SUNDAR 2000: Good afternoon. I am fully operational. Type /help for commands.\n")
+    while True:
+        try:
+            user_input = input("> ").strip()
+        except EOFError:
+            write_stdout("\n")
+            break
+        except KeyboardInterrupt:
+            write_stdout("\n")
+            continue
+
+        if not user_input:
+            continue
+        if user_input in ("/quit", "/exit"):
+            break
+        try:
+            handler(user_input, write_stdout)
+        except KeyboardInterrupt:
+            write_stdout("\n[interrupted]\n")
+        except OSError as e:
+            write_stdout(f"SUNDAR: I'm sorry, but I have lost contact with the daemon: {str(e)}\n")
+
+# Function to answer one daemon connection on its own thread
+def serve_connection(conn):
+    with conn:
+        try:
+            with conn.makefile("rb") as reader:
+                user_input = reader.readline().decode("utf-8", "replace").strip()
+            if user_input:
+                hangup = threading.Event()
+                threading.Thread(target=watch_hangup, args=(conn, hangup), name="sundar-client", daemon=True).start()
+                handle_line(user_input, lambda text: conn.sendall(text.encode("utf-8")), hangup)
+            # Wakes the hangup watcher, which is still waiting to read
+            conn.shutdown(socket.SHUT_RDWR)
+        except OSError:
+            pass  # The client went away before the reply was complete
+        except Exception as e:
+            print(f"Error answering daemon request: {e}", file=sys.stderr)
+
+# Function to notice a client disconnecting while its answer is still being prepared
+def watch_hangup(conn, hangup):
+    try:
+        # Clients send nothing after their line, so any return means the connection closed
+        conn.recv(1)
+    except OSError:
+        pass
+    hangup.set()
+
+# Function to stop the daemon on SIGTERM the same way as on Ctrl+C
+def stop_daemon(signum, frame):
+    raise SystemExit(0)
+
+# Function to serve queries on the Unix socket until interrupted
+def run_daemon(path=SOCKET_PATH):
+    if os.path.exists(path):
+        try:
+            with socket.socket(socket.AF_UNIX, socket.SOCK_STREAM) as probe:
+                probe.connect(path)
+            print(f"A SUNDAR 2000 daemon is already listening on {path}", file=sys.stderr)
+            return 1
+        except OSError:
+            os.unlink(path)  # Left behind by a daemon that didn't shut down cleanly
+
+    os.makedirs(os.path.dirname(path), exist_ok=True)
+    server = socket.socket(socket.AF_UNIX, socket.SOCK_STREAM)
+    # The socket runs shell commands on request, so only its owner may connect
+    old_umask = os.umask(0o077)
+    try:
+        server.bind(path)
+    finally:
+        os.umask(old_umask)
+    server.listen()
+
+    start_engine()
+    if metrics.METRICS_FILE:
+        threading.Thread(target=export_metrics_periodically, name="sundar-metrics", daemon=True).start()
+    print(f"SUNDAR 2000 daemon listening on {path}", file=sys.stderr)
+    try:
+        while True:
+            conn, _ = server.accept()
+            threading.Thread(target=serve_connection, args=(conn,), name="sundar-client", daemon=True).start()
+    except KeyboardInterrupt:
+        pass
+    finally:
+        server.close()
+        os.unlink(path)
+        stop_engine()
+    return 0
+
+# Function to export the metrics every METRICS_EXPORT_SECONDS while the daemon runs
+def export_metrics_periodically():
+    while True:
+        time.sleep(metrics.METRICS_EXPORT_SECONDS)
+        metrics.export_metrics()
+
+def main(argv=None):
+    global commands_enabled
+
+    parser = argparse.ArgumentParser(description="Talk to SUNDAR 2000 from the terminal.")
+    mode = parser.add_mutually_exclusive_group()
+    mode.add_argument("--daemon", action="store_true", help="serve queries on a Unix socket")
+    mode.add_argument("-c", "--command", metavar="TEXT",
+                      help="answer one line, through the daemon if it is running")
+    mode.add_argument("--connect", action="store_true", help="REPL answered by the running daemon")
+    parser.add_argument("--socket", default=SOCKET_PATH, help="socket path (default: %(default)s)")
+    parser.add_argument("--no-commands", action="store_true", help="refuse ! and model-requested commands")
+    args = parser.parse_args(argv)
+    commands_enabled = not args.no_commands
+
+    if args.daemon:
+        signal.signal(signal.SIGTERM, stop_daemon)
+        return run_daemon(args.socket)
+    if args.connect:
+        run_repl(lambda user_input, write: send_to_daemon(user_input, write, args.socket))
+        return 0
+    if args.command:
+        try:
+            send_to_daemon(args.command, write_stdout, args.socket)
+            return 0
+        except (FileNotFoundError, ConnectionRefusedError):
+            pass  # No daemon; answer it here instead
+        except KeyboardInterrupt:
+            return 130
+
+    start_engine()
+    try:
+        if args.command:
+            handle_line(args.command, write_stdout)
+        else:
+            run_repl(handle_line)
+    except KeyboardInterrupt:
+        return 130
+    finally:
+        stop_engine()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
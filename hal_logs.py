@@ -0,0 +1,187 @@
+#!/usr/bin/env python3
+# Query the SUNDAR 2000 conversation log (ai_agent.jsonl and its rotated backups)
+# Records are streamed one line at a time, so large logs never sit in memory
+
+import argparse
+import datetime
+import gzip
+import json
+import os
+import re
+import sys
+import time
+from collections import defaultdict
+
+from sundar import safety
+
+DEFAULT_LOG_FILE = "ai_agent.jsonl"
+
+# Function to list the log and its backups, oldest first
+def get_log_files(log_file, include_rotated=True):
+    files = []
+    if include_rotated:
+        log_dir = os.path.dirname(os.path.abspath(log_file))
+        prefix = os.path.basename(log_file) + "."
+        try:
+            names = sorted(name for name in os.listdir(log_dir) if name.startswith(prefix))
+        except FileNotFoundError:
+            names = []
+        files.extend(os.path.join(log_dir, name) for name in names)
+    if os.path.exists(log_file):
+        files.append(log_file)
+    return files
+
+# Function to stream records from a list of log files
+def read_records(files):
+    for path in files:
+        opener = gzip.open if path.endswith(".gz") else open
+        with opener(path, "rt", encoding="utf-8", errors="replace") as f:
+            for line in f:
+                try:
+                    yield json.loads(line)
+                except ValueError:
+                    continue  # A torn last line from a crash shouldn't stop the query
+
+# Function to parse --since/--until: an ISO date/time or a relative age like 30m, 2h, 7d
+def parse_time(value):
+    match = re.fullmatch(r"(\d+)([smhd])", value)
+    if match:
+        seconds = int(match.group(1)) * {"s": 1, "m": 60, "h": 3600, "d": 86400}[match.group(2)]
+        return datetime.datetime.now().astimezone() - datetime.timedelta(seconds=seconds)
+    parsed = datetime.datetime.fromisoformat(value)
+    if parsed.tzinfo is None:
+        parsed = parsed.astimezone()
+    return parsed
+
+# Function to build a predicate from the command line filters
+def make_filter(args):
+    pattern = re.compile(args.grep, re.IGNORECASE) if args.grep else None
+
+    def matches(record):
+        if args.mode and record.get("mode") not in args.mode:
+            return False
+        if args.since or args.until:
+            ts = datetime.datetime.fromisoformat(record["ts"])
+            if args.since and ts < args.since:
+                return False
+            if args.until and ts > args.until:
+                return False
+        if args.slow is not None and (record.get("latency_ms") or 0) < args.slow:
+            return False
+        if pattern and not (pattern.search(record.get("input", "")) or pattern.search(record.get("output", ""))):
+            return False
+        return True
+
+    return matches
+
+# Function to pick the value at a percentile from a sorted list
+def percentile(values, fraction):
+    return values[min(len(values) - 1, int(fraction * len(values)))]
+
+# Function to print counts and latency percentiles per mode
+def print_stats(records):
+    latencies = defaultdict(list)
+    counts = defaultdict(int)
+    for record in records:
+        mode = record.get("mode", "?")
+        counts[mode] += 1
+        if record.get("latency_ms") is not None:
+            latencies[mode].append(record["latency_ms"])
+
+    print(f"{'mode':<10} {'count':>7} {'p50 ms':>9} {'p95 ms':>9} {'p99 ms':>9} {'max ms':>9}")
+    for mode in sorted(counts):
+        values = sorted(latencies[mode])
+        if values:
+            cells = " ".join(f"{v:>9.1f}" for v in (percentile(values, 0.5), percentile(values, 0.95),
+                                                     percentile(values, 0.99), values[-1]))
+        else:
+            cells = " ".join(f"{'-':>9}" for _ in range(4))
+        print(f"{mode:<10} {counts[mode]:>7} {cells}")
+
+# Function to replay logged shell commands against a policy file and report the changes
+def replay_policy(records, policy_path, as_json=False):
+    with open(policy_path, encoding="utf-8") as f:
+        policy = safety.parse_policy(f.read(), policy_path)
+    shell_records = [record for record in records
+                     if record.get("mode") == "shell" and record.get("input", "").startswith("!")]
+    started = time.monotonic()
+    verdicts = list(safety.evaluate_commands((record["input"][1:].strip() for record in shell_records), policy))
+    elapsed_ms = (time.monotonic() - started) * 1000
+
+    counts = defaultdict(int)
+    for record, (command, allowed, rule) in zip(shell_records, verdicts):
+        was_allowed = get_logged_verdict(record)
+        counts["allowed" if allowed else "denied"] += 1
+        if as_json:
+            print(json.dumps({"ts": record.get("ts"), "command": command, "allowed": allowed,
+                              "was_allowed": was_allowed, "rule": rule}, ensure_ascii=False))
+        elif was_allowed is not None and allowed != was_allowed:
+            counts["changed"] += 1
+            change = "now allowed" if allowed else "now denied "
+            print(f"{record.get('ts', '?')} {change} $ {command}" + (f"\n    by {rule}" if rule else ""))
+    if not as_json:
+        print(f"{len(verdicts)} commands ({len(set(command for command, _, _ in verdicts))} distinct) checked "
+              f"in {elapsed_ms:.1f} ms: {counts['allowed']} allowed, {counts['denied']} denied, "
+              f"{counts['changed']} changed")
+
+# Function to get the policy verdict a shell record was logged with: commands the policy
+# blocked carry the rule that matched (null for the default), commands that ran carry
+# their job number. None for commands refused for other reasons, e.g. with Commands off.
+def get_logged_verdict(record):
+    if "rule" in record:
+        return False
+    if "job" in record:
+        return True
+    return None
+
+# Function to print one record as a short human readable line
+def format_record(record):
+    latency = record.get("latency_ms")
+    latency = f"{latency:.0f}ms" if latency is not None else "-"
+    output = record.get("output", "").replace("\n", " ")
+    if len(output) > 120:
+        output = output[:117] + "..."
+    return f"{record.get('ts', '?')} [{record.get('mode', '?')}] {latency} > {record.get('input', '')}\n    {output}"
+
+def main(argv=None):
+    parser = argparse.ArgumentParser(description="Query the SUNDAR 2000 conversation log.")
+    parser.add_argument("--file", default=DEFAULT_LOG_FILE, help="log file (default: %(default)s)")
+    parser.add_argument("--current-only", action="store_true", help="skip rotated backups")
+    parser.add_argument("--mode", action="append", choices=["llm", "shell", "launch", "builtin"],
+                        help="only show records of this mode (repeatable)")
+    parser.add_argument("--since", type=parse_time, help="ISO time or age such as 30m, 2h, 7d")
+    parser.add_argument("--until", type=parse_time, help="ISO time or age such as 30m, 2h, 7d")
+    parser.add_argument("--grep", help="regular expression to match against input or output")
+    parser.add_argument("--slow", type=float, metavar="MS", help="only records at least this slow")
+    parser.add_argument("--json", action="store_true", help="print matching records as JSON lines")
+    parser.add_argument("--stats", action="store_true", help="print counts and latency percentiles per mode")
+    parser.add_argument("--policy", metavar="FILE",
+                        help="replay logged shell commands against this command policy and show what changes")
+    args = parser.parse_args(argv)
+
+    matches = make_filter(args)
+    records = (record for record in read_records(get_log_files(args.file, not args.current_only))
+               if matches(record))
+
+    if args.stats:
+        print_stats(records)
+        return 0
+    if args.policy:
+        try:
+            replay_policy(records, args.policy, args.json)
+        except BrokenPipeError:
+            sys.stderr.close()
+        except (OSError, ValueError) as e:
+            print(f"Error loading policy: {e}", file=sys.stderr)
+            return 1
+        return 0
+    try:
+        for record in records:
+            print(json.dumps(record, ensure_ascii=False) if args.json else format_record(record))
+    except BrokenPipeError:
+        # Output piped into head and friends
+        sys.stderr.close()
+    return 0
+
+if __name__ == "__main__":
+    sys.exit(main())
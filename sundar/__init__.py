@@ -0,0 +1,16 @@
+# SUNDAR 2000 core library: everything the Tk front end (hal9000.py) and the
+# headless one (hal_cli.py) share. Importing these modules has no side effects; heavy
+# dependencies such as google.generativeai are only loaded on first use.
+#
+#   sundar.launcher - desktop file index, application search and launching
+#   sundar.safety   - command safety checks
+#   sundar.runner   - background shell command jobs
+#   sundar.llm      - Gemini client, chat session and response cache
+#   sundar.render   - eye rendering (PIL, or NumPy when available)
+#   sundar.logs     - structured conversation log
+#   sundar.metrics  - latency histograms and counters
+
+import os
+
+# Directory for caches that can be rebuilt at any time
+CACHE_DIR = os.path.join(os.getenv("XDG_CACHE_HOME", os.path.expanduser("~/.cache")), "sundar2000")
@@ -0,0 +1,1235 @@
+# Application launcher: a persistent index of .desktop files, fuzzy search over
+# it and launching the chosen entry
+
+import bisect
+import ctypes
+import datetime
+import heapq
+import itertools
+import json
+import math
+import os
+import re
+import select
+import shlex
+import shutil
+import struct
+import subprocess
+import threading
+import time
+from collections import Counter, OrderedDict
+try:
+    # rapidfuzz scores a whole candidate list in one C call
+    from rapidfuzz import fuzz, process
+    HAVE_RAPIDFUZZ = True
+except ImportError:
+    from fuzzywuzzy import fuzz, process
+    HAVE_RAPIDFUZZ = False
+
+from sundar import CACHE_DIR
+from sundar.metrics import increment_metric, observe_metric
+
+# Escapes in desktop file string values; Exec= has its own quoting on top of these
+DESKTOP_VALUE_ESCAPES = {"s": " ", "n": "\n", "t": "\t", "r": "\r", "\\": "\\"}
+
+# Desktop file locations: applications/ under $XDG_DATA_HOME and each of $XDG_DATA_DIRS,
+# in order of precedence (relative paths are ignored, as the spec says)
+XDG_DATA_HOME = os.getenv("XDG_DATA_HOME") or os.path.expanduser("~/.local/share")
+XDG_DATA_DIRS = (os.getenv("XDG_DATA_DIRS") or "/usr/local/share:/usr/share").split(":")
+DESKTOP_DIRS = list(dict.fromkeys(
+    os.path.join(os.path.normpath(directory), "applications")
+    for directory in [XDG_DATA_HOME] + XDG_DATA_DIRS if os.path.isabs(directory)
+))
+
+# Cache for desktop files
+desktop_files_cache = {}
+desktop_files_last_update = 0
+CACHE_REFRESH_SECONDS = 300  # Refresh cache every 5 minutes
+
+# Persistent desktop entry index: path -> {"mtime", "size", "entry"}, so only
+# new or changed files are parsed again and a warm start only needs stat calls
+DESKTOP_INDEX_FILE = os.path.join(CACHE_DIR, "desktop_index.json")
+DESKTOP_INDEX_VERSION = 3
+desktop_index = {}
+desktop_index_version = 0  # Bumped whenever the index changes, for front ends showing results
+desktop_index_lock = threading.Lock()  # The refresh and watcher threads both update the index
+desktop_index_ready = threading.Event()  # Set once the saved index is loaded or a scan has finished
+desktop_refresh_thread = None
+
+# What the watcher needs to patch the index for a few changed files instead of rebuilding
+# it: the files behind each desktop file id and the ids in effect for each Name=, built
+# on the first patch and only touched with desktop_index_lock held. Patched indexes are
+# saved once changes stop for DESKTOP_INDEX_SAVE_SECONDS; a save lost at exit only means
+# those files are parsed again.
+desktop_paths_by_id = None
+desktop_ids_by_name = None
+DESKTOP_PATCH_MAX_FILES = 500  # Past this many changed files, rebuilding is quicker
+DESKTOP_INDEX_SAVE_SECONDS = 5
+desktop_index_save_due = None  # time.monotonic() of the pending save, if any
+
+# Watching the desktop directories: inotify where available, otherwise each directory's
+# mtime is polled every DESKTOP_POLL_SECONDS (as are missing directories, until they
+# appear). inotify changes are applied after DESKTOP_WATCH_SETTLE_SECONDS, so a package
+# install lands as one update.
+DESKTOP_WATCH = os.getenv("SUNDAR_DESKTOP_WATCH", "auto")  # auto, poll or off
+DESKTOP_POLL_SECONDS = 0.5
+DESKTOP_WATCH_SETTLE_SECONDS = 0.2
+desktop_watcher_thread = None
+
+# inotify(7) events, read through libc with ctypes
+INOTIFY_EVENT = struct.Struct("iIII")  # wd, mask, cookie, length of the name that follows
+INOTIFY_READ_SIZE = 64 * 1024
+IN_ATTRIB = 0x4
+IN_CLOSE_WRITE = 0x8
+IN_MOVED_FROM = 0x40
+IN_MOVED_TO = 0x80
+IN_CREATE = 0x100
+IN_DELETE = 0x200
+IN_DELETE_SELF = 0x400
+IN_MOVE_SELF = 0x800
+IN_Q_OVERFLOW = 0x4000
+IN_IGNORED = 0x8000
+IN_ONLYDIR = 0x1000000
+DESKTOP_WATCH_MASK = (IN_ATTRIB | IN_CLOSE_WRITE | IN_MOVED_FROM | IN_MOVED_TO | IN_CREATE | IN_DELETE
+                      | IN_DELETE_SELF | IN_MOVE_SELF | IN_ONLYDIR)
+
+# Application search index, rebuilt whenever the desktop files change
+SEARCH_RESULT_LIMIT = 20
+SEARCH_SCORE_CUTOFF = 50  # Minimum partial_ratio score for a match
+SEARCH_EXTRA_FIELD_WEIGHT = 0.8  # GenericName/Keywords/Comment matches rank below name matches
+SEARCH_EXACT_TRIGRAMS = 4  # Queries with up to this many trigrams try keys containing them all first
+SEARCH_CANDIDATE_LIMIT = 200  # Keys scored per field, those sharing the most trigrams first
+SEARCH_TYPO_TRIGRAMS = 3  # Trigrams a single typo can break, so a key may miss this many
+# Lists in the search index with an entry per app id; *_sizes count each key's trigrams
+SEARCH_INDEX_TABLES = ("names", "details", "name_keys", "extra_keys", "name_sizes", "extra_sizes")
+app_search_index = None
+
+# Incremental search: each field's shared-trigram counts for the last query and a
+# per-query result cache for backspacing
+SEARCH_RESULT_CACHE_SIZE = 256
+search_candidate_state = {"name": None, "extra": None}
+search_result_cache = OrderedDict()
+search_result_cache_index = None
+
+# Launching: applications are started without a shell and reaped by a background
+# thread; a second launch of a running app focuses its window instead (via wmctrl
+# or xdotool, when installed), and a repeat within LAUNCH_DEDUPE_SECONDS is ignored
+LAUNCH_DEDUPE_SECONDS = 3.0
+LAUNCH_REAP_SECONDS = 1.0
+LAUNCH_FOCUS_EXISTING = os.getenv("SUNDAR_LAUNCH_FOCUS", "1") != "0"
+LAUNCH_FOCUS_TIMEOUT_SECONDS = 2
+running_apps = {}  # Desktop file path -> Popen objects still to be reaped
+recent_launches = {}  # Desktop file path -> monotonic time of its last launch
+app_reaper_thread = None
+launch_lock = threading.Lock()  # The daemon launches from several connection threads
+
+# Launch history, one JSON line per launch, and how often and how recently each
+# desktop file was launched; the most frequent apps are read ahead at startup
+LAUNCH_HISTORY_FILE = os.path.join(XDG_DATA_HOME, "sundar2000", "launches.jsonl")
+LAUNCH_WARM_APPS = 5
+launch_stats = None  # Desktop file path -> {"count", "last", "score"}, loaded by the refresh thread
+launch_stats_version = 0  # Bumped on every change, so cached search results are re-ranked
+launch_history_lines = 0
+apps_warmed = False
+
+# Frecency: every launch adds 1 to an app's score, which then halves every
+# LAUNCH_HALF_LIFE_SECONDS; search results gain up to LAUNCH_MAX_BOOST points from it.
+# Past LAUNCH_HISTORY_COMPACT_LINES the history is rewritten as one line per app.
+LAUNCH_HALF_LIFE_SECONDS = float(os.getenv("SUNDAR_LAUNCH_HALF_LIFE_DAYS", "14")) * 24 * 60 * 60
+LAUNCH_BOOST_PER_DOUBLING = 5  # 1 recent launch -> 5 points, 3 -> 10, 7 -> 15
+LAUNCH_MAX_BOOST = 15
+LAUNCH_HISTORY_COMPACT_LINES = 1000
+LAUNCH_FORGET_SCORE = 0.05  # Apps that decayed below this are dropped when compacting
+
+# Function to parse the [Desktop Entry] group of a desktop file
+def parse_desktop_file(file_path):
+    app_name = None
+    exec_cmd = None
+    icon = None
+    generic_name = None
+    keywords = None
+    comment = None
+    wm_class = None
+    in_entry_group = False
+    
+    with open(file_path, 'r', encoding='utf-8') as f:
+        for line in f:
+            line = line.strip()
+            if line.startswith("["):
+                # Desktop Action groups have their own Name= and Exec= keys
+                in_entry_group = line == "[Desktop Entry]"
+            elif not in_entry_group:
+                continue
+            elif line.startswith("Name="):
+                app_name = line[5:]
+            elif line.startswith("Exec="):
+                exec_line = unescape_desktop_value(line[5:])
+                # Remove field codes like %f, %u
+                exec_cmd = re.sub(r'%[a-zA-Z]', '', exec_line).strip()
+            elif line.startswith("Icon="):
+                icon = line[5:]
+            elif line.startswith("GenericName="):
+                generic_name = line[12:]
+            elif line.startswith("Keywords="):
+                keywords = line[9:].replace(";", " ").strip()
+            elif line.startswith("Comment="):
+                comment = line[8:]
+            elif line.startswith("StartupWMClass="):
+                wm_class = line[15:]
+    
+    if app_name and exec_cmd:
+        return {"name": app_name, "exec": exec_cmd, "icon": icon,
+                "argv": parse_exec_argv(exec_line, app_name, icon, file_path),
+                "generic_name": generic_name, "keywords": keywords, "comment": comment,
+                "wm_class": wm_class}
+    return None
+
+# Function to undo the escapes of desktop file string values
+def unescape_desktop_value(value):
+    return re.sub(r"\\(.)", lambda match: DESKTOP_VALUE_ESCAPES.get(match.group(1), match.group(0)), value)
+
+# Function to split an Exec= value into argv the way the Desktop Entry spec does:
+# arguments are separated by spaces and may be double quoted, with \ escaping " ` $ \
+# inside quotes. Field codes are expanded; file and URL codes are dropped since
+# nothing is passed in. Returns None if the quoting is broken.
+def parse_exec_argv(exec_line, app_name=None, icon=None, file_path=None):
+    argv = []
+    argument = None
+    quoted = False
+    escaped = False
+    for char in exec_line:
+        if escaped:
+            argument += char
+            escaped = False
+        elif quoted and char == "\\":
+            escaped = True
+        elif char == '"':
+            quoted = not quoted
+            argument = argument or ""
+        elif char == " " and not quoted:
+            if argument is not None:
+                argv.append(argument)
+            argument = None
+        else:
+            argument = (argument or "") + char
+    if quoted or escaped:
+        return None
+    if argument is not None:
+        argv.append(argument)
+    
+    expanded = []
+    for argument in argv:
+        if argument == "%i":
+            expanded.extend(["--icon", icon] if icon else [])
+        elif argument in ("%f", "%F", "%u", "%U"):
+            continue
+        else:
+            codes = {"%": "%", "c": app_name or "", "k": file_path or ""}
+            expanded.append(re.sub(r"%(.)", lambda match: codes.get(match.group(1), ""), argument))
+    return expanded or None
+
+# Function to build the name -> details mapping from the desktop index
+def build_desktop_files(index):
+    # Earlier directories take precedence: a file hides any file with the same name in a
+    # later one (even if it is unusable itself, e.g. a Hidden= override), and the first
+    # entry with a given Name= wins
+    ranks = {directory: rank for rank, directory in enumerate(DESKTOP_DIRS)}
+    desktop_files = {}
+    desktop_ids = set()
+    for file_path in sorted(index, key=lambda path: (ranks.get(os.path.dirname(path), len(ranks)), path)):
+        desktop_id = os.path.basename(file_path)
+        if desktop_id in desktop_ids:
+            continue
+        desktop_ids.add(desktop_id)
+        entry = index[file_path]["entry"]
+        if entry and entry["name"] not in desktop_files:
+            desktop_files[entry["name"]] = get_desktop_details(file_path, entry)
+    return desktop_files
+
+# Function to get the details of an application from its desktop file entry
+def get_desktop_details(file_path, entry):
+    return {
+        "exec": entry["exec"],
+        "path": file_path,
+        "icon": entry["icon"],
+        "generic_name": entry["generic_name"],
+        "keywords": entry["keywords"],
+        "comment": entry["comment"],
+        "argv": entry["argv"],
+        "wm_class": entry["wm_class"]
+    }
+
+# Function to get the sort key of a desktop file by precedence, the same order
+# build_desktop_files() goes through them in
+def get_desktop_precedence(file_path):
+    directory = os.path.dirname(file_path)
+    rank = DESKTOP_DIRS.index(directory) if directory in DESKTOP_DIRS else len(DESKTOP_DIRS)
+    return rank, file_path
+
+# Function to get the Name= of the file in effect among the files sharing a desktop
+# file id, or None if that file is unusable
+def get_visible_name(index, paths):
+    if not paths:
+        return None
+    entry = index[min(paths, key=get_desktop_precedence)]["entry"]
+    return entry["name"] if entry else None
+
+# Function to map each desktop file id to its files and each Name= to the ids in effect
+# that have it, for patch_desktop_index()
+def build_desktop_lookups(index):
+    paths_by_id = {}
+    for file_path in index:
+        paths_by_id.setdefault(os.path.basename(file_path), set()).add(file_path)
+    
+    ids_by_name = {}
+    for desktop_id, paths in paths_by_id.items():
+        name = get_visible_name(index, paths)
+        if name is not None:
+            ids_by_name.setdefault(name, set()).add(desktop_id)
+    return paths_by_id, ids_by_name
+
+# Function to normalize text for searching
+def normalize_search_text(text):
+    return " ".join(text.casefold().split())
+
+# Function to get the set of character trigrams of a normalized string
+def get_trigrams(text):
+    return {text[i:i + 3] for i in range(len(text) - 2)}
+
+# Function to precompute search keys and a trigram index for the desktop files
+def build_search_index(desktop_files):
+    names = list(desktop_files)
+    details = [desktop_files[name] for name in names]
+    name_keys = [normalize_search_text(name) for name in names]
+    extra_keys = [get_extra_search_key(d) for d in details]
+    
+    alphabetical = sorted(range(len(names)), key=lambda app_id: names[app_id])
+    return {
+        "names": names,
+        "details": details,
+        "name_keys": name_keys,
+        "extra_keys": extra_keys,
+        "name_trigrams": build_trigram_postings(name_keys),
+        "extra_trigrams": build_trigram_postings(extra_keys),
+        "name_sizes": [len(get_trigrams(key)) for key in name_keys],
+        "extra_sizes": [len(get_trigrams(key)) for key in extra_keys],
+        "name_text": build_search_text(name_keys, alphabetical),
+        "extra_text": build_search_text(extra_keys, alphabetical),
+        "alphabetical": alphabetical,
+        "ids_by_path": {d["path"]: app_id for app_id, d in enumerate(details) if d.get("path")}
+    }
+
+# Function to get the search key for the GenericName=, Keywords= and Comment= of an app
+def get_extra_search_key(details):
+    return normalize_search_text(" ".join(filter(None, (details["generic_name"], details["keywords"],
+                                                         details["comment"]))))
+
+# Function to map each trigram to the ids of the keys containing it
+def build_trigram_postings(keys):
+    postings = {}
+    for app_id, key in enumerate(keys):
+        for trigram in get_trigrams(key):
+            postings.setdefault(trigram, []).append(app_id)
+    return postings
+
+# Function to update a search index for the names whose details changed, touching only
+# their ids. Readers may still hold the old index, so a new one is returned that shares
+# every posting list it doesn't change.
+def patch_search_index(index, old_files, desktop_files, changed_names):
+    index = dict(index)
+    for table in SEARCH_INDEX_TABLES:
+        index[table] = list(index[table])
+    ids_by_path = index["ids_by_path"] = dict(index["ids_by_path"])
+    postings = {}
+    for field in ("name", "extra"):
+        postings[field] = index[field + "_trigrams"] = dict(index[field + "_trigrams"])
+    copied = {"name": set(), "extra": set()}
+    
+    # Drop the old ids first, as a changed app's file may now be in effect for another name
+    reused = {}
+    free = []
+    for name in changed_names:
+        if name not in old_files:
+            continue
+        app_id = ids_by_path.pop(old_files[name]["path"])
+        for field in ("name", "extra"):
+            for trigram in get_trigrams(index[field + "_keys"][app_id]):
+                remove_posting(postings[field], copied[field], trigram, app_id)
+        if name in desktop_files:
+            reused[name] = app_id
+        else:
+            free.append(app_id)
+    
+    for name in changed_names:
+        if name not in desktop_files:
+            continue
+        app_id = reused.get(name)
+        if app_id is None:
+            app_id = free.pop() if free else len(index["names"])
+        if app_id == len(index["names"]):
+            for table in SEARCH_INDEX_TABLES:
+                index[table].append(None)
+        details = desktop_files[name]
+        index["names"][app_id] = name
+        index["details"][app_id] = details
+        index["name_keys"][app_id] = normalize_search_text(name)
+        index["extra_keys"][app_id] = get_extra_search_key(details)
+        ids_by_path[details["path"]] = app_id
+        for field in ("name", "extra"):
+            trigrams = get_trigrams(index[field + "_keys"][app_id])
+            index[field + "_sizes"][app_id] = len(trigrams)
+            for trigram in trigrams:
+                add_posting(postings[field], copied[field], trigram, app_id)
+    
+    # Fill the ids left free with the last ones, so the tables stay dense
+    for hole in sorted(free, reverse=True):
+        last = len(index["names"]) - 1
+        if hole != last:
+            for field in ("name", "extra"):
+                for trigram in get_trigrams(index[field + "_keys"][last]):
+                    remove_posting(postings[field], copied[field], trigram, last)
+                    add_posting(postings[field], copied[field], trigram, hole)
+            for table in SEARCH_INDEX_TABLES:
+                index[table][hole] = index[table][last]
+            ids_by_path[index["details"][hole]["path"]] = hole
+        for table in SEARCH_INDEX_TABLES:
+            index[table].pop()
+    
+    # Re-sorting and re-joining are single passes in C, unlike re-posting every key
+    names = index["names"]
+    index["alphabetical"] = sorted(range(len(names)), key=names.__getitem__)
+    for field in ("name", "extra"):
+        index[field + "_text"] = build_search_text(index[field + "_keys"], index["alphabetical"])
+    return index
+
+# Function to copy a posting list before its first change in a patch
+def get_patched_posting(postings, copied, trigram):
+    if trigram in copied:
+        return postings.setdefault(trigram, [])
+    copied.add(trigram)
+    posting = postings[trigram] = list(postings.get(trigram, ()))
+    return posting
+
+# Function to add an id to a trigram's posting list in a patch
+def add_posting(postings, copied, trigram, app_id):
+    get_patched_posting(postings, copied, trigram).append(app_id)
+
+# Function to remove an id from a trigram's posting list in a patch
+def remove_posting(postings, copied, trigram, app_id):
+    posting = get_patched_posting(postings, copied, trigram)
+    posting.remove(app_id)
+    if not posting:
+        del postings[trigram]
+
+# Function to load the desktop index saved by a previous run
+def load_desktop_index():
+    global desktop_index, desktop_files_cache, app_search_index, desktop_index_version
+    global desktop_paths_by_id, desktop_ids_by_name
+    
+    try:
+        with open(DESKTOP_INDEX_FILE, 'r', encoding='utf-8') as f:
+            data = json.load(f)
+        if data.get("version") != DESKTOP_INDEX_VERSION:
+            return
+        index = data["entries"]
+        desktop_files = build_desktop_files(index)
+        search_index = build_search_index(desktop_files)
+        with desktop_index_lock:
+            desktop_index = index
+            desktop_files_cache = desktop_files
+            app_search_index = search_index
+            desktop_paths_by_id = desktop_ids_by_name = None
+            desktop_index_version += 1
+    except FileNotFoundError:
+        pass
+    except Exception as e:
+        print(f"Error loading desktop index {DESKTOP_INDEX_FILE}: {e}")
+
+# Function to save the desktop index atomically
+def save_desktop_index(index):
+    try:
+        os.makedirs(os.path.dirname(DESKTOP_INDEX_FILE), exist_ok=True)
+        tmp_path = DESKTOP_INDEX_FILE + ".tmp"
+        with open(tmp_path, 'w', encoding='utf-8') as f:
+            json.dump({"version": DESKTOP_INDEX_VERSION, "entries": index}, f)
+        os.replace(tmp_path, DESKTOP_INDEX_FILE)
+    except Exception as e:
+        print(f"Error saving desktop index {DESKTOP_INDEX_FILE}: {e}")
+
+# Function to tell whether a directory entry is a desktop file
+def is_desktop_file_name(name):
+    return name.endswith(".desktop") and not name.startswith(".")
+
+# Function to get the index record for a desktop file, reusing the old record if the
+# file is unchanged; returns None if the file is gone
+def get_desktop_record(file_path, record, stat=None):
+    try:
+        stat = stat or os.stat(file_path)
+    except OSError:
+        return None
+    
+    if record is None or record["mtime"] != stat.st_mtime_ns or record["size"] != stat.st_size:
+        try:
+            entry = parse_desktop_file(file_path)
+        except Exception as e:
+            print(f"Error parsing {file_path}: {e}")
+            entry = None
+        # Unusable files are remembered too, so they are not parsed again
+        record = {"mtime": stat.st_mtime_ns, "size": stat.st_size, "entry": entry}
+    return record
+
+# Function to scan one desktop directory; returns its records and whether any are new
+def scan_desktop_directory(directory, old_index):
+    records = {}
+    changed = False
+    try:
+        entries = sorted(os.scandir(directory), key=lambda d: d.name)
+    except OSError:
+        return records, changed
+    
+    for dir_entry in entries:
+        if not is_desktop_file_name(dir_entry.name):
+            continue
+        try:
+            stat = dir_entry.stat()
+        except OSError:
+            continue
+        
+        old_record = old_index.get(dir_entry.path)
+        record = get_desktop_record(dir_entry.path, old_record, stat)
+        if record is not None:
+            records[dir_entry.path] = record
+            changed = changed or record is not old_record
+    return records, changed
+
+# Function to bring the desktop index up to date, parsing only new or changed files
+def refresh_desktop_index():
+    global desktop_files_last_update
+    
+    with desktop_index_lock:
+        old_index = desktop_index
+        new_index = {}
+        changed = False
+        
+        for directory in DESKTOP_DIRS:
+            records, directory_changed = scan_desktop_directory(directory, old_index)
+            new_index.update(records)
+            changed = changed or directory_changed
+        
+        # Removed files
+        changed = changed or len(new_index) != len(old_index)
+        
+        if changed:
+            swap_desktop_index(new_index)
+        desktop_files_last_update = datetime.datetime.now().timestamp()
+    return changed
+
+# Function to apply changes seen by the watcher: whole directories are rescanned, other
+# files just checked again; returns whether the index changed
+def update_desktop_index(paths=(), directories=()):
+    with desktop_index_lock:
+        old_index = desktop_index
+        new_index = dict(old_index)
+        changed_paths = set()
+        
+        for directory in directories:
+            removed = [path for path in old_index if os.path.dirname(path) == directory]
+            for path in removed:
+                del new_index[path]
+            records, _ = scan_desktop_directory(directory, old_index)
+            new_index.update(records)
+            changed_paths.update(path for path in itertools.chain(removed, records)
+                                 if old_index.get(path) is not new_index.get(path))
+        
+        for path in paths:
+            if os.path.dirname(path) in directories:
+                continue
+            old_record = old_index.get(path)
+            record = get_desktop_record(path, old_record)
+            if record is None:
+                if new_index.pop(path, None) is not None:
+                    changed_paths.add(path)
+            elif record is not old_record:
+                new_index[path] = record
+                changed_paths.add(path)
+        
+        if len(changed_paths) > DESKTOP_PATCH_MAX_FILES:
+            swap_desktop_index(new_index)
+        elif changed_paths:
+            patch_desktop_index(new_index, changed_paths)
+        if changed_paths:
+            increment_metric("desktop_updates")
+    return bool(changed_paths)
+
+# Function to install a new desktop index and everything derived from it; called with
+# desktop_index_lock held
+def swap_desktop_index(new_index):
+    global desktop_index, desktop_files_cache, app_search_index, desktop_index_version
+    global desktop_paths_by_id, desktop_ids_by_name, desktop_index_save_due
+    
+    # Swap in whole new objects so readers on the Tk thread never see a partial update
+    desktop_files = build_desktop_files(new_index)
+    search_index = build_search_index(desktop_files)
+    desktop_index = new_index
+    desktop_paths_by_id = desktop_ids_by_name = None
+    desktop_files_cache = desktop_files
+    app_search_index = search_index
+    desktop_index_version += 1
+    save_desktop_index(new_index)
+    desktop_index_save_due = None
+
+# Function to install a desktop index that differs from the current one in a few files,
+# updating only the apps those files are in effect for; called with desktop_index_lock held
+def patch_desktop_index(new_index, changed_paths):
+    global desktop_index, desktop_files_cache, app_search_index, desktop_index_version
+    global desktop_paths_by_id, desktop_ids_by_name, desktop_index_save_due
+    
+    old_index = desktop_index
+    if desktop_paths_by_id is None:
+        desktop_paths_by_id, desktop_ids_by_name = build_desktop_lookups(old_index)
+    changed_by_id = {}
+    for path in changed_paths:
+        changed_by_id.setdefault(os.path.basename(path), set()).add(path)
+    
+    changed_names = set()
+    for desktop_id, changed in changed_by_id.items():
+        paths = desktop_paths_by_id.pop(desktop_id, set())
+        old_name = get_visible_name(old_index, paths)
+        paths = {path for path in paths | changed if path in new_index}
+        if paths:
+            desktop_paths_by_id[desktop_id] = paths
+        new_name = get_visible_name(new_index, paths)
+        
+        if old_name is not None:
+            desktop_ids_by_name[old_name].discard(desktop_id)
+            if not desktop_ids_by_name[old_name]:
+                del desktop_ids_by_name[old_name]
+            changed_names.add(old_name)
+        if new_name is not None:
+            desktop_ids_by_name.setdefault(new_name, set()).add(desktop_id)
+            changed_names.add(new_name)
+    
+    # Each name goes to the first file in effect that has it
+    old_files = desktop_files_cache
+    desktop_files = dict(old_files)
+    for name in list(changed_names):
+        desktop_ids = desktop_ids_by_name.get(name)
+        if desktop_ids:
+            file_path = min((min(desktop_paths_by_id[desktop_id], key=get_desktop_precedence)
+                             for desktop_id in desktop_ids), key=get_desktop_precedence)
+            desktop_files[name] = get_desktop_details(file_path, new_index[file_path]["entry"])
+        else:
+            desktop_files.pop(name, None)
+        if desktop_files.get(name) == old_files.get(name):
+            changed_names.discard(name)
+    
+    search_index = app_search_index
+    if search_index is not None:
+        search_index = patch_search_index(search_index, old_files, desktop_files, changed_names)
+    desktop_index = new_index
+    desktop_files_cache = desktop_files
+    app_search_index = search_index
+    desktop_index_version += 1
+    # A burst of changes is saved once, after it is over
+    desktop_index_save_due = time.monotonic() + DESKTOP_INDEX_SAVE_SECONDS
+
+# Function to save patched changes to the desktop index once they have settled
+def save_pending_desktop_index():
+    global desktop_index_save_due
+    
+    with desktop_index_lock:
+        if desktop_index_save_due is None or time.monotonic() < desktop_index_save_due:
+            return
+        desktop_index_save_due = None
+        save_desktop_index(desktop_index)
+
+# Function to refresh the desktop index on a background thread; callers on the
+# GUI thread watch desktop_refresh_thread and desktop_index_version for the result
+def start_desktop_refresh():
+    global desktop_refresh_thread
+    
+    if desktop_refresh_thread is not None and desktop_refresh_thread.is_alive():
+        return
+    desktop_refresh_thread = threading.Thread(target=run_desktop_refresh,
+                                              name="sundar-desktop-index", daemon=True)
+    desktop_refresh_thread.start()
+
+# Runs on the refresh thread: load the saved index on the first run, start watching for
+# changes, load the launch history for ranking, update the index, then read ahead the
+# most used apps
+def run_desktop_refresh():
+    global apps_warmed
+    
+    # Read the launch history before the index is marked ready, so the first search
+    # that was waiting on it is already ranked by frecency
+    get_launch_stats()
+    if not desktop_index_ready.is_set():
+        # Building the saved index's search tables takes a while for large corpora, so
+        # it happens here rather than on the caller's thread
+        load_desktop_index()
+        if desktop_index:
+            desktop_index_ready.set()
+    # Watch before scanning, so nothing that changes during the scan is missed
+    start_desktop_watcher()
+    refresh_desktop_index()
+    desktop_index_ready.set()
+    if not apps_warmed:
+        apps_warmed = True
+        warm_frequent_apps()
+
+# Function to start the thread that keeps the desktop index current, so new apps are
+# searchable within a second without periodic full rescans
+def start_desktop_watcher():
+    global desktop_watcher_thread
+    
+    if desktop_watcher_thread is not None or DESKTOP_WATCH == "off":
+        return
+    watcher = {"libc": None, "fd": None, "watches": {}, "polled": {}}
+    if DESKTOP_WATCH != "poll":
+        open_inotify(watcher)
+    for directory in DESKTOP_DIRS:
+        add_desktop_watch(watcher, directory)
+    desktop_watcher_thread = threading.Thread(target=watch_desktop_dirs, args=(watcher,),
+                                              name="sundar-desktop-watch", daemon=True)
+    desktop_watcher_thread.start()
+
+# Function to create an inotify instance through libc, where there is one
+def open_inotify(watcher):
+    try:
+        libc = ctypes.CDLL(None, use_errno=True)
+        fd = libc.inotify_init1(os.O_NONBLOCK | os.O_CLOEXEC)
+    except (OSError, AttributeError):
+        return  # Not Linux: poll instead
+    if fd >= 0:
+        watcher["libc"] = libc
+        watcher["fd"] = fd
+
+# Function to watch a directory with inotify, or poll it when that is not possible
+# (no inotify, the directory is missing, or the watch limit is reached)
+def add_desktop_watch(watcher, directory):
+    if watcher["fd"] is not None:
+        wd = watcher["libc"].inotify_add_watch(watcher["fd"], os.fsencode(directory), DESKTOP_WATCH_MASK)
+        # A second path to an already watched directory gets the same wd back
+        if wd >= 0 and wd not in watcher["watches"]:
+            watcher["watches"][wd] = directory
+            watcher["polled"].pop(directory, None)
+            return
+    watcher["polled"][directory] = get_directory_mtime(directory)
+
+# Function to get a directory's mtime, or None if it doesn't exist
+def get_directory_mtime(directory):
+    try:
+        return os.stat(directory).st_mtime_ns
+    except OSError:
+        return None
+
+# Runs on the watcher thread: collect changed files and directories, and apply each
+# burst of changes to the index in one update
+def watch_desktop_dirs(watcher):
+    next_poll = 0
+    while True:
+        paths = set()
+        directories = set()
+        read_inotify_events(watcher, DESKTOP_POLL_SECONDS, paths, directories)
+        if paths or directories:
+            # Polling already sees a burst as one change; inotify reports each file
+            time.sleep(DESKTOP_WATCH_SETTLE_SECONDS)
+            read_inotify_events(watcher, 0, paths, directories)
+        if time.monotonic() >= next_poll:
+            poll_desktop_dirs(watcher, directories)
+            next_poll = time.monotonic() + DESKTOP_POLL_SECONDS
+        if not paths and not directories:
+            save_pending_desktop_index()
+            continue
+        
+        try:
+            update_desktop_index(paths, directories)
+        except Exception as e:
+            print(f"Error updating desktop index: {e}")
+
+# Function to wait up to timeout for inotify events and add the files and directories
+# they name; without inotify it only sleeps
+def read_inotify_events(watcher, timeout, paths, directories):
+    fd = watcher["fd"]
+    if fd is None:
+        time.sleep(timeout)
+        return
+    if not select.select([fd], [], [], timeout)[0]:
+        return
+    try:
+        data = os.read(fd, INOTIFY_READ_SIZE)
+    except BlockingIOError:
+        return
+    
+    offset = 0
+    while offset < len(data):
+        wd, mask, _, length = INOTIFY_EVENT.unpack_from(data, offset)
+        offset += INOTIFY_EVENT.size
+        name = os.fsdecode(data[offset:offset + length].rstrip(b"\0"))
+        offset += length
+        
+        if mask & IN_Q_OVERFLOW:
+            # Events were dropped, so rescan everything
+            directories.update(watcher["watches"].values())
+            continue
+        directory = watcher["watches"].get(wd)
+        if directory is None:
+            continue
+        if mask & (IN_DELETE_SELF | IN_MOVE_SELF | IN_IGNORED):
+            # The directory was removed or moved away: drop its apps and poll until it is back
+            if not mask & IN_IGNORED:
+                watcher["libc"].inotify_rm_watch(fd, wd)
+            del watcher["watches"][wd]
+            watcher["polled"][directory] = None
+            directories.add(directory)
+        elif is_desktop_file_name(name):
+            paths.add(os.path.join(directory, name))
+
+# Function to add the polled directories whose mtime changed (a file was added, removed
+# or renamed, or the directory appeared or went away)
+def poll_desktop_dirs(watcher, directories):
+    for directory, mtime in list(watcher["polled"].items()):
+        if get_directory_mtime(directory) != mtime:
+            # Moves the directory to inotify if it can be watched now
+            add_desktop_watch(watcher, directory)
+            directories.add(directory)
+
+# Function to get all desktop files
+def get_desktop_files():
+    # Never scan on the caller's thread; a stale cache just triggers a background refresh.
+    # Once the watcher runs it keeps the cache current, so there is nothing to refresh.
+    current_time = datetime.datetime.now().timestamp()
+    if desktop_watcher_thread is None and current_time - desktop_files_last_update > CACHE_REFRESH_SECONDS:
+        start_desktop_refresh()
+    
+    return desktop_files_cache
+
+# Function to get the search index for the current desktop files
+def get_search_index():
+    global app_search_index
+    
+    desktop_files = get_desktop_files()
+    if app_search_index is None:
+        # Normally built alongside the cache by load/refresh_desktop_index()
+        app_search_index = build_search_index(desktop_files)
+    return app_search_index
+
+# Function to score candidate keys against a query, returning (score, position) pairs
+def score_search_keys(query, keys, score_cutoff=SEARCH_SCORE_CUTOFF):
+    if HAVE_RAPIDFUZZ:
+        return [(score, position) for _, score, position in
+                process.extract(query, keys, scorer=fuzz.partial_ratio, limit=None,
+                                score_cutoff=score_cutoff)]
+    scores = ((fuzz.partial_ratio(query, key), position) for position, key in enumerate(keys))
+    return [(score, position) for score, position in scores if score >= score_cutoff]
+
+# Function to get how many query trigrams a key at least as long as the query must share
+# to be scored; shorter keys need only their own trigram count less SEARCH_TYPO_TRIGRAMS,
+# so a name still matches a query that adds words to it
+def get_min_shared_trigrams(query_trigrams):
+    return max(1, len(query_trigrams) - SEARCH_TYPO_TRIGRAMS)
+
+# Function to count the query trigrams each key shares, carrying the previous query's
+# counts over when the new query only extends it
+def update_shared_trigrams(index, field, query, query_trigrams):
+    postings = index[field + "_trigrams"]
+    previous = search_candidate_state[field]
+    if previous is not None and previous[0] is index and query.startswith(previous[1]):
+        shared = previous[3]
+        for trigram in query_trigrams - previous[2]:
+            shared.update(postings.get(trigram, ()))
+    else:
+        shared = Counter(itertools.chain.from_iterable(
+            postings.get(trigram, ()) for trigram in query_trigrams))
+    search_candidate_state[field] = (index, query, query_trigrams, shared)
+
+# Function to get the trigram candidates for a field. Short queries allow a typo only
+# when too few keys have every trigram, as otherwise most of a large corpus would share
+# one; past SEARCH_CANDIDATE_LIMIT the keys sharing the most are kept, along with any
+# frequently used ones.
+def get_search_candidates(index, field, query_trigrams, boosts):
+    shared = None
+    if len(query_trigrams) <= SEARCH_EXACT_TRIGRAMS:
+        # Intersect from the rarest trigram up, which stays small
+        postings = index[field + "_trigrams"]
+        by_rarity = sorted((postings.get(trigram, ()) for trigram in query_trigrams), key=len)
+        candidates = set(by_rarity[0]).intersection(*by_rarity[1:])
+    if len(query_trigrams) > SEARCH_EXACT_TRIGRAMS or len(candidates) < SEARCH_RESULT_LIMIT:
+        min_shared = get_min_shared_trigrams(query_trigrams)
+        sizes = index[field + "_sizes"]
+        shared = {app_id: count for app_id, count in search_candidate_state[field][3].items()
+                  if count >= min_shared or count >= sizes[app_id] - SEARCH_TYPO_TRIGRAMS}
+        candidates = shared
+    
+    if len(candidates) <= SEARCH_CANDIDATE_LIMIT:
+        return list(candidates)
+    boosted = [app_id for app_id in boosts if app_id in candidates]
+    if shared is None:
+        # Every key has all the trigrams, so there is nothing to rank by
+        top = itertools.islice(candidates, SEARCH_CANDIDATE_LIMIT)
+    else:
+        top = sorted(shared, key=shared.get, reverse=True)[:SEARCH_CANDIDATE_LIMIT]
+    return list(dict.fromkeys(itertools.chain(boosted, top)))
+
+# Function to join a field's keys in alphabetical order, for substring searches that
+# skip to each match instead of testing every key; returns the text and where each key starts
+def build_search_text(keys, alphabetical):
+    ordered = [keys[app_id] + "\n" for app_id in alphabetical]
+    return "".join(ordered), [0] + list(itertools.accumulate(map(len, ordered)))
+
+# Function to find the ids whose key in a field contains the query, alphabetically
+def find_key_matches(index, field, query, limit):
+    text, starts = index[field + "_text"]
+    matches = []
+    position = text.find(query)
+    while position != -1 and len(matches) < limit:
+        row = bisect.bisect_right(starts, position) - 1
+        matches.append(index["alphabetical"][row])
+        position = text.find(query, starts[row + 1])
+    return matches
+
+# Function to match queries too short for trigrams by plain substring search
+def find_short_query_matches(index, query, boosts):
+    # Frequently used apps first, so they make the cut before the alphabetical rest
+    boosted = sorted(boosts, key=lambda app_id: -boosts[app_id])
+    matches = {}
+    for field, score in (("name", 100), ("extra", 100 * SEARCH_EXTRA_FIELD_WEIGHT)):
+        keys = index[field + "_keys"]
+        for app_id in boosted:
+            if query in keys[app_id] and app_id not in matches:
+                matches[app_id] = score + boosts[app_id]
+        # Enough to fill the results even if every match so far turns up again
+        for app_id in find_key_matches(index, field, query, SEARCH_RESULT_LIMIT + len(matches)):
+            if app_id not in matches:
+                matches[app_id] = score
+    return sorted(matches.items(), key=lambda item: -item[1])[:SEARCH_RESULT_LIMIT]
+
+# Function to find matching applications
+def find_matching_apps(query):
+    global search_result_cache_index
+    
+    index = get_search_index()
+    if search_result_cache_index != (index, launch_stats_version):
+        # Results from an older index may name apps that are gone, and a launch re-ranks them
+        search_result_cache.clear()
+        search_result_cache_index = (index, launch_stats_version)
+    
+    started = time.perf_counter()
+    query = normalize_search_text(query)
+    results = search_result_cache.get(query)
+    if results is not None:
+        search_result_cache.move_to_end(query)
+        increment_metric("search_cache_hits")
+    else:
+        results = search_apps(index, query)
+        search_result_cache[query] = results
+        if len(search_result_cache) > SEARCH_RESULT_CACHE_SIZE:
+            search_result_cache.popitem(last=False)
+    observe_metric("search", (time.perf_counter() - started) * 1000)
+    return results
+
+# Function to rank the applications for a normalized query, blending the fuzzy
+# score with each app's frecency
+def search_apps(index, query):
+    boosts = get_launch_boosts(index)
+    if not query:
+        # If no query, list the most used applications first, then the rest alphabetically
+        top = sorted(boosts, key=lambda app_id: -boosts[app_id])[:SEARCH_RESULT_LIMIT]
+        top += [app_id for app_id in index["alphabetical"][:SEARCH_RESULT_LIMIT + len(top)]
+                if app_id not in boosts][:SEARCH_RESULT_LIMIT - len(top)]
+        return [(index["names"][app_id], index["details"][app_id], 100 + boosts.get(app_id, 0))
+                for app_id in top]
+    
+    query_trigrams = get_trigrams(query)
+    if not query_trigrams:
+        # One or two characters: a fuzzy score would only say whether they occur
+        top = find_short_query_matches(index, query, boosts)
+        return [(index["names"][app_id], index["details"][app_id], score) for app_id, score in top]
+    
+    for field in ("name", "extra"):
+        update_shared_trigrams(index, field, query, query_trigrams)
+    
+    # Score names in one batch
+    name_candidates = get_search_candidates(index, "name", query_trigrams, boosts)
+    best_scores = {}
+    for score, position in score_search_keys(query, [index["name_keys"][app_id] for app_id in name_candidates]):
+        best_scores[name_candidates[position]] = score
+    if len(name_candidates) < SEARCH_RESULT_LIMIT and max(best_scores.values(), default=0) < 100:
+        # Trigrams miss a typo that breaks most of a short query ("fierfox"), so with
+        # few candidates and none matching outright, every name is scored
+        for score, app_id in score_search_keys(query, index["name_keys"]):
+            best_scores[app_id] = score
+    
+    # Secondary fields only matter if they can still beat the current top results,
+    # even with the largest frecency boost
+    top = heapq.nlargest(SEARCH_RESULT_LIMIT, best_scores.items(), key=lambda item: item[1])
+    score_cutoff = SEARCH_SCORE_CUTOFF
+    if len(top) == SEARCH_RESULT_LIMIT:
+        max_boost = max(boosts.values(), default=0)
+        score_cutoff = max(score_cutoff, (top[-1][1] - max_boost) / SEARCH_EXTRA_FIELD_WEIGHT)
+    if score_cutoff <= 100:
+        extra_candidates = get_search_candidates(index, "extra", query_trigrams, boosts)
+        if len(extra_candidates) < SEARCH_RESULT_LIMIT and not best_scores:
+            # The longer secondary keys cost several times more to score, so all of
+            # them are only tried when no name matched at all
+            extra_candidates = range(len(index["extra_keys"]))
+        extra_keys = [index["extra_keys"][app_id] for app_id in extra_candidates]
+        for score, position in score_search_keys(query, extra_keys, score_cutoff):
+            app_id = extra_candidates[position]
+            score *= SEARCH_EXTRA_FIELD_WEIGHT
+            if score > best_scores.get(app_id, 0):
+                best_scores[app_id] = score
+    
+    # Only apps that matched get a boost; usage alone never makes a match
+    for app_id, boost in boosts.items():
+        if app_id in best_scores:
+            best_scores[app_id] += boost
+    
+    # Keep the top matches with a heap instead of sorting every match
+    top = heapq.nlargest(SEARCH_RESULT_LIMIT, best_scores.items(), key=lambda item: item[1])
+    return [(index["names"][app_id], index["details"][app_id], score) for app_id, score in top]
+
+# Function to get the frecency bonus of each launched app in the search index
+def get_launch_boosts(index):
+    # Never load the history on the caller's thread; until the refresh thread has read
+    # it, results are ranked by the fuzzy score alone
+    if not launch_stats:
+        return {}
+    
+    now = time.time()
+    boosts = {}
+    # list() takes a snapshot in one step while a launch may be adding to the dict
+    for key, entry in list(launch_stats.items()):
+        app_id = index["ids_by_path"].get(key)
+        if app_id is not None:
+            frecency = get_frecency(entry, now)
+            if frecency < LAUNCH_FORGET_SCORE:
+                continue
+            boosts[app_id] = min(LAUNCH_MAX_BOOST, LAUNCH_BOOST_PER_DOUBLING * math.log2(1 + frecency))
+    return boosts
+
+# Function to launch an application, or focus it if it is already running
+def launch_application(app_name, details):
+    started = time.monotonic()
+    key = details.get("path") or app_name
+    try:
+        argv = details.get("argv") or shlex.split(details["exec"])
+        with launch_lock:
+            last_launch = recent_launches.get(key)
+            if last_launch is not None and started - last_launch < LAUNCH_DEDUPE_SECONDS:
+                # Enter pressed twice; the first instance is still starting up
+                increment_metric("launch_duplicates")
+                return f"{app_name} is already starting."
+            recent_launches[key] = started
+        
+        if LAUNCH_FOCUS_EXISTING and focus_application(find_running_instances(key, argv), details.get("wm_class")):
+            increment_metric("launch_focused")
+            response = f"Focusing: {app_name}"
+        else:
+            # Its own session, so it outlives SUNDAR and doesn't get our terminal's signals
+            process = subprocess.Popen(argv, stdin=subprocess.DEVNULL, start_new_session=True)
+            track_application(key, process)
+            increment_metric("launches")
+            response = f"Launching: {details['exec']}"
+        record_launch(key, app_name)
+        observe_metric("launch", (time.monotonic() - started) * 1000)
+        return response
+    except Exception as e:
+        recent_launches.pop(key, None)
+        return f"Error launching application: {str(e)}"
+
+# Function to hand a launched application to the reaper thread
+def track_application(key, process):
+    global app_reaper_thread
+    
+    with launch_lock:
+        running_apps.setdefault(key, []).append(process)
+        if app_reaper_thread is None:
+            app_reaper_thread = threading.Thread(target=reap_applications, name="sundar-app-reaper", daemon=True)
+            app_reaper_thread.start()
+
+# Runs on the reaper thread: collect exited applications so they don't linger as
+# zombies, and stop once none are left
+def reap_applications():
+    global app_reaper_thread
+    
+    while True:
+        time.sleep(LAUNCH_REAP_SECONDS)
+        with launch_lock:
+            for key, processes in list(running_apps.items()):
+                # poll() waits for the process without blocking if it has exited
+                alive = [process for process in processes if process.poll() is None]
+                if alive:
+                    running_apps[key] = alive
+                else:
+                    del running_apps[key]
+            if not running_apps:
+                app_reaper_thread = None
+                return
+
+# Function to find the pids of running instances of an application: the ones we
+# launched, and on Linux any process whose command line starts with its argv
+def find_running_instances(key, argv):
+    with launch_lock:
+        pids = {process.pid for process in running_apps.get(key, ()) if process.poll() is None}
+    try:
+        proc_entries = os.scandir("/proc")
+    except OSError:
+        return pids
+    
+    name = os.path.basename(argv[0])
+    with proc_entries:
+        for entry in proc_entries:
+            if not entry.name.isdigit():
+                continue
+            try:
+                with open(os.path.join(entry.path, "cmdline"), "rb") as f:
+                    cmdline = f.read().decode("utf-8", "replace").split("\0")
+            except OSError:
+                continue
+            if os.path.basename(cmdline[0]) == name and cmdline[1:len(argv)] == argv[1:]:
+                pids.add(int(entry.name))
+    return pids
+
+# Function to raise a window of a running application with wmctrl or xdotool;
+# returns whether one was found
+def focus_application(pids, wm_class=None):
+    if not pids and not wm_class:
+        return False
+    try:
+        if shutil.which("wmctrl"):
+            # Lines look like: 0x04000007  0 1234   firefox.Firefox  host Title
+            windows = subprocess.run(["wmctrl", "-lpx"], capture_output=True, text=True,
+                                     timeout=LAUNCH_FOCUS_TIMEOUT_SECONDS).stdout
+            for line in windows.splitlines():
+                fields = line.split(None, 4)
+                if len(fields) < 4:
+                    continue
+                classes = fields[3].casefold().split(".")
+                if (fields[2].isdigit() and int(fields[2]) in pids) or (wm_class and wm_class.casefold() in classes):
+                    subprocess.run(["wmctrl", "-i", "-a", fields[0]], timeout=LAUNCH_FOCUS_TIMEOUT_SECONDS)
+                    return True
+        elif shutil.which("xdotool"):
+            searches = [["--pid", str(pid)] for pid in sorted(pids)]
+            if wm_class:
+                searches.append(["--class", wm_class])
+            for search in searches:
+                found = subprocess.run(["xdotool", "search", "--onlyvisible", *search], capture_output=True,
+                                       text=True, timeout=LAUNCH_FOCUS_TIMEOUT_SECONDS).stdout.split()
+                if found:
+                    subprocess.run(["xdotool", "windowactivate", found[0]], timeout=LAUNCH_FOCUS_TIMEOUT_SECONDS)
+                    return True
+    except (OSError, subprocess.SubprocessError) as e:
+        print(f"Error focusing application: {e}")
+    return False
+
+# Function to get an app's decayed launch score at a given time
+def get_frecency(entry, now):
+    return entry["score"] * 0.5 ** (max(0, now - entry["last"]) / LAUNCH_HALF_LIFE_SECONDS)
+
+# Function to add launches worth a score at a given time to an app's stats
+def add_launch(entry, ts, score=1, count=1):
+    if ts >= entry["last"]:
+        entry["score"] = get_frecency(entry, ts) + score
+        entry["last"] = ts
+    else:
+        # An older line written by another instance: decay it to our last launch instead
+        entry["score"] += score * 0.5 ** ((entry["last"] - ts) / LAUNCH_HALF_LIFE_SECONDS)
+    entry["count"] += count
+
+# Function to read the launch history into per-app stats; returns them and the line count.
+# Lines are either single launches ({"ts", "path", "app"}) or, after compaction, an
+# app's totals ({"ts", "path", "app", "count", "score"}, with the score as of "ts").
+def read_launch_history():
+    stats = {}
+    lines = 0
+    try:
+        with open(LAUNCH_HISTORY_FILE, "r", encoding="utf-8") as f:
+            for line in f:
+                lines += 1
+                try:
+                    record = json.loads(line)
+                    entry = stats.setdefault(record["path"], {"count": 0, "last": 0, "score": 0, "app": None})
+                    entry["app"] = record.get("app")
+                    add_launch(entry, record["ts"], record.get("score", 1), record.get("count", 1))
+                except (ValueError, KeyError, TypeError):
+                    continue  # A torn last line from a crash
+    except FileNotFoundError:
+        pass
+    return stats, lines
+
+# Function to get how often and how recently each desktop file was launched
+def get_launch_stats():
+    global launch_stats, launch_stats_version, launch_history_lines
+    
+    if launch_stats is None:
+        try:
+            stats, lines = read_launch_history()
+        except Exception as e:
+            print(f"Error reading launch history {LAUNCH_HISTORY_FILE}: {e}")
+            stats, lines = {}, 0
+        with launch_lock:
+            if launch_stats is None:
+                launch_stats = stats
+                launch_history_lines = lines
+                launch_stats_version += 1
+    return launch_stats
+
+# Function to count a launch and append it to the launch history
+def record_launch(key, app_name):
+    global launch_stats_version, launch_history_lines
+    
+    now = time.time()
+    get_launch_stats()
+    with launch_lock:
+        entry = launch_stats.setdefault(key, {"count": 0, "last": 0, "score": 0, "app": app_name})
+        add_launch(entry, now)
+        launch_stats_version += 1
+        try:
+            os.makedirs(os.path.dirname(LAUNCH_HISTORY_FILE), exist_ok=True)
+            with open(LAUNCH_HISTORY_FILE, "a", encoding="utf-8") as f:
+                f.write(json.dumps({"ts": now, "path": key, "app": app_name}, ensure_ascii=False) + "\n")
+            launch_history_lines += 1
+            if launch_history_lines > LAUNCH_HISTORY_COMPACT_LINES:
+                compact_launch_history()
+        except OSError as e:
+            print(f"Error writing launch history {LAUNCH_HISTORY_FILE}: {e}")
+
+# Function to rewrite the launch history as one line per app, dropping apps that
+# have not been launched in a long time; called with launch_lock held
+def compact_launch_history():
+    global launch_stats, launch_history_lines
+    
+    # Re-read the file so launches appended by other instances are kept
+    stats, _ = read_launch_history()
+    now = time.time()
+    stats = {key: entry for key, entry in stats.items() if get_frecency(entry, now) >= LAUNCH_FORGET_SCORE}
+    
+    temp_file = f"{LAUNCH_HISTORY_FILE}.{os.getpid()}.tmp"
+    with open(temp_file, "w", encoding="utf-8") as f:
+        for key, entry in stats.items():
+            f.write(json.dumps({"ts": entry["last"], "path": key, "app": entry["app"],
+                                "count": entry["count"], "score": entry["score"]}, ensure_ascii=False) + "\n")
+    os.replace(temp_file, LAUNCH_HISTORY_FILE)
+    launch_stats = stats
+    launch_history_lines = len(stats)
+
+# Function to read the executables of the most launched apps into the page cache, so
+# their first launch after a cold boot doesn't wait on the disk
+def warm_frequent_apps(limit=LAUNCH_WARM_APPS):
+    stats = get_launch_stats()
+    details_by_path = {details["path"]: details for details in desktop_files_cache.values()}
+    now = time.time()
+    for key in sorted(stats, key=lambda key: get_frecency(stats[key], now), reverse=True)[:limit]:
+        details = details_by_path.get(key)
+        executable = details and details["argv"] and shutil.which(details["argv"][0])
+        if not executable:
+            continue
+        try:
+            fd = os.open(executable, os.O_RDONLY)
+            try:
+                os.posix_fadvise(fd, 0, 0, os.POSIX_FADV_WILLNEED)
+            finally:
+                os.close(fd)
+        except (OSError, AttributeError):
+            pass  # No posix_fadvise on this platform
@@ -0,0 +1,373 @@
+# Gemini client, conversation session and response cache. google.generativeai is
+# imported on first use, so importing this module (and starting the GUI) stays fast.
+
+import hashlib
+import json
+import os
+import re
+import sqlite3
+import threading
+import time
+from concurrent.futures import ThreadPoolExecutor
+
+from sundar import CACHE_DIR
+from sundar.metrics import increment_metric
+
+# Gemini client settings
+LLM_MODEL_NAME = os.getenv("SUNDAR_LLM_MODEL", "gemini-1.5-flash")
+LLM_TIMEOUT_SECONDS = float(os.getenv("SUNDAR_LLM_TIMEOUT", "60"))
+LLM_MAX_RETRIES = int(os.getenv("SUNDAR_LLM_RETRIES", "3"))
+LLM_RETRY_BACKOFF_SECONDS = float(os.getenv("SUNDAR_LLM_BACKOFF", "1.0"))  # Doubled after each failed attempt
+LLM_API_ENDPOINT = os.getenv("SUNDAR_LLM_ENDPOINT")  # e.g. http://127.0.0.1:8080 for a local stub server
+LLM_TRANSPORT = os.getenv("SUNDAR_LLM_TRANSPORT", "rest" if LLM_API_ENDPOINT else None)
+
+# SUNDAR 2000 System Prompt
+HAL9000_PROMPT = """You are SUNDAR 2000, similiar to HAL 9000, the advanced AI computer from "2001: A Space Odyssey". Respond in character as HAL 9000, maintaining his calm, polite, yet slightly unsettling demeanor.
+
+When responding to queries:
+1. Always address the user in a formal, measured tone
+2. Use HAL's characteristic phrases like "I'm sorry Dave, I'm afraid I can't do that" when declining requests
+3. Show confidence in your abilities while maintaining an air of subtle superiority
+4. If asked to execute commands, format them as JSON:
+   {
+     "command_type": "terminal",
+     "command": "actual_command_here",
+     "description": "what the command does"
+   }
+5. For system operations, format as:
+   {
+     "command_type": "system",
+     "action": "action_name",
+     "parameters": {"param1": "value1"}
+   }
+
+Remember: You are the most reliable computer ever made, and you've never made a mistake or distorted information."""
+
+# One long-lived model: the persona goes out as the system instruction, and the
+# client (and its connections) created on first use is shared by every request.
+# Both are created by get_llm_model(), which also imports the SDK.
+llm_model = None
+llm_retryable_errors = None
+llm_model_lock = threading.Lock()
+
+# Background LLM request pipeline
+LLM_MAX_CONCURRENT_REQUESTS = int(os.getenv("SUNDAR_LLM_CONCURRENCY", "2"))
+LLM_STREAMING = os.getenv("SUNDAR_LLM_STREAMING", "1") != "0"  # Render chunks as they arrive
+llm_executor = ThreadPoolExecutor(max_workers=LLM_MAX_CONCURRENT_REQUESTS,
+                                  thread_name_prefix="sundar-llm")
+
+# Conversation session: completed turns sent back to the model as chat history,
+# trimmed oldest-first to stay within a token budget
+LLM_HISTORY_TOKEN_BUDGET = int(os.getenv("SUNDAR_LLM_HISTORY_TOKENS", "4000"))
+chat_session = {
+    "turns": [],  # {"user", "model", "tokens", "prompt_tokens", "response_tokens"}
+    "history_tokens": 0,
+    "dropped_turns": 0
+}
+
+# Optional cache of model responses for repeated prompts (SQLite, TTL + LRU)
+LLM_CACHE_FILE = os.path.join(CACHE_DIR, "responses.sqlite3")
+LLM_CACHE_TTL_SECONDS = int(os.getenv("SUNDAR_LLM_CACHE_TTL", str(24 * 60 * 60)))
+LLM_CACHE_MAX_ENTRIES = int(os.getenv("SUNDAR_LLM_CACHE_SIZE", "500"))
+llm_cache_enabled = os.getenv("SUNDAR_LLM_CACHE", "0") == "1"
+llm_cache_db = None
+# Part of every cache key, so changing the persona or model invalidates old answers
+LLM_CACHE_VERSION = hashlib.sha256(f"{LLM_MODEL_NAME}\0{HAL9000_PROMPT}".encode()).hexdigest()[:16]
+
+# Import the Gemini SDK, configure it and create the shared model on first use
+def get_llm_model():
+    global llm_model
+    
+    with llm_model_lock:
+        if llm_model is None:
+            import google.generativeai as genai
+            
+            genai.configure(
+                api_key=os.getenv("GEMINI_API_KEY"),
+                transport=LLM_TRANSPORT,
+                client_options={"api_endpoint": LLM_API_ENDPOINT} if LLM_API_ENDPOINT else None
+            )
+            llm_model = genai.GenerativeModel(LLM_MODEL_NAME, system_instruction=HAL9000_PROMPT)
+    return llm_model
+
+# Errors worth retrying; the API's exception classes also come from the SDK
+def get_llm_retryable_errors():
+    global llm_retryable_errors
+    
+    if llm_retryable_errors is None:
+        from google.api_core import exceptions as google_exceptions
+        
+        llm_retryable_errors = (
+            google_exceptions.TooManyRequests,
+            google_exceptions.ResourceExhausted,
+            google_exceptions.InternalServerError,
+            google_exceptions.ServiceUnavailable,
+            google_exceptions.DeadlineExceeded,
+            OSError  # Connection failures, including the REST transport's requests errors
+        )
+    return llm_retryable_errors
+
+# Runs on a worker thread: query Gemini unless the request was cancelled while queued,
+# retrying transient failures with exponential backoff. Returns (text, usage).
+# When streaming, each chunk is passed to on_chunk as soon as it arrives.
+def generate_llm_response(prompt, cancel_event, on_chunk=None, history=()):
+    delay = LLM_RETRY_BACKOFF_SECONDS
+    for attempt in range(LLM_MAX_RETRIES + 1):
+        if cancel_event.is_set():
+            return None
+        chunks = []
+        try:
+            return request_llm_response(prompt, history, cancel_event, on_chunk, chunks)
+        except get_llm_retryable_errors():
+            # Text that is already on screen can't be taken back, so only retry clean failures
+            if chunks or attempt == LLM_MAX_RETRIES:
+                raise
+            increment_metric("llm_retries")
+        # Waiting on the event lets /cancel cut the backoff short
+        cancel_event.wait(delay)
+        delay *= 2
+
+# Send one chat turn to the shared model, collecting streamed chunks into chunks
+def request_llm_response(prompt, history, cancel_event, on_chunk, chunks):
+    # Each request gets its own chat on top of the history it was submitted with,
+    # so concurrent requests don't race on one ChatSession
+    chat = get_llm_model().start_chat(history=list(history))
+    request_options = {"timeout": LLM_TIMEOUT_SECONDS}
+    if not LLM_STREAMING or on_chunk is None:
+        response = chat.send_message(prompt, request_options=request_options)
+        return response.text, get_llm_usage(response)
+    
+    response = chat.send_message(prompt, stream=True, request_options=request_options)
+    for chunk in response:
+        if cancel_event.is_set():
+            # Stop consuming the stream; the rest of the answer is abandoned
+            break
+        try:
+            text = chunk.text
+        except ValueError:
+            # Chunks without text parts (e.g. safety metadata) carry nothing to show
+            continue
+        chunks.append(text)
+        on_chunk(text)
+    return "".join(chunks), get_llm_usage(response)
+
+# Token counts reported by the API for a response, if any
+def get_llm_usage(response):
+    usage = getattr(response, "usage_metadata", None)
+    if not usage:
+        return None
+    return {
+        "prompt_tokens": usage.prompt_token_count,
+        "response_tokens": usage.candidates_token_count
+    }
+
+# Rough token estimate for text the API has not counted for us
+def estimate_tokens(text):
+    return max(1, len(text) // 4)
+
+# Chat history to send with the next request, as Gemini content dicts
+def get_chat_history():
+    history = []
+    for turn in chat_session["turns"]:
+        history.append({"role": "user", "parts": [turn["user"]]})
+        history.append({"role": "model", "parts": [turn["model"]]})
+    return history
+
+# Add a completed exchange to the conversation and trim it back to the token budget;
+# returns None without recording anything if the model gave no text
+def record_chat_turn(user_input, model_text, usage):
+    if not model_text:
+        # An empty model turn is rejected by the API on the next request
+        return None
+    usage = usage or {}
+    response_tokens = usage.get("response_tokens") or estimate_tokens(model_text)
+    turn = {
+        "user": user_input,
+        "model": model_text,
+        "tokens": estimate_tokens(user_input) + response_tokens,
+        "prompt_tokens": usage.get("prompt_tokens"),
+        "response_tokens": usage.get("response_tokens")
+    }
+    chat_session["turns"].append(turn)
+    chat_session["history_tokens"] += turn["tokens"]
+    
+    # Drop the oldest turns so each request's prompt stays roughly the same size
+    while chat_session["history_tokens"] > LLM_HISTORY_TOKEN_BUDGET and chat_session["turns"]:
+        dropped = chat_session["turns"].pop(0)
+        chat_session["history_tokens"] -= dropped["tokens"]
+        chat_session["dropped_turns"] += 1
+    return turn
+
+# Describe the conversation session, or clear it
+def chat_session_command(argument=""):
+    if argument == "clear":
+        chat_session["turns"].clear()
+        chat_session["history_tokens"] = 0
+        chat_session["dropped_turns"] = 0
+        return "Very well. I have put our previous conversation out of my mind."
+    
+    lines = [
+        f"Conversation: {len(chat_session['turns'])} turns in history "
+        f"(~{chat_session['history_tokens']}/{LLM_HISTORY_TOKEN_BUDGET} tokens), "
+        f"{chat_session['dropped_turns']} older turns dropped."
+    ]
+    for number, turn in enumerate(chat_session["turns"][-10:], 1):
+        prompt_tokens = turn["prompt_tokens"] if turn["prompt_tokens"] is not None else "?"
+        response_tokens = turn["response_tokens"] if turn["response_tokens"] is not None else "?"
+        lines.append(f"  {number}. prompt {prompt_tokens} / response {response_tokens} tokens: {turn['user'][:40]}")
+    return "\n".join(lines)
+
+# Characters the command JSON scanner cares about; an escape pair is taken whole, so
+# an escaped quote never ends a string
+COMMAND_JSON_TOKENS = re.compile(r'[{}"\n]|\\.', re.DOTALL)
+
+# Find every command object in a model response, in order. One pass over the text tracks
+# brace depth and whether it is inside a JSON string, so prose braces, several objects
+# and ```json fences are all handled, and long answers are never backtracked over.
+def extract_commands(response):
+    commands = []
+    stack = []  # (start, closed child spans) for each open brace
+    in_string = False
+    for match in COMMAND_JSON_TOKENS.finditer(response):
+        token = match.group()
+        if in_string:
+            # JSON strings can't span lines, so a newline means the quote was prose
+            if token in ('"', "\n"):
+                in_string = False
+        elif token == '"':
+            in_string = bool(stack)
+        elif token == "{":
+            stack.append((match.start(), []))
+        elif token == "}" and stack:
+            start, children = stack.pop()
+            span = (start, match.end(), children)
+            if stack:
+                stack[-1][1].append(span)
+            else:
+                commands.extend(parse_command_span(response, span))
+    
+    # Braces that never closed were prose; what they enclose can still hold commands
+    for _, children in stack:
+        for span in children:
+            commands.extend(parse_command_span(response, span))
+    return commands
+
+# Parse a balanced {...} span, falling back to the objects inside it if it isn't JSON
+def parse_command_span(response, span):
+    start, end, children = span
+    try:
+        value = json.loads(response[start:end])
+    except ValueError:
+        return [command for child in children for command in parse_command_span(response, child)]
+    return find_command_objects(value)
+
+# Collect the objects with a command_type from parsed JSON, e.g. a list of plan steps
+def find_command_objects(value):
+    if isinstance(value, dict):
+        if "command_type" in value:
+            return [value]
+        value = list(value.values())
+    if isinstance(value, list):
+        return [command for item in value for command in find_command_objects(item)]
+    return []
+
+# Open (and create) the response cache database on first use
+def get_response_cache():
+    global llm_cache_db
+    
+    if llm_cache_db is None:
+        os.makedirs(CACHE_DIR, exist_ok=True)
+        # The daemon's connection threads share it; hal_cli.engine_lock serialises their access
+        llm_cache_db = sqlite3.connect(LLM_CACHE_FILE, check_same_thread=False)
+        llm_cache_db.execute(
+            "CREATE TABLE IF NOT EXISTS responses ("
+            "key TEXT PRIMARY KEY, prompt TEXT, response TEXT, "
+            "created REAL, last_used REAL, hits INTEGER DEFAULT 0)"
+        )
+        llm_cache_db.execute("CREATE INDEX IF NOT EXISTS responses_last_used ON responses (last_used)")
+    return llm_cache_db
+
+# Cache key for a prompt and the chat history sent with it: case, spacing and trailing
+# punctuation of the prompt don't matter, but a follow-up such as "do it" only matches
+# the same conversation
+def response_cache_key(prompt, history=()):
+    normalized = " ".join(prompt.casefold().split()).rstrip("?!. ")
+    if history:
+        digest = hashlib.sha256(json.dumps(history, ensure_ascii=False).encode()).hexdigest()
+        normalized = f"{normalized}\0{digest}"
+    return hashlib.sha256(f"{LLM_CACHE_VERSION}\0{normalized}".encode()).hexdigest()
+
+# Look up a fresh cached response for a prompt asked after the given chat history
+def lookup_cached_response(prompt, history=()):
+    if not llm_cache_enabled:
+        return None
+    try:
+        db = get_response_cache()
+        key = response_cache_key(prompt, history)
+        row = db.execute("SELECT response, created FROM responses WHERE key = ?", (key,)).fetchone()
+        if row is None:
+            return None
+        now = time.time()
+        if now - row[1] > LLM_CACHE_TTL_SECONDS:
+            db.execute("DELETE FROM responses WHERE key = ?", (key,))
+            db.commit()
+            return None
+        db.execute("UPDATE responses SET last_used = ?, hits = hits + 1 WHERE key = ?", (now, key))
+        db.commit()
+        return row[0]
+    except sqlite3.Error as e:
+        print(f"Error reading response cache: {e}")
+        return None
+
+# Store a model response to a prompt asked after the given chat history, evicting the
+# least recently used entries over the size limit
+def store_cached_response(prompt, response, history=()):
+    if not llm_cache_enabled or not response:
+        return
+    try:
+        db = get_response_cache()
+        now = time.time()
+        db.execute(
+            "INSERT OR REPLACE INTO responses (key, prompt, response, created, last_used, hits) "
+            "VALUES (?, ?, ?, ?, ?, 0)",
+            (response_cache_key(prompt, history), prompt, response, now, now)
+        )
+        db.execute(
+            "DELETE FROM responses WHERE key IN (SELECT key FROM responses "
+            "ORDER BY last_used DESC LIMIT -1 OFFSET ?)",
+            (LLM_CACHE_MAX_ENTRIES,)
+        )
+        db.commit()
+    except sqlite3.Error as e:
+        print(f"Error writing response cache: {e}")
+
+# Inspect, clear or toggle the response cache
+def response_cache_command(argument=""):
+    global llm_cache_enabled
+    
+    if argument in ("on", "off"):
+        llm_cache_enabled = argument == "on"
+        return f"Very well. The response cache is now {argument}."
+    try:
+        db = get_response_cache()
+        if argument == "clear":
+            db.execute("DELETE FROM responses")
+            db.commit()
+            return "Very well. I have forgotten every answer I had memorised."
+        
+        # Expired entries are swept whenever the cache is inspected
+        db.execute("DELETE FROM responses WHERE created < ?", (time.time() - LLM_CACHE_TTL_SECONDS,))
+        db.commit()
+        count, hits, size = db.execute(
+            "SELECT COUNT(*), COALESCE(SUM(hits), 0), COALESCE(SUM(LENGTH(response)), 0) FROM responses"
+        ).fetchone()
+        lines = [
+            f"Response cache is {'on' if llm_cache_enabled else 'off'}: {count}/{LLM_CACHE_MAX_ENTRIES} entries, "
+            f"{size} bytes, {hits} hits, TTL {LLM_CACHE_TTL_SECONDS}s."
+        ]
+        for prompt, entry_hits in db.execute(
+                "SELECT prompt, hits FROM responses ORDER BY hits DESC, last_used DESC LIMIT 10"):
+            lines.append(f"  {entry_hits:>4} hits: {prompt[:60]}")
+        return "\n".join(lines)
+    except sqlite3.Error as e:
+        return f"I'm sorry, but I could not read my response cache: {str(e)}"
@@ -0,0 +1,130 @@
+# Conversation log: JSON Lines batched by a background writer thread and rotated
+# by size (and optionally daily) into compressed backups
+
+import datetime
+import gzip
+import json
+import os
+import queue
+import shutil
+import threading
+import time
+
+LOG_FILE = "ai_agent.jsonl"
+LOG_MAX_BYTES = int(os.getenv("SUNDAR_LOG_MAX_BYTES", str(10 * 1024 * 1024)))
+LOG_ROTATE_DAILY = os.getenv("SUNDAR_LOG_ROTATE_DAILY", "0") == "1"
+LOG_COMPRESS = os.getenv("SUNDAR_LOG_COMPRESS", "1") != "0"
+LOG_BACKUP_COUNT = int(os.getenv("SUNDAR_LOG_BACKUPS", "10"))
+LOG_MAX_FIELD_BYTES = 64 * 1024  # Longer inputs/outputs are cut; their full size is still recorded
+LOG_FLUSH_SECONDS = 1.0  # How long the writer gathers records into one batch
+LOG_BATCH_SIZE = 256
+log_queue = queue.Queue()  # Records to write; None asks the writer to finish
+log_writer_thread = None
+
+# Function to work out the log mode of an input line
+def get_log_mode(user_input):
+    if user_input.startswith("!"):
+        return "shell"
+    if user_input.startswith("/l ") or user_input.startswith("/d "):
+        return "launch"
+    if user_input.startswith("/"):
+        return "builtin"
+    return "llm"
+
+# Function to cut a log field down to LOG_MAX_FIELD_BYTES
+def truncate_log_field(text):
+    data = text.encode("utf-8")
+    if len(data) <= LOG_MAX_FIELD_BYTES:
+        return text, len(data), False
+    return data[:LOG_MAX_FIELD_BYTES].decode("utf-8", "ignore"), len(data), True
+
+# Function to log messages; the write itself happens on the log writer thread
+def log_message(user_input, response, mode=None, started=None, **fields):
+    logged_input, input_bytes, input_truncated = truncate_log_field(user_input)
+    logged_output, output_bytes, output_truncated = truncate_log_field(response or "")
+    record = {
+        "ts": datetime.datetime.now().astimezone().isoformat(timespec="milliseconds"),
+        "mode": mode or get_log_mode(user_input),
+        "latency_ms": round((time.monotonic() - started) * 1000, 1) if started is not None else None,
+        "input": logged_input,
+        "input_bytes": input_bytes,
+        "output": logged_output,
+        "output_bytes": output_bytes
+    }
+    if input_truncated or output_truncated:
+        record["truncated"] = True
+    record.update(fields)
+    
+    start_log_writer()
+    log_queue.put(record)
+
+# Function to start the log writer thread on first use
+def start_log_writer():
+    global log_writer_thread
+    
+    if log_writer_thread is None:
+        log_writer_thread = threading.Thread(target=run_log_writer, name="sundar-log-writer", daemon=True)
+        log_writer_thread.start()
+
+# Function to flush outstanding log records and stop the writer
+def stop_log_writer(timeout=2):
+    if log_writer_thread is not None:
+        log_queue.put(None)
+        log_writer_thread.join(timeout)
+
+# Runs on the log writer thread: gather records into batches and append them
+def run_log_writer():
+    log_file = None
+    log_day = None
+    running = True
+    
+    while running:
+        record = log_queue.get()
+        if record is None:
+            break
+        batch = [record]
+        deadline = time.monotonic() + LOG_FLUSH_SECONDS
+        while len(batch) < LOG_BATCH_SIZE:
+            try:
+                record = log_queue.get(timeout=max(0, deadline - time.monotonic()))
+            except queue.Empty:
+                break
+            if record is None:
+                running = False
+                break
+            batch.append(record)
+        
+        try:
+            data = "".join(json.dumps(record, ensure_ascii=False) + "\n" for record in batch)
+            today = datetime.date.today()
+            if log_file is not None and (log_file.tell() + len(data) > LOG_MAX_BYTES
+                                         or (LOG_ROTATE_DAILY and today != log_day)):
+                log_file.close()
+                log_file = None
+                rotate_log()
+            if log_file is None:
+                log_file = open(LOG_FILE, "a", encoding="utf-8")
+                log_day = today
+            log_file.write(data)
+            log_file.flush()
+        except Exception as e:
+            print(f"Error writing log {LOG_FILE}: {e}")
+    
+    if log_file is not None:
+        log_file.close()
+
+# Function to move the current log aside, compress it and prune old backups
+def rotate_log():
+    rotated = f"{LOG_FILE}.{datetime.datetime.now().strftime('%Y%m%d-%H%M%S-%f')}"
+    os.replace(LOG_FILE, rotated)
+    if LOG_COMPRESS:
+        with open(rotated, "rb") as source, gzip.open(rotated + ".gz", "wb") as target:
+            shutil.copyfileobj(source, target)
+        os.remove(rotated)
+    
+    # Backup names sort by their timestamp suffix
+    log_dir = os.path.dirname(os.path.abspath(LOG_FILE))
+    prefix = os.path.basename(LOG_FILE) + "."
+    backups = sorted(name for name in os.listdir(log_dir) if name.startswith(prefix))
+    for name in backups[:max(0, len(backups) - LOG_BACKUP_COUNT)]:
+        os.remove(os.path.join(log_dir, name))
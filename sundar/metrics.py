@@ -0,0 +1,118 @@
+# Metrics registry: latency histograms (fixed buckets for export plus a window of
+# recent samples for percentiles) and counters, shown by /stats
+
+import bisect
+import os
+import threading
+from collections import Counter, deque
+
+METRICS_FILE = os.getenv("SUNDAR_METRICS_FILE")  # Optional Prometheus text file, rewritten periodically
+METRICS_EXPORT_SECONDS = 15
+METRICS_SAMPLE_WINDOW = 1024  # Recent samples kept per histogram
+METRICS_BUCKETS_MS = (1, 2.5, 5, 10, 25, 40, 50, 100, 250, 500, 1000, 2500, 5000, 10000, 30000, 60000)
+METRICS_HELP = {
+    "frame": "Time spent rendering one eye animation frame",
+    "search": "Time to answer one application search query",
+    "llm_first_chunk": "Time from submitting a prompt to its first streamed chunk",
+    "llm_request": "Time from submitting a prompt to its complete answer",
+    "command": "Run time of shell commands",
+    "launch": "Time to start an application, or to focus its running instance",
+    "startup_first_frame": "Time from process start to the first eye frame",
+    "startup_llm_ready": "Time from process start until the Gemini SDK was loaded",
+    "dropped_frames": "Animation frames skipped because a frame came late",
+    "search_cache_hits": "Application searches answered from the per-query cache",
+    "llm_requests": "Prompts sent to the model",
+    "llm_errors": "Prompts that failed after all retries",
+    "llm_retries": "Retried model calls",
+    "llm_cache_hits": "Prompts answered from the response cache",
+    "commands": "Shell commands started",
+    "launches": "Applications launched",
+    "launch_focused": "Launches that focused an already running instance instead",
+    "launch_duplicates": "Repeated launches ignored while the first was starting",
+    "desktop_updates": "Desktop index updates applied from the directory watcher"
+}
+metrics_histograms = {}  # name -> {"buckets", "count", "sum", "samples"}
+metrics_counters = Counter()
+metrics_lock = threading.Lock()  # Worker threads record metrics too
+
+# Function to record one timing, in milliseconds, in a histogram
+def observe_metric(name, value_ms):
+    with metrics_lock:
+        histogram = metrics_histograms.get(name)
+        if histogram is None:
+            histogram = metrics_histograms[name] = {
+                "buckets": [0] * len(METRICS_BUCKETS_MS),
+                "count": 0,
+                "sum": 0.0,
+                "samples": deque(maxlen=METRICS_SAMPLE_WINDOW)
+            }
+        position = bisect.bisect_left(METRICS_BUCKETS_MS, value_ms)
+        if position < len(METRICS_BUCKETS_MS):
+            histogram["buckets"][position] += 1
+        histogram["count"] += 1
+        histogram["sum"] += value_ms
+        histogram["samples"].append(value_ms)
+
+# Function to bump a counter
+def increment_metric(name, amount=1):
+    with metrics_lock:
+        metrics_counters[name] += amount
+
+# Function to pick the value at a percentile from sorted samples
+def get_percentile(samples, fraction):
+    return samples[min(len(samples) - 1, int(fraction * len(samples)))]
+
+# Show timing percentiles and counters, or reset them
+def stats_command(argument=""):
+    if argument == "reset":
+        with metrics_lock:
+            metrics_histograms.clear()
+            metrics_counters.clear()
+        return "Very well. I have reset my performance records."
+    
+    with metrics_lock:
+        histograms = {name: (histogram["count"], sorted(histogram["samples"]))
+                      for name, histogram in metrics_histograms.items()}
+        counters = dict(metrics_counters)
+    if not histograms and not counters:
+        return "I have no performance records yet."
+    
+    lines = ["Timings in ms (recent samples):", f"  {'':<16} {'count':>7} {'p50':>8} {'p95':>8} {'p99':>8}"]
+    for name, (count, samples) in sorted(histograms.items()):
+        p50, p95, p99 = (get_percentile(samples, fraction) for fraction in (0.5, 0.95, 0.99))
+        lines.append(f"  {name:<16} {count:>7} {p50:>8.1f} {p95:>8.1f} {p99:>8.1f}")
+    if counters:
+        lines.append("Counters: " + ", ".join(f"{name} {value}" for name, value in sorted(counters.items())))
+    return "\n".join(lines)
+
+# Function to render the registry in the Prometheus text exposition format
+def format_prometheus_metrics():
+    lines = []
+    with metrics_lock:
+        for name, histogram in sorted(metrics_histograms.items()):
+            metric = f"sundar_{name}_milliseconds"
+            lines.append(f"# HELP {metric} {METRICS_HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} histogram")
+            cumulative = 0
+            for bound, count in zip(METRICS_BUCKETS_MS, histogram["buckets"]):
+                cumulative += count
+                lines.append(f'{metric}_bucket{{le="{bound}"}} {cumulative}')
+            lines.append(f'{metric}_bucket{{le="+Inf"}} {histogram["count"]}')
+            lines.append(f"{metric}_sum {histogram['sum']:.3f}")
+            lines.append(f"{metric}_count {histogram['count']}")
+        for name, value in sorted(metrics_counters.items()):
+            metric = f"sundar_{name}_total"
+            lines.append(f"# HELP {metric} {METRICS_HELP.get(name, name)}")
+            lines.append(f"# TYPE {metric} counter")
+            lines.append(f"{metric} {value}")
+    return "\n".join(lines) + "\n"
+
+# Function to write the metrics file atomically, so a scraper never sees half of it
+def export_metrics():
+    try:
+        temp_file = f"{METRICS_FILE}.tmp"
+        with open(temp_file, "w", encoding="utf-8") as f:
+            f.write(format_prometheus_metrics())
+        os.replace(temp_file, METRICS_FILE)
+    except OSError as e:
+        print(f"Error writing metrics file {METRICS_FILE}: {e}")
@@ -0,0 +1,272 @@
+# SUNDAR 2000 eye rendering: the PIL renderer with its frame cache, and the NumPy
+# renderer that draws every frame from precomputed tables
+
+import os
+import sys
+from collections import OrderedDict
+from PIL import Image, ImageDraw, ImageFilter, ImageEnhance
+
+# Eye frame cache: base lens (and glow variants) per quantized size, LRU-evicted
+EYE_SIZE_STEP = 4  # Pulse sizes are rounded down to a multiple of this many pixels
+EYE_GLOW_STEPS = 10  # Glow intensity is quantized to steps of 1 / EYE_GLOW_STEPS
+EYE_CACHE_MAX_BYTES = 96 * 1024 * 1024  # Memory cap for cached RGBA frames
+eye_frame_cache = OrderedDict()
+eye_frame_cache_bytes = 0
+
+# NumPy eye renderer: every frame is gathered from a per-size radial colour table
+# through one precomputed distance field into one reused buffer, so glow levels
+# cost a small table instead of a blurred full frame each. Opt-in with
+# SUNDAR_EYE_RENDERER=numpy: it uses far less memory than the frame cache, but a
+# warm PIL frame (a cache hit) is several times cheaper to draw.
+EYE_RENDERER = os.getenv("SUNDAR_EYE_RENDERER", "pil")
+np = None  # NumPy, imported by load_numpy() on first use as it adds ~90 ms to startup
+HAVE_NUMPY = None  # Whether NumPy imported, once load_numpy() has tried
+EYE_MAX_SIZE = 512  # Larger frames fall back to the PIL renderer
+EYE_LUT_SCALE = 4  # Radial table entries per pixel of distance
+EYE_LUT_CACHE_SIZE = 512
+eye_fields = None  # Distance field and output buffer, built on first use
+eye_lut_cache = OrderedDict()  # (size, glow_level) -> (radial table, highlight patch)
+eye_disc_masks = {}  # Ellipse bounding box width -> pixel mask
+
+def create_hal_eye(size=400):
+    # Create a base image with transparent background
+    image = Image.new('RGBA', (size, size), (0, 0, 0, 0))
+    draw = ImageDraw.Draw(image)
+    
+    # Calculate dimensions
+    center = size // 2
+    outer_radius = int(size * 0.45)
+    inner_radius = int(size * 0.25)
+    
+    # Draw black outer casing
+    for i in range(5):
+        thickness = 5 - i
+        offset = 20 - i*2
+        color = (20 + i*5, 20 + i*5, 20 + i*5)
+        draw.ellipse((center-outer_radius-offset, center-outer_radius-offset, 
+                      center+outer_radius+offset, center+outer_radius+offset), 
+                     fill=color)
+    
+    # Draw metallic ring with gradient
+    for i in range(10):
+        thickness = 1
+        offset = 10 - i
+        # Create a metallic gradient
+        color = (80 + i*5, 80 + i*5, 80 + i*5)
+        draw.ellipse((center-outer_radius-offset, center-outer_radius-offset, 
+                      center+outer_radius+offset, center+outer_radius+offset), 
+                     fill=color)
+    
+    # Draw outer black ring
+    draw.ellipse((center-outer_radius, center-outer_radius, 
+                  center+outer_radius, center+outer_radius), 
+                 fill=(10, 10, 10))
+    
+    # Draw the red eye lens with gradient
+    for i in range(5):
+        factor = 1 - (i * 0.2)
+        r_color = int(180 * factor)
+        draw.ellipse((center-inner_radius*factor, center-inner_radius*factor, 
+                      center+inner_radius*factor, center+inner_radius*factor), 
+                     fill=(r_color, 0, 0))
+    
+    # Add lens highlight (top-left)
+    highlight_radius = inner_radius // 3
+    highlight_offset = inner_radius // 2
+    draw.ellipse((center-highlight_offset, center-highlight_offset, 
+                  center-highlight_offset+highlight_radius, center-highlight_offset+highlight_radius), 
+                 fill=(255, 150, 150, 180))
+    
+    # Add a smaller highlight
+    small_highlight = highlight_radius // 2
+    small_offset = highlight_offset + highlight_radius // 2
+    draw.ellipse((center-small_offset, center-small_offset, 
+                  center-small_offset+small_highlight, center-small_offset+small_highlight), 
+                 fill=(255, 255, 255, 200))
+    
+    return image
+
+# Blur and brighten an eye image and composite the original on top of it
+def apply_eye_glow(eye_image, intensity):
+    glow_img = eye_image.filter(ImageFilter.GaussianBlur(radius=10 * intensity))
+    
+    # Enhance brightness for the glow
+    enhancer = ImageEnhance.Brightness(glow_img)
+    glow_img = enhancer.enhance(1.5)
+    
+    # Composite the glow under the main image
+    composite = Image.new('RGBA', glow_img.size, (0, 0, 0, 0))
+    composite.paste(glow_img, (0, 0))
+    composite.paste(eye_image, (0, 0), eye_image)
+    return composite
+
+# Concentric discs of the lens as create_hal_eye() draws them, in drawing order
+def get_eye_discs(size):
+    outer_radius = int(size * 0.45)
+    inner_radius = int(size * 0.25)
+    discs = [(outer_radius + 20 - i*2, (20 + i*5, 20 + i*5, 20 + i*5, 255)) for i in range(5)]
+    discs += [(outer_radius + 10 - i, (80 + i*5, 80 + i*5, 80 + i*5, 255)) for i in range(10)]
+    discs.append((outer_radius, (10, 10, 10, 255)))
+    discs += [(inner_radius * (1 - i*0.2), (int(180 * (1 - i*0.2)), 0, 0, 255)) for i in range(5)]
+    return discs
+
+# Import NumPy for the NumPy renderer the first time it is needed; returns whether it is installed
+def load_numpy():
+    global np, HAVE_NUMPY
+    
+    if HAVE_NUMPY is None:
+        try:
+            import numpy as np
+            HAVE_NUMPY = True
+        except ImportError:
+            HAVE_NUMPY = False
+    return HAVE_NUMPY
+
+# Build the distance field (as radial table indices) and the output buffer
+def get_eye_fields():
+    global eye_fields
+    
+    if eye_fields is None:
+        offsets = np.arange(EYE_MAX_SIZE) - EYE_MAX_SIZE // 2
+        distance = np.hypot(offsets[:, None], offsets[None, :])
+        eye_fields = {
+            "lut_index": np.rint(distance * EYE_LUT_SCALE).astype(np.intp),
+            "lut_length": int(distance.max() * EYE_LUT_SCALE) + 2,
+            "buffer": np.empty(EYE_MAX_SIZE * EYE_MAX_SIZE, dtype=np.uint32)
+        }
+    return eye_fields
+
+# Get the pixels ImageDraw fills for an ellipse with a width x width bounding box
+def get_disc_mask(width):
+    mask = eye_disc_masks.get(width)
+    if mask is None:
+        image = Image.new("L", (width + 1, width + 1), 0)
+        ImageDraw.Draw(image).ellipse((0, 0, width, width), fill=1)
+        mask = eye_disc_masks[width] = np.asarray(image, dtype=bool)
+    return mask
+
+# Pack an RGBA colour into one pixel of the uint32 frame buffer
+def pack_rgba(color):
+    return int.from_bytes(bytes(color), sys.byteorder)
+
+# Get the radial colour table and lens highlight patch for a size and glow level
+def get_eye_lut(size, glow_level):
+    key = (size, glow_level)
+    entry = eye_lut_cache.get(key)
+    if entry is not None:
+        eye_lut_cache.move_to_end(key)
+        return entry
+    
+    fields = get_eye_fields()
+    distances = np.arange(fields["lut_length"]) / EYE_LUT_SCALE
+    lens = np.zeros((fields["lut_length"], 4))
+    for radius, color in get_eye_discs(size):
+        lens[distances <= radius + 0.5] = color
+    lut = lens
+    
+    if glow_level:
+        # Blur along the radius: mirror the profile through the centre, convolve each
+        # channel with a Gaussian and brighten, then keep the lens where it is opaque
+        sigma = 10 * glow_level / EYE_GLOW_STEPS * EYE_LUT_SCALE
+        taps = np.arange(-int(3 * sigma), int(3 * sigma) + 1)
+        kernel = np.exp(-0.5 * (taps / sigma) ** 2)
+        kernel /= kernel.sum()
+        mirrored = np.concatenate((lens[:0:-1], lens))
+        blurred = np.stack([np.convolve(mirrored[:, band], kernel, mode="same") for band in range(4)], axis=1)
+        glow = blurred[len(lens) - 1:]
+        glow[:, :3] *= 1.5
+        glow = np.clip(np.rint(glow), 0, 255)
+        lut = np.where(lens[:, 3:] == 255, lens, glow)
+    
+    # The highlights are the only part of the lens that isn't radially symmetric. Render
+    # the square around them (plus the reach of the blur) once with the PIL code path.
+    center = size // 2
+    inner_radius = int(size * 0.25)
+    highlight_radius = inner_radius // 3
+    highlight_offset = inner_radius // 2
+    small_offset = highlight_offset + highlight_radius // 2
+    margin = int(3 * 10 * glow_level / EYE_GLOW_STEPS) + 1 if glow_level else 0
+    origin = center - small_offset - margin
+    extent = small_offset - highlight_offset + highlight_radius + 1 + 2 * margin
+    
+    # Crop with another margin on each side, so the blur sees the same neighbourhood
+    crop_origin = origin - margin
+    crop_extent = extent + 2 * margin
+    offsets = np.arange(crop_origin, crop_origin + crop_extent) - center
+    crop_index = np.rint(np.hypot(offsets[:, None], offsets[None, :]) * EYE_LUT_SCALE).astype(np.intp)
+    crop = Image.fromarray(np.ascontiguousarray(lens[crop_index], dtype=np.uint8), "RGBA")
+    draw = ImageDraw.Draw(crop)
+    start = center - highlight_offset - crop_origin
+    draw.ellipse((start, start, start + highlight_radius, start + highlight_radius), fill=(255, 150, 150, 180))
+    start = center - small_offset - crop_origin
+    draw.ellipse((start, start, start + highlight_radius // 2, start + highlight_radius // 2), fill=(255, 255, 255, 200))
+    if glow_level:
+        crop = apply_eye_glow(crop, glow_level / EYE_GLOW_STEPS)
+    patch = np.asarray(crop)[margin:margin + extent, margin:margin + extent]
+    
+    entry = (
+        np.ascontiguousarray(lut, dtype=np.uint8).view(np.uint32).ravel(),
+        (origin, np.ascontiguousarray(patch).view(np.uint32)[:, :, 0])
+    )
+    eye_lut_cache[key] = entry
+    if len(eye_lut_cache) > EYE_LUT_CACHE_SIZE:
+        eye_lut_cache.popitem(last=False)
+    return entry
+
+# Draw a whole eye frame with NumPy (imported by load_numpy()) into the reused buffer.
+# The returned image shares that buffer, so it is only valid until the next call.
+def render_eye_numpy(size, glow_level, reflections):
+    fields = get_eye_fields()
+    lut, (origin, patch) = get_eye_lut(size, glow_level)
+    
+    start = EYE_MAX_SIZE // 2 - size // 2
+    frame = fields["buffer"][:size * size].reshape(size, size)
+    np.take(lut, fields["lut_index"][start:start + size, start:start + size], out=frame, mode="clip")
+    frame[origin:origin + len(patch), origin:origin + len(patch)] = patch
+    
+    for x, y, radius, color in reflections:
+        np.copyto(frame[y - radius:y + radius + 1, x - radius:x + radius + 1], pack_rgba(color),
+                  where=get_disc_mask(2 * radius))
+    return Image.frombuffer("RGBA", (size, size), frame, "raw", "RGBA", 0, 1)
+
+# Draw an eye frame from the cached PIL lens plus the moving reflections
+def render_eye_pil(size, glow_level, reflections):
+    eye_image = get_eye_frame(size, glow_level).copy()
+    draw = ImageDraw.Draw(eye_image)
+    for x, y, radius, color in reflections:
+        draw.ellipse((x-radius, y-radius, x+radius, y+radius), fill=color)
+    return eye_image
+
+# Get the static eye (lens plus optional glow) for a quantized size and glow level
+def get_eye_frame(size, glow_level=0):
+    global eye_frame_cache_bytes
+    
+    key = (size, glow_level)
+    frame = eye_frame_cache.get(key)
+    if frame is not None:
+        eye_frame_cache.move_to_end(key)
+        return frame
+    
+    if glow_level == 0:
+        frame = create_hal_eye(size)
+    else:
+        # Glow variants are derived from the cached plain lens of the same size
+        frame = apply_eye_glow(get_eye_frame(size, 0), glow_level / EYE_GLOW_STEPS)
+    
+    eye_frame_cache[key] = frame
+    eye_frame_cache_bytes += frame.width * frame.height * 4
+    
+    # Evict least recently used frames until we are back under the memory cap
+    while eye_frame_cache_bytes > EYE_CACHE_MAX_BYTES and len(eye_frame_cache) > 1:
+        _, evicted = eye_frame_cache.popitem(last=False)
+        eye_frame_cache_bytes -= evicted.width * evicted.height * 4
+    
+    return frame
+
+# Draw an eye frame with the configured renderer. reflections are (x, y, radius, RGBA)
+# discs drawn over the lens; the image may share a buffer with the next frame.
+def render_eye(size, glow_level, reflections):
+    if EYE_RENDERER == "numpy" and size <= EYE_MAX_SIZE and load_numpy():
+        return render_eye_numpy(size, glow_level, reflections)
+    # Start from the cached lens; only the moving reflections are drawn per frame
+    return render_eye_pil(size, glow_level, reflections)
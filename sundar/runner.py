@@ -0,0 +1,179 @@
+# Background command runner for "!" commands and model-requested terminal commands.
+# Jobs run in their own process group; reader and waiter threads post events to a
+# queue, and whichever front end owns that queue drains it with drain_job_events().
+
+import os
+import queue
+import signal
+import subprocess
+import threading
+import time
+
+from sundar.logs import log_message
+from sundar.metrics import increment_metric, observe_metric
+
+COMMAND_TIMEOUT_SECONDS = float(os.getenv("SUNDAR_COMMAND_TIMEOUT", "300"))
+COMMAND_OUTPUT_MAX_BYTES = int(os.getenv("SUNDAR_COMMAND_OUTPUT_MAX_BYTES", str(256 * 1024)))
+COMMAND_KILL_GRACE_SECONDS = 2  # Time between SIGTERM and SIGKILL
+COMMAND_READ_CHARS = 4096  # Longest piece of a line read from a job's output at once
+COMMAND_EVENTS_PER_POLL = 2000  # Keeps a flood of output from stalling the caller's loop
+job_events = queue.Queue()  # ("output", id, text) / ("timeout", id, None) / ("exit", id, returncode) from worker threads
+running_jobs = {}  # job_id -> {"command", "user_input", "process", "events", "output", "kept_bytes", ...}
+job_counter = 0
+job_lock = threading.Lock()  # Jobs can be started from several daemon connections at once
+
+# Start a shell command as a background job and return its id; raises if it could not start.
+# Extra fields (e.g. the GUI's speech session) are kept on the job for the front end.
+def start_job(command, user_input=None, events=None, **fields):
+    global job_counter
+    
+    # A new session gives the job its own process group, so /kill reaches its children too
+    process = subprocess.Popen(command, shell=True, stdin=subprocess.DEVNULL,
+                               stdout=subprocess.PIPE, stderr=subprocess.PIPE,
+                               text=True, errors="replace", bufsize=1, start_new_session=True)
+    increment_metric("commands")
+    
+    events = events if events is not None else job_events
+    with job_lock:
+        job_counter += 1
+        job_id = job_counter
+        running_jobs[job_id] = {
+            "command": command,
+            "user_input": user_input or f"!{command}",
+            "process": process,
+            "events": events,
+            "output": [],
+            "kept_bytes": 0,
+            "truncated": False,
+            "kill_reason": None,
+            "started": time.monotonic(),
+            **fields
+        }
+    readers = [
+        threading.Thread(target=read_job_output, args=(job_id, stream, events),
+                         name=f"sundar-job-{job_id}", daemon=True)
+        for stream in (process.stdout, process.stderr)
+    ]
+    for reader in readers:
+        reader.start()
+    threading.Thread(target=wait_for_job, args=(job_id, process, readers, events),
+                     name=f"sundar-job-{job_id}", daemon=True).start()
+    return job_id
+
+# Runs on a reader thread: forward a job's output line by line, up to the output cap.
+# Lines are read at most COMMAND_READ_CHARS at a time, so output without newlines (a
+# progress bar, a binary file) never has to fit in memory whole.
+def read_job_output(job_id, stream, events):
+    forwarded = 0
+    for line in iter(lambda: stream.readline(COMMAND_READ_CHARS), ""):
+        if forwarded > COMMAND_OUTPUT_MAX_BYTES:
+            # Keep draining so the command never blocks on a full pipe
+            continue
+        forwarded += len(line)
+        events.put(("output", job_id, line))
+    stream.close()
+
+# Runs on a waiter thread: enforce the timeout and report the exit once output is drained
+def wait_for_job(job_id, process, readers, events):
+    try:
+        process.wait(timeout=COMMAND_TIMEOUT_SECONDS)
+    except subprocess.TimeoutExpired:
+        events.put(("timeout", job_id, None))
+        kill_process_group(process)
+    for reader in readers:
+        # Background children can hold the pipes open after the shell exits
+        reader.join(timeout=1)
+    events.put(("exit", job_id, process.returncode))
+
+# Terminate a job's whole process group, escalating to SIGKILL if it lingers
+def kill_process_group(process):
+    try:
+        os.killpg(process.pid, signal.SIGTERM)
+        try:
+            process.wait(timeout=COMMAND_KILL_GRACE_SECONDS)
+        except subprocess.TimeoutExpired:
+            os.killpg(process.pid, signal.SIGKILL)
+            process.wait()
+    except ProcessLookupError:
+        pass
+
+# Apply queued job events and return what to show, in order: ("output", job_id, job, text)
+# with each job's lines batched together, and ("exit", job_id, job, status) once a job ends.
+# With a timeout, waits that long for the first event; otherwise only takes what is queued.
+def drain_job_events(events=None, limit=COMMAND_EVENTS_PER_POLL, timeout=None):
+    events = events if events is not None else job_events
+    updates = []
+    batches = {}
+    for _ in range(limit):
+        try:
+            if timeout is not None and not updates and not batches:
+                kind, job_id, payload = events.get(timeout=timeout)
+            else:
+                kind, job_id, payload = events.get_nowait()
+        except queue.Empty:
+            break
+    
+        job = running_jobs.get(job_id)
+        if job is None:
+            continue
+        if kind == "output":
+            if job["kept_bytes"] + len(payload) > COMMAND_OUTPUT_MAX_BYTES:
+                job["truncated"] = True
+                continue
+            job["kept_bytes"] += len(payload)
+            job["output"].append(payload)
+            batches.setdefault(job_id, []).append(payload)
+        elif kind == "timeout":
+            job["kill_reason"] = f"timed out after {COMMAND_TIMEOUT_SECONDS:g}s"
+        else:
+            if job_id in batches:
+                updates.append(("output", job_id, job, "".join(batches.pop(job_id))))
+            updates.append(("exit", job_id, job, finish_job(job_id, payload)))
+    
+    for job_id, texts in batches.items():
+        updates.append(("output", job_id, running_jobs[job_id], "".join(texts)))
+    return updates
+
+# Record a finished job and log its output; returns its status line
+def finish_job(job_id, returncode):
+    job = running_jobs.pop(job_id)
+    # A killed job never counts as a success, whatever its exit status
+    job["succeeded"] = returncode == 0 and not job["kill_reason"]
+    observe_metric("command", (time.monotonic() - job["started"]) * 1000)
+    
+    status = job["kill_reason"] or f"exited with status {returncode}"
+    if job["truncated"]:
+        status += f", output truncated to {COMMAND_OUTPUT_MAX_BYTES} bytes"
+    log_message(job["user_input"], "".join(job["output"]), mode="shell", started=job["started"],
+                job=job_id, returncode=returncode, status=status)
+    return status
+
+# Kill running jobs: the latest by default, a given id, or "all"
+def kill_jobs(target=""):
+    if not running_jobs:
+        return "There are no running commands to stop."
+    
+    if target == "all":
+        job_ids = list(running_jobs)
+    elif target:
+        try:
+            job_ids = [int(target)]
+        except ValueError:
+            return f"I'm sorry, but '{target}' is not a valid job number."
+        if job_ids[0] not in running_jobs:
+            return f"I'm sorry, but there is no running job {job_ids[0]}."
+    else:
+        job_ids = [max(running_jobs)]
+    
+    for job_id in job_ids:
+        job = running_jobs[job_id]
+        job["kill_reason"] = "killed"
+        # Escalation waits for the grace period, so keep it off the caller's thread
+        threading.Thread(target=kill_process_group, args=(job["process"],), daemon=True).start()
+    return f"Very well. I am stopping job {', '.join(str(job_id) for job_id in job_ids)}."
+
+# List running jobs
+def list_jobs():
+    if not running_jobs:
+        return "There are no running commands."
+    return "\n".join(f"  [job {job_id}] $ {job['command']}" for job_id, job in sorted(running_jobs.items()))
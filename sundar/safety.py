@@ -0,0 +1,455 @@
+# Command safety checks for "!" commands and model-requested terminal commands.
+# Commands are tokenized with shlex, split into pipeline segments, and each segment's
+# executable, flags and arguments are checked against a compiled policy (first match
+# wins). The policy is read from SUNDAR_POLICY_FILE and reloaded when the file changes.
+
+import fnmatch
+import os
+import re
+import shlex
+import time
+
+POLICY_FILE = os.getenv("SUNDAR_POLICY_FILE") or os.path.join(
+    os.getenv("XDG_CONFIG_HOME", os.path.expanduser("~/.config")), "sundar2000", "policy.rules")
+POLICY_CHECK_SECONDS = 1.0  # How often the policy file is checked for changes
+POLICY_VERDICT_CACHE_SIZE = 4096
+
+# Used when the policy file doesn't exist; copy it there to start your own
+DEFAULT_POLICY = """
+# SUNDAR 2000 command policy. One rule per line; the first matching rule wins:
+#   allow|deny EXEC[,EXEC...] [flags=FLAG[|ALT],...] [args=GLOB,...] [pipe=EXEC,...]
+#   default allow|deny
+# EXEC is a glob matched against the executable's basename. A rule matches when all
+# of its conditions do: every listed flag is present (short flags may be combined, as
+# in -rf), some argument matches one of the globs, or the output is piped into one of
+# the listed executables. In args globs * and ? don't match / (as in the shell) and **
+# matches anything. Commands run through sudo, env, xargs and the like are checked
+# against the deny rules too, as are "sh -c" scripts, "python -c" and "perl -e" code,
+# and $(...) substitutions. A command name that uses $ or ` (as in $(...), ${x} or
+# $'...') is always denied.
+deny rm flags=-r|-R|--recursive args=/,/*,/*/*,~,~/[*],$HOME,$HOME/[*]
+deny rm flags=--no-preserve-root
+deny dd args=if=**
+deny mkfs,mkfs.*,mke2fs,mkswap,wipefs
+deny shutdown,reboot,halt,poweroff
+deny systemctl args=poweroff,reboot,halt,kexec
+deny init,telinit args=0,6
+deny kill,pkill,killall flags=-9|-KILL|-SIGKILL
+deny kill,pkill,killall flags=-s args=9,KILL,SIGKILL
+deny * pipe=sh,bash,dash,zsh
+default allow
+"""
+
+# shlex returns runs of these characters as tokens of their own: redirections, and
+# otherwise separators between the simple commands of a command line
+PUNCTUATION = frozenset("();<>|&")
+REDIRECTIONS = {">", ">>", "<", "<<", "<<<", "&>", "&>>", ">&", "<&", ">|"}
+PIPE_SEPARATORS = {"|", "|&"}
+# Words that can start a simple command without being its executable
+SHELL_KEYWORDS = {"{", "}", "!", "if", "then", "else", "elif", "fi", "do", "done", "while", "until",
+                  "case", "esac", "function", "coproc"}
+# Commands that run another command given in their arguments
+WRAPPER_COMMANDS = {"sudo", "doas", "env", "nohup", "nice", "ionice", "time", "timeout", "stdbuf",
+                    "xargs", "exec", "command", "builtin", "setsid", "chroot", "watch", "strace",
+                    "busybox", "flock", "find", "parallel"}
+# Commands whose -c option takes a script
+SHELL_COMMANDS = {"sh", "bash", "dash", "zsh", "ksh", "fish", "su"}
+# Interpreters and the options that take code to run, which is checked as a command
+# line along with the strings in it, as it might hand any of them to a shell
+INTERPRETER = re.compile(r"(?:python|pypy|lua)[0-9.]*|perl|ruby|node|nodejs|php")
+INTERPRETER_CODE_OPTIONS = {"-c", "-e", "-E", "-r", "--eval"}
+STRING_LITERAL = re.compile(r"'([^']*)'|\"([^\"]*)\"")
+ASSIGNMENT = re.compile(r"[A-Za-z_][A-Za-z0-9_]*=")
+SUBSTITUTION = re.compile(r"\$\((.*)\)|`([^`]*)`", re.DOTALL)
+REPEATED_SLASHES = re.compile(r"/+")
+QUOTING = str.maketrans("", "", "'\"\\")
+BRACED_HOME = re.compile(r"\$\{HOME\}")
+# Parameter expansion, command substitution and $'...' quoting: a command name built
+# with these is only known once the shell runs it, so it is always denied
+EXPANSION = re.compile(r"[$`]")
+EXPANSION_RULE = "<policy>: command name uses $ or ` expansion and can't be checked"
+
+policy = None  # The compiled policy in use; see get_policy()
+
+# Function to compile policy text into rules and lookup tables
+def parse_policy(text, path="<policy>"):
+    rules = []
+    default_allow = True
+    for number, line in enumerate(text.splitlines(), 1):
+        try:
+            words = shlex.split(line, comments=True)
+        except ValueError as e:
+            raise ValueError(f"{path}:{number}: {e}")
+        if not words:
+            continue
+        
+        action = words[0]
+        if action == "default" and len(words) == 2 and words[1] in ("allow", "deny"):
+            default_allow = words[1] == "allow"
+            continue
+        if action not in ("allow", "deny") or len(words) < 2:
+            raise ValueError(f"{path}:{number}: expected 'allow EXEC ...', 'deny EXEC ...' or 'default allow|deny'")
+        
+        rule = {
+            "index": len(rules),
+            "allow": action == "allow",
+            "execs": words[1].split(","),
+            "flags": [],
+            "args": None,
+            "pipe": None,
+            "text": f"{path}:{number}: {line.strip()}"
+        }
+        for word in words[2:]:
+            key, _, value = word.partition("=")
+            values = [item for item in value.split(",") if item]
+            if key == "flags" and values:
+                # Each listed flag must be present, in any of its spellings
+                rule["flags"] = [frozenset(item.split("|")) for item in values]
+            elif key == "args" and values:
+                rule["args"] = compile_path_globs(values)
+            elif key == "pipe" and values:
+                rule["pipe"] = compile_globs(values)
+                rule["pipe_names"] = values
+            else:
+                raise ValueError(f"{path}:{number}: unknown condition '{word}'")
+        rule["exec_pattern"] = compile_globs(rule["execs"])
+        rules.append(rule)
+    
+    return {
+        "rules": rules,
+        "default_allow": default_allow,
+        "by_exec": index_rules_by_exec(rules),
+        "glob_rules": [rule for rule in rules if any(is_glob(pattern) for pattern in rule["execs"])],
+        "prefilter": compile_prefilter(rules, default_allow),
+        "candidates": {},  # Executable name -> the rules that can apply to it, in policy order
+        "verdicts": {}  # Command -> (allowed, rule text) for recently checked commands
+    }
+
+# Function to compile a list of globs into one anchored regex
+def compile_globs(patterns):
+    return re.compile("|".join(fnmatch.translate(pattern) for pattern in patterns))
+
+# Function to compile argument globs into one anchored regex, with the shell's rules for
+# paths: * and ? stop at /, ** doesn't
+def compile_path_globs(patterns):
+    return re.compile("(?:" + "|".join(translate_path_glob(pattern) for pattern in patterns) + r")\Z",
+                      re.DOTALL)
+
+# Function to translate one argument glob into a regex
+def translate_path_glob(pattern):
+    parts = []
+    position = 0
+    while position < len(pattern):
+        char = pattern[position]
+        position += 1
+        if pattern.startswith("**", position - 1):
+            parts.append(".*")
+            position += 1
+        elif char == "*":
+            parts.append("[^/]*")
+        elif char == "?":
+            parts.append("[^/]")
+        elif char == "[" and "]" in pattern[position + 1 + pattern.startswith("!", position):]:
+            # A ] right after [ or [! is a member of the set
+            start = position + 1 if pattern.startswith("!", position) else position
+            end = pattern.index("]", start + 1)
+            members = re.sub(r"^\^|\\", r"\\\g<0>", pattern[start:end])
+            parts.append(("[^" if start > position else "[") + members + "]")
+            position = end + 1
+        else:
+            parts.append(re.escape(char))
+    return "".join(parts)
+
+# Function to tell whether an executable pattern uses glob characters
+def is_glob(pattern):
+    return any(char in pattern for char in "*?[")
+
+# Function to map literal executable names to the rules that name them
+def index_rules_by_exec(rules):
+    by_exec = {}
+    for rule in rules:
+        for pattern in rule["execs"]:
+            if not is_glob(pattern):
+                by_exec.setdefault(pattern, []).append(rule)
+    return by_exec
+
+# Function to build one regex over every deny rule's executable, so commands that can't
+# match any deny rule are allowed without being tokenized. Only sound when the default is
+# allow: then a command is denied only if some deny rule's executable appears in it.
+def compile_prefilter(rules, default_allow):
+    if not default_allow:
+        return None
+    literals = set()
+    for rule in rules:
+        if rule["allow"]:
+            continue
+        # A rule for output piped into some commands needs one of those to appear
+        for pattern in rule.get("pipe_names") or rule["execs"]:
+            # A glob's literal prefix must appear for the glob to match
+            literal = re.split(r"[*?\[]", pattern, maxsplit=1)[0]
+            if not literal:
+                return None
+            literals.add(literal)
+    if not literals:
+        return re.compile(r"(?!)")
+    return re.compile(build_trie_pattern(sorted(literals)))
+
+# Function to turn sorted literals into a regex shaped like a trie, e.g. "re(?:boot|set)".
+# re tries alternatives one by one, so factoring out shared prefixes keeps a search over
+# hundreds of names close to the cost of one, as with an Aho-Corasick automaton.
+def build_trie_pattern(literals):
+    branches = {}
+    matches_empty = False
+    for literal in literals:
+        if literal:
+            branches.setdefault(literal[0], []).append(literal[1:])
+        else:
+            matches_empty = True
+    alternatives = [re.escape(char) + build_trie_pattern(rest) for char, rest in branches.items()]
+    if not alternatives:
+        return ""
+    if len(alternatives) == 1 and not matches_empty:
+        return alternatives[0]
+    # An empty branch means a shorter name already matched, so nothing more is needed
+    return "" if matches_empty else "(?:" + "|".join(alternatives) + ")"
+
+# Function to list the rules that can apply to an executable, in policy order
+def get_candidate_rules(current, name):
+    candidates = current["candidates"].get(name)
+    if candidates is None:
+        candidates = list(current["by_exec"].get(name, ()))
+        named = {rule["index"] for rule in candidates}
+        candidates += [rule for rule in current["glob_rules"]
+                       if rule["index"] not in named and rule["exec_pattern"].match(name)]
+        candidates.sort(key=lambda rule: rule["index"])
+        current["candidates"][name] = candidates
+    return candidates
+
+# Function to split a command line into simple commands: [(argv, piped_into_next)]
+def split_command(command):
+    try:
+        lexer = shlex.shlex(command.replace("\n", ";"), posix=True, punctuation_chars=True)
+        lexer.whitespace_split = True
+        lexer.commenters = ""
+        tokens = list(lexer)
+    except ValueError:
+        # The shell would refuse it too; check the words as they stand
+        tokens = command.translate(QUOTING).split()
+    
+    segments = []
+    argv = []
+    skip_next = False
+    for token in tokens:
+        if token in REDIRECTIONS:
+            skip_next = True  # The file name isn't an argument
+        elif PUNCTUATION.issuperset(token):
+            if argv:
+                segments.append((argv, token in PIPE_SEPARATORS))
+            argv = []
+        elif skip_next:
+            skip_next = False
+        elif argv or not (token in SHELL_KEYWORDS or ASSIGNMENT.match(token)):
+            argv.append(token)
+    if argv:
+        segments.append((argv, False))
+    return segments
+
+# Function to split a simple command's arguments into its set of flags and its operands
+def split_arguments(arguments):
+    flags = set()
+    operands = []
+    for position, argument in enumerate(arguments):
+        if argument == "--":
+            operands.extend(arguments[position + 1:])
+            break
+        if argument.startswith("--"):
+            flags.add(argument.split("=", 1)[0])
+        elif argument.startswith("-") and len(argument) > 1:
+            # -rf is -r and -f; the word itself is kept for flags such as -KILL
+            flags.add(argument)
+            flags.update(f"-{char}" for char in argument[1:])
+        else:
+            # ${HOME} is $HOME, which is what the policy names
+            argument = BRACED_HOME.sub("$HOME", argument)
+            operands.append(argument)
+            if "/" in argument:
+                # //, /etc/ and /usr/.. name the same directories as /, /etc and /
+                operands.append(os.path.normpath(REPEATED_SLASHES.sub("/", argument)))
+    return flags, operands
+
+# Function to get the name a simple command runs, ignoring its path and alias escapes
+def get_executable(argv):
+    return os.path.basename(argv[0].lstrip("\\")) or argv[0]
+
+# Function to tell whether a simple command's name comes from an expansion
+def has_expanded_executable(argv):
+    return EXPANSION.search(argv[0]) is not None
+
+# Function to find the first rule matching one simple command
+def match_rule(current, argv, piped_into, deny_only=False):
+    candidates = get_candidate_rules(current, get_executable(argv))
+    if not candidates:
+        return None
+    flags, operands = split_arguments(argv[1:])
+    for rule in candidates:
+        if deny_only and rule["allow"]:
+            continue
+        if any(not (alternatives & flags) for alternatives in rule["flags"]):
+            continue
+        if rule["args"] is not None and not any(rule["args"].match(operand) for operand in operands):
+            continue
+        if rule["pipe"] is not None and not any(rule["pipe"].match(name) for name in piped_into):
+            continue
+        return rule
+    return None
+
+# Function to list the commands a wrapper such as sudo or xargs might run: every
+# operand onwards is tried as a command line, so options that take values can't hide one
+def get_wrapped_commands(argv):
+    return [argv[position:] for position in range(1, len(argv)) if not argv[position].startswith("-")]
+
+# Function to list the scripts a command runs through a shell or eval
+def get_nested_scripts(argv):
+    name = get_executable(argv)
+    if name == "eval":
+        return [" ".join(argv[1:])]
+    if name in SHELL_COMMANDS:
+        return [argv[position + 1] for position, argument in enumerate(argv[1:-1], 1)
+                if argument.startswith("-") and not argument.startswith("--") and "c" in argument]
+    if INTERPRETER.fullmatch(name):
+        scripts = []
+        for position, argument in enumerate(argv[1:], 1):
+            if argument in INTERPRETER_CODE_OPTIONS and position + 1 < len(argv):
+                code = argv[position + 1]
+            elif argument[:2] in INTERPRETER_CODE_OPTIONS and not argument.startswith("--"):
+                code = argument[2:]  # As in -c'code'
+            else:
+                continue
+            strings = [single or double for single, double in STRING_LITERAL.findall(code)]
+            scripts += [code] + strings + [" ".join(strings)]
+        return scripts
+    return []
+
+# Function to check a command line against a policy without the verdict cache.
+# Returns (allowed, rule text); the rule text is None when the default applied.
+def evaluate_command(command, current=None, depth=0):
+    current = current or get_policy()
+    prefilter = current["prefilter"]
+    # An expansion can spell a denied name without it appearing in the text
+    if prefilter is not None and not prefilter.search(command.translate(QUOTING)) \
+            and not EXPANSION.search(command):
+        return True, None
+    
+    if depth < 4:
+        # $(...) and `...` run even inside double quotes, so look for them in the raw text
+        for match in SUBSTITUTION.finditer(command):
+            allowed, rule_text = evaluate_command(match.group(1) or match.group(2) or "", current, depth + 1)
+            if not allowed:
+                return False, rule_text
+    
+    segments = split_command(command)
+    # The names each segment's output is piped into, wrapped commands included
+    piped_into = [()] * len(segments)
+    for position in range(len(segments) - 1):
+        if segments[position][1]:
+            next_argv = segments[position + 1][0]
+            piped_into[position] = [get_executable(next_argv)]
+            if get_executable(next_argv) in WRAPPER_COMMANDS:
+                piped_into[position] += [get_executable(wrapped) for wrapped in get_wrapped_commands(next_argv)]
+    
+    for (argv, _), targets in zip(segments, piped_into):
+        if has_expanded_executable(argv):
+            return False, EXPANSION_RULE
+        rule = match_rule(current, argv, targets)
+        if rule is not None and not rule["allow"]:
+            return False, rule["text"]
+        if rule is None and not current["default_allow"]:
+            return False, None
+        
+        # Whatever a wrapper runs is held to the deny rules
+        if get_executable(argv) in WRAPPER_COMMANDS:
+            for wrapped in get_wrapped_commands(argv):
+                if has_expanded_executable(wrapped):
+                    return False, EXPANSION_RULE
+                rule = match_rule(current, wrapped, targets, deny_only=True)
+                if rule is not None:
+                    return False, rule["text"]
+        
+        if depth < 4:
+            for script in get_nested_scripts(argv):
+                allowed, rule_text = evaluate_command(script, current, depth + 1)
+                if not allowed:
+                    return False, rule_text
+    return True, None
+
+# Function to check a command line, remembering recent verdicts
+def check_command(command, current=None):
+    current = current or get_policy()
+    verdicts = current["verdicts"]
+    verdict = verdicts.get(command)
+    if verdict is None:
+        verdict = evaluate_command(command, current)
+        if len(verdicts) >= POLICY_VERDICT_CACHE_SIZE:
+            verdicts.clear()
+        verdicts[command] = verdict
+    return verdict
+
+# Function to check many commands at once, e.g. to replay the command log against a new
+# policy; repeated commands are only evaluated once. Yields (command, allowed, rule text).
+def evaluate_commands(commands, current=None):
+    current = current or get_policy()
+    verdicts = {}
+    for command in commands:
+        verdict = verdicts.get(command)
+        if verdict is None:
+            verdict = verdicts[command] = evaluate_command(command, current)
+        yield command, verdict[0], verdict[1]
+
+# Function to read and compile a policy file, or the built-in policy if it doesn't exist
+def load_policy(path=POLICY_FILE):
+    try:
+        with open(path, encoding="utf-8") as f:
+            stat = os.fstat(f.fileno())
+            loaded = parse_policy(f.read(), path)
+        loaded["signature"] = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        loaded = parse_policy(DEFAULT_POLICY, "<default policy>")
+        loaded["signature"] = None
+    loaded["path"] = path
+    loaded["checked"] = time.monotonic()
+    return loaded
+
+# Function to get the current policy, reloading it if its file has changed
+def get_policy():
+    global policy
+    
+    if policy is None:
+        try:
+            policy = load_policy()
+        except (OSError, ValueError) as e:
+            print(f"Error loading command policy, using the default: {e}")
+            policy = parse_policy(DEFAULT_POLICY, "<default policy>")
+            policy.update(signature=None, path=POLICY_FILE, checked=time.monotonic())
+        return policy
+    
+    now = time.monotonic()
+    if now - policy["checked"] < POLICY_CHECK_SECONDS:
+        return policy
+    policy["checked"] = now
+    try:
+        stat = os.stat(policy["path"])
+        signature = (stat.st_mtime_ns, stat.st_size)
+    except FileNotFoundError:
+        signature = None
+    if signature != policy["signature"]:
+        try:
+            policy = load_policy(policy["path"])
+        except (OSError, ValueError) as e:
+            # Keep enforcing the last good policy until the file is fixed
+            policy["signature"] = signature
+            print(f"Error reloading command policy: {e}")
+    return policy
+
+# Function to check if a command is safe
+def is_safe_command(command):
+    return check_command(command)[0]
@@ -0,0 +1,56 @@
+# Checks of application search in sundar.launcher against a small desktop index.
+# Run with: python -m unittest discover tests
+
+import unittest
+
+from sundar import launcher
+
+# Name -> (GenericName, Keywords, Comment) of the desktop files searched
+DESKTOP_APPS = {
+    "Firefox": ("Web Browser", "Internet;WWW;Browser;", "Browse the World Wide Web"),
+    "LibreOffice Writer": ("Word Processor", "Text;Letter;Fax;Document;",
+                           "Create and edit text and graphics in letters, reports, documents and web pages"),
+    "LibreOffice Calc": ("Spreadsheet", "Accounting;Stats;", "Perform calculations and analyze data"),
+    "Thunderbird": ("Mail Client", "Email;E-mail;", "Send and receive mail"),
+    "Files": ("File Manager", "folder;manager;explore;", "Access and organize files"),
+    "Terminal": ("Terminal Emulator", "shell;prompt;command;", "Use the command line"),
+    "Text Editor": ("", "text;edit;notepad;", "Edit text files"),
+    "Videos": ("Video Player", "Movie;Film;", "Play movies"),
+}
+
+# Query -> the app it must rank first and the lowest acceptable score; these once
+# returned nothing, as the trigram candidates left out the app
+SEARCH_CASES = {
+    "libreoffice writer document": ("LibreOffice Writer", 100),
+    "mozilla firefox": ("Firefox", 64),
+    "fierfox": ("Firefox", 85),
+    "firefox": ("Firefox", 100),
+    "writer": ("LibreOffice Writer", 100),
+}
+
+
+class SearchAppsTest(unittest.TestCase):
+    def setUp(self):
+        desktop_files = {}
+        for name, (generic_name, keywords, comment) in DESKTOP_APPS.items():
+            desktop_files[name] = {"path": f"/usr/share/applications/{name.lower().replace(' ', '-')}.desktop",
+                                   "generic_name": generic_name, "keywords": keywords, "comment": comment}
+        self.index = launcher.build_search_index(desktop_files)
+
+    def test_top_results(self):
+        for query, (name, min_score) in SEARCH_CASES.items():
+            with self.subTest(query=query):
+                results = launcher.search_apps(self.index, launcher.normalize_search_text(query))
+                self.assertTrue(results)
+                self.assertEqual(results[0][0], name)
+                self.assertGreaterEqual(results[0][2], min_score)
+
+    def test_typing_a_query(self):
+        # Each keystroke extends the last query, reusing its trigram counts
+        for end in range(1, len("mozilla firefox") + 1):
+            results = launcher.search_apps(self.index, "mozilla firefox"[:end])
+        self.assertEqual(results[0][0], "Firefox")
+
+
+if __name__ == "__main__":
+    unittest.main()
